@@ -1,13 +1,151 @@
 # app/body/blood.py
-from typing import Generic, Optional, TypeVar
+import json
+import time
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Dict, Generic, Optional, Tuple, Type, TypeVar
+from uuid import uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
+from pydantic_core import to_json
 
 # Определение дженерик-типа (Заполнитель)
 DataT = TypeVar("DataT")
 
 
+class EventPriority(IntEnum):
+    """Полоса доставки тельца: чем меньше число, тем срочнее."""
+
+    URGENT = 0  # Отмены, команды управления
+    NORMAL = 1  # Обычный трафик
+    BULK = 2  # Бэкфиллы, массовая перезаливка
+
+
+# =======================================================
+# Реестр типизированных payload: имя события -> модель
+# =======================================================
+EVENT_PAYLOADS: Dict[str, Type] = {}
+
+
+def register_payload(event_name: str, model: Type) -> Type:
+    """Регистрирует модель payload для события (можно использовать как есть или в декораторе)."""
+    EVENT_PAYLOADS[event_name] = model
+    return model
+
+
+@lru_cache(maxsize=None)
+def payload_adapter(model: Type) -> TypeAdapter:
+    """Кэшированный TypeAdapter модели: схема валидации строится один раз."""
+    return TypeAdapter(model)
+
+
 # === УНИВЕРСАЛЬНЫЙ ИВЕНТ (кроваяное тельце) ===
 class OctaEvent(BaseModel, Generic[DataT]):
     event: str = Field(..., description="Any named event type")
     payload: Optional[DataT] = None
+    # Уникальный ID тельца: по нему Сердце отсекает дубли при broadcast во все шины
+    event_id: str = Field(default_factory=lambda: uuid4().hex, description="Unique event id")
+    priority: int = Field(default=EventPriority.NORMAL, description="Delivery lane, 0 = urgent")
+    timestamp: float = Field(default_factory=time.time, description="Unix time of creation")
+    headers: Dict[str, str] = Field(default_factory=dict, description="Routing/trace headers")
+    # Ключ партиции: тельца с одним ключом доставляются по порядку (например, id ордера)
+    partition_key: Optional[str] = Field(default=None, description="Ordering key")
+
+    def typed_payload(self) -> Any:
+        """Payload, провалидированный в зарегистрированную модель события (если она есть)."""
+        model = EVENT_PAYLOADS.get(self.event)
+        if model is None or isinstance(self.payload, model):
+            return self.payload
+        return payload_adapter(model).validate_python(self.payload)
+
+
+# Поля конверта, которые читаются сразу (без разбора payload)
+_ENVELOPE_FIELDS = ("event", "event_id", "priority", "timestamp", "headers", "partition_key")
+
+
+class LazyOctaEvent:
+    """
+    Тельце, пришедшее по проводу, с ленивым payload.
+
+    Конверт (event, event_id, priority, timestamp, headers, partition_key) разобран сразу:
+    маршрутизация, дедупликация и фильтрация по нему ничего не стоят.
+    payload декодируется из байтов только при первом обращении,
+    typed_payload() валидирует байты прямо в зарегистрированную модель.
+    Повторная публикация без обращения к payload переиспользует исходные байты.
+    """
+
+    __slots__ = _ENVELOPE_FIELDS + ("_raw", "_payload", "_typed")
+
+    _MISSING = object()
+
+    def __init__(self, envelope: Dict[str, Any], raw_payload: bytes):
+        self.event: str = envelope["event"]
+        self.event_id: str = envelope.get("event_id") or uuid4().hex
+        self.priority: int = envelope.get("priority", EventPriority.NORMAL)
+        self.timestamp: float = envelope.get("timestamp", 0.0)
+        self.headers: Dict[str, str] = envelope.get("headers") or {}
+        self.partition_key: Optional[str] = envelope.get("partition_key")
+        self._raw = raw_payload
+        self._payload = self._MISSING
+        self._typed = self._MISSING
+
+    @property
+    def payload(self) -> Any:
+        if self._payload is self._MISSING:
+            self._payload = json.loads(self._raw)
+        return self._payload
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._payload is not self._MISSING or self._typed is not self._MISSING
+
+    def typed_payload(self) -> Any:
+        if self._typed is self._MISSING:
+            model = EVENT_PAYLOADS.get(self.event)
+            if model is None:
+                self._typed = self.payload
+            else:
+                self._typed = payload_adapter(model).validate_json(self._raw)
+        return self._typed
+
+    def to_event(self) -> OctaEvent:
+        """Полноценный OctaEvent (с декодированием payload)."""
+        return OctaEvent(
+            payload=self.payload, **{name: getattr(self, name) for name in _ENVELOPE_FIELDS}
+        )
+
+    def model_dump(self, **kwargs) -> Dict[str, Any]:
+        return self.to_event().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        return self.to_event().model_dump_json(**kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyOctaEvent(event={self.event!r}, event_id={self.event_id!r})"
+
+
+def encode_event(message: OctaEvent) -> Tuple[bytes, bytes]:
+    """Сериализует тельце в две части для провода: (конверт JSON, payload JSON)."""
+    envelope = to_json({name: getattr(message, name) for name in _ENVELOPE_FIELDS})
+    if isinstance(message, LazyOctaEvent) and not message.is_decoded:
+        # Транзит без изменений: исходные байты payload не трогаем
+        return envelope, message._raw
+    return envelope, to_json(message.payload)
+
+
+def decode_event(envelope: bytes, raw_payload: bytes) -> LazyOctaEvent:
+    """Разбирает конверт сразу, payload оставляет байтами до первого обращения."""
+    return LazyOctaEvent(json.loads(bytes(envelope)), bytes(raw_payload))
+
+
+# Однокадровый формат для шин со своим фреймингом (файловый лог, разделяемая память):
+# [длина конверта: u32 little-endian][конверт][payload]
+def pack_event(message: OctaEvent) -> bytes:
+    envelope, raw_payload = encode_event(message)
+    return len(envelope).to_bytes(4, "little") + envelope + raw_payload
+
+
+def unpack_event(frame: bytes) -> LazyOctaEvent:
+    view = memoryview(frame)
+    size = int.from_bytes(view[:4], "little")
+    return decode_event(view[4 : 4 + size], view[4 + size :])
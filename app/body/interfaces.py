@@ -1,10 +1,14 @@
 # app/body/interfaces.py
 from abc import ABC, abstractmethod
-from typing import Callable
+from typing import Callable, Dict, Optional
 
 from .blood import OctaEvent
 
 
+class BusClosedError(RuntimeError):
+    """Шина останавливается или остановлена и больше не принимает публикации."""
+
+
 # (IMessageBus - "Сосуд")
 class IMessageBus(ABC):
     """Абстракция для работы с очередями и стримингом."""
@@ -18,3 +22,21 @@ class IMessageBus(ABC):
     async def subscribe(self, topic: str, handler: Callable):
         """Подписывается на топик и передает сообщения в обработчик."""
         pass
+
+    async def stop(self, drain_timeout: float = 5.0) -> dict:
+        """
+        Протокол остановки: перестать принимать публикации (BusClosedError),
+        дать слушателям дообработать очереди не дольше drain_timeout,
+        затем отменить слушателей.
+
+        Возвращает отчет {"undelivered": {топик: число}, "pending_retries": число}.
+        """
+        return drain_report()
+
+
+def drain_report(undelivered: Optional[Dict[str, int]] = None, pending_retries: int = 0) -> dict:
+    """Отчет остановки шины: что так и не было доставлено."""
+    return {
+        "undelivered": {topic: n for topic, n in (undelivered or {}).items() if n},
+        "pending_retries": pending_retries,
+    }
@@ -1,2 +1,4 @@
+from .file_log_bus import FileLogMessageBus
 from .in_memory_bus import InMemoryMessageBus
 from .kafka_bus import KafkaMessageBus
+from .shm_bus import SharedMemoryMessageBus
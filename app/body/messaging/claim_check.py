@@ -0,0 +1,77 @@
+# app/body/messaging/claim_check.py
+"""
+Claim check: большой payload тельца уходит в хранилище блобов, а по шинам
+едет только ссылка в заголовках. Получатель забирает payload сам, когда
+(и если) он ему нужен: await fetch_payload(event).
+"""
+
+import json
+from typing import Any, Optional, Union
+
+from pydantic_core import to_json
+
+from app.body.blood import (
+    _ENVELOPE_FIELDS,
+    EVENT_PAYLOADS,
+    LazyOctaEvent,
+    OctaEvent,
+    payload_adapter,
+)
+from app.body.storage.blob_store import BlobStore, blob_store
+
+# Заголовки тельца со ссылкой: sha256 блоба и размер payload в байтах
+CLAIM_CHECK_HEADER = "claim-check"
+CLAIM_CHECK_SIZE_HEADER = "claim-check-size"
+
+# Порог по умолчанию: payload от 256 КБ едет ссылкой
+DEFAULT_THRESHOLD = 256 * 1024
+
+Event = Union[OctaEvent, LazyOctaEvent]
+
+
+def is_claim_checked(event: Event) -> bool:
+    return CLAIM_CHECK_HEADER in (event.headers or {})
+
+
+async def claim_check(
+    event: Event, threshold: int = DEFAULT_THRESHOLD, store: Optional[BlobStore] = None
+) -> Event:
+    """
+    Тельце с payload не меньше threshold байт (JSON) -> новое тельце со ссылкой
+    (тот же event_id, конверт и заголовки). Меньшие тельца возвращаются как есть.
+    """
+    if is_claim_checked(event):
+        return event
+    if isinstance(event, LazyOctaEvent) and not event.is_decoded:
+        raw = event._raw  # Транзит: байты уже есть, payload не декодируем
+    elif event.payload is None:
+        return event
+    else:
+        raw = to_json(event.payload)
+    if len(raw) < threshold:
+        return event
+    ref = await (store or blob_store).put(raw)
+    envelope = {name: getattr(event, name) for name in _ENVELOPE_FIELDS}
+    envelope["headers"] = {
+        **envelope["headers"],
+        CLAIM_CHECK_HEADER: ref,
+        CLAIM_CHECK_SIZE_HEADER: str(len(raw)),
+    }
+    return OctaEvent(payload=None, **envelope)
+
+
+async def fetch_payload(
+    event: Event, store: Optional[BlobStore] = None, typed: bool = False
+) -> Any:
+    """
+    payload тельца: из самого тельца или, если оно пришло ссылкой, из хранилища
+    блобов. typed=True - провалидированный в зарегистрированную модель события.
+    """
+    ref = (event.headers or {}).get(CLAIM_CHECK_HEADER)
+    if ref is None:
+        return event.typed_payload() if typed else event.payload
+    raw = await (store or blob_store).get(ref)
+    model = EVENT_PAYLOADS.get(event.event) if typed else None
+    if model is not None:
+        return payload_adapter(model).validate_json(raw)
+    return json.loads(raw)
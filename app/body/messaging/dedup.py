@@ -0,0 +1,54 @@
+# app/body/messaging/dedup.py
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class SeenWindow:
+    """
+    Ограниченное по размеру и времени множество "уже виденных" ключей.
+
+    Используется Сердцем для подавления дублей: одно и то же тельце (event_id),
+    пришедшее по нескольким шинам, доставляется обработчику только один раз.
+    Вставка и проверка - O(1), память ограничена max_size.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 100_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # Ключ -> момент первой встречи (порядок вставки = порядок устаревания)
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, key: Hashable) -> bool:
+        """
+        Отмечает ключ как виденный.
+        Возвращает True, если ключ уже встречался в пределах окна (дубль).
+        """
+        now = time.monotonic()
+        self._evict(now)
+
+        if key in self._seen:
+            return True
+
+        self._seen[key] = now
+        if len(self._seen) > self.max_size:
+            # Окно переполнено - выталкиваем самый старый ключ
+            self._seen.popitem(last=False)
+        return False
+
+    def forget(self, key: Hashable):
+        """Снимает отметку (доставка упала - повтор не должен считаться дублем)."""
+        self._seen.pop(key, None)
+
+    def _evict(self, now: float):
+        """Удаляет ключи, вышедшие за временное окно (амортизированно O(1))."""
+        deadline = now - self.ttl
+        seen = self._seen
+        while seen:
+            key, first_seen = next(iter(seen.items()))
+            if first_seen > deadline:
+                break
+            seen.popitem(last=False)
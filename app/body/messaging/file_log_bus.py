@@ -0,0 +1,460 @@
+# app/body/messaging/file_log_bus.py
+import asyncio
+import json
+import mmap
+import os
+import re
+import struct
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from app.body.blood import OctaEvent, pack_event, unpack_event
+from app.body.interfaces import BusClosedError, IMessageBus, drain_report
+
+from .retry import RetryingDelivery, RetryPolicy, TimerWheel, is_dead_letter_topic
+from .topic_trie import is_pattern, pattern_to_regex
+
+# Кадр записи в сегменте: [длина: u32 little-endian][тело: pack_event(OctaEvent)]
+_FRAME = struct.Struct("<I")
+_SEGMENT_SUFFIX = ".log"
+
+
+class _Segment:
+    """
+    Один файл сегмента лога. Имя файла - базовый оффсет первой записи.
+    Индекс (позиции записей) строится сканированием через mmap и дописывается
+    по мере роста файла, поэтому читатели из других процессов тоже видят новые записи.
+    """
+
+    __slots__ = ("base_offset", "path", "positions", "end", "_mm", "_mapped")
+
+    def __init__(self, base_offset: int, path: Path):
+        self.base_offset = base_offset
+        self.path = path
+        self.positions: List[int] = []
+        self.end = 0  # Позиция сразу за последней целой записью
+        self._mm: Optional[mmap.mmap] = None
+        self._mapped = 0
+
+    @property
+    def next_offset(self) -> int:
+        return self.base_offset + len(self.positions)
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _map(self, size: int) -> mmap.mmap:
+        """Отображает файл в память (переотображает, если файл вырос)."""
+        if self._mm is None or size > self._mapped:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = size
+        return self._mm
+
+    def scan(self):
+        """Доиндексирует записи, появившиеся после self.end."""
+        size = self.size()
+        if size <= self.end:
+            return
+        mm = self._map(size)
+        pos = self.end
+        while pos + _FRAME.size <= size:
+            (length,) = _FRAME.unpack_from(mm, pos)
+            if pos + _FRAME.size + length > size:
+                break  # Хвост еще дописывается (или оборван сбоем)
+            self.positions.append(pos)
+            pos += _FRAME.size + length
+        self.end = pos
+
+    def read(self, offset: int, max_records: int) -> List[Tuple[int, bytes]]:
+        index = offset - self.base_offset
+        if index < 0 or index >= len(self.positions):
+            return []
+        mm = self._map(self.end)
+        records = []
+        for i in range(index, min(index + max_records, len(self.positions))):
+            pos = self.positions[i]
+            (length,) = _FRAME.unpack_from(mm, pos)
+            start = pos + _FRAME.size
+            records.append((self.base_offset + i, mm[start : start + length]))
+        return records
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            self._mapped = 0
+
+
+class _TopicLog:
+    """Сегментированный append-only лог одного топика на локальном диске."""
+
+    def __init__(
+        self,
+        directory: Path,
+        segment_max_bytes: int,
+        retention_segments: Optional[int],
+        retention_seconds: Optional[float],
+        fsync: bool,
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.retention_segments = retention_segments
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self.segments: List[_Segment] = []
+        self._writer = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.refresh()
+
+    # --- Чтение ---
+    def refresh(self):
+        """Подхватывает новые сегменты и записи (в т.ч. от других процессов)."""
+        known = {segment.base_offset for segment in self.segments}
+        for path in sorted(self.directory.glob(f"*{_SEGMENT_SUFFIX}")):
+            base_offset = int(path.stem)
+            if base_offset not in known:
+                self.segments.append(_Segment(base_offset, path))
+        self.segments.sort(key=lambda segment: segment.base_offset)
+        for segment in self.segments:
+            segment.scan()
+
+    @property
+    def earliest_offset(self) -> int:
+        return self.segments[0].base_offset if self.segments else 0
+
+    @property
+    def next_offset(self) -> int:
+        return self.segments[-1].next_offset if self.segments else 0
+
+    def read(self, offset: int, max_records: int) -> List[Tuple[int, bytes]]:
+        if offset >= self.next_offset:
+            self.refresh()
+        offset = max(offset, self.earliest_offset)
+        for segment in self.segments:
+            if segment.base_offset <= offset < segment.next_offset:
+                return segment.read(offset, max_records)
+        return []
+
+    # --- Запись ---
+    def append(self, body: bytes) -> int:
+        if self._writer is None:
+            self._open_writer()
+        if self.segments[-1].end >= self.segment_max_bytes:
+            self._rotate()
+
+        segment = self.segments[-1]
+        offset = segment.next_offset
+        self._writer.write(_FRAME.pack(len(body)) + body)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+
+        segment.positions.append(segment.end)
+        segment.end += _FRAME.size + len(body)
+        return offset
+
+    def _open_writer(self):
+        self.refresh()
+        if not self.segments:
+            self._new_segment(0)
+            return
+        segment = self.segments[-1]
+        if segment.size() > segment.end:
+            # Восстановление после сбоя: отрезаем недописанный хвост
+            segment.close()
+            os.truncate(segment.path, segment.end)
+            print(f"[FILE BUS] 🩹 Обрезан оборванный хвост сегмента {segment.path.name}")
+        self._writer = open(segment.path, "ab")
+
+    def _new_segment(self, base_offset: int):
+        path = self.directory / f"{base_offset:020d}{_SEGMENT_SUFFIX}"
+        path.touch()
+        self.segments.append(_Segment(base_offset, path))
+        self._writer = open(path, "ab")
+
+    def _rotate(self):
+        self._writer.close()
+        self._new_segment(self.segments[-1].next_offset)
+        self._apply_retention()
+
+    def _apply_retention(self):
+        """Удаляет старые закрытые сегменты по количеству и/или возрасту."""
+        sealed = self.segments[:-1]
+        doomed = []
+        if self.retention_segments is not None:
+            excess = len(self.segments) - max(self.retention_segments, 1)
+            doomed.extend(sealed[: max(excess, 0)])
+        if self.retention_seconds is not None:
+            deadline = time.time() - self.retention_seconds
+            doomed.extend(
+                s for s in sealed if s not in doomed and s.path.stat().st_mtime < deadline
+            )
+
+        for segment in doomed:
+            segment.close()
+            segment.path.unlink(missing_ok=True)
+            self.segments.remove(segment)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for segment in self.segments:
+            segment.close()
+
+
+class FileLogMessageBus(IMessageBus):
+    """
+    Долговечная шина без брокера: append-only лог на локальном диске (локальная Кафка).
+
+    - каждый топик - каталог с сегментами, чтение через mmap;
+    - оффсеты consumer-групп хранятся рядом с логом (offsets/<group>.json);
+    - replay с любого оффсета, ротация сегментов и retention.
+
+    Один писатель на топик; читателей (в том числе в других процессах) - сколько угодно.
+    При stop() недочитанное не теряется: оно остается в логе после закоммиченного оффсета.
+    """
+
+    def __init__(
+        self,
+        root: str = "./storage/bus_log",
+        group_id: str = "octamillia_main_group",
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        retention_segments: Optional[int] = None,
+        retention_seconds: Optional[float] = None,
+        poll_interval: float = 0.2,
+        batch_size: int = 500,
+        fsync: bool = False,
+    ):
+        self.root = Path(root)
+        self.group_id = group_id
+        self.segment_max_bytes = segment_max_bytes
+        self.retention_segments = retention_segments
+        self.retention_seconds = retention_seconds
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+
+        self.logs: Dict[str, _TopicLog] = {}
+        # Будильники слушателей этого процесса (чужие процессы ловятся поллингом)
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self.consumers: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Позиции слушателей (следующий оффсет к доставке) и их доставки с ретраями
+        self.positions: Dict[str, int] = {}
+        self.deliveries: Dict[str, RetryingDelivery] = {}
+        # Колесо таймеров для ретраев всех подписок шины
+        self.wheel = TimerWheel()
+        self.closed = False
+
+    # --- Топики и оффсеты ---
+    def _topic_dir(self, topic: str) -> Path:
+        return self.root / quote(topic, safe="._-")
+
+    def _log(self, topic: str) -> _TopicLog:
+        log = self.logs.get(topic)
+        if log is None:
+            log = _TopicLog(
+                self._topic_dir(topic),
+                segment_max_bytes=self.segment_max_bytes,
+                retention_segments=self.retention_segments,
+                retention_seconds=self.retention_seconds,
+                fsync=self.fsync,
+            )
+            self.logs[topic] = log
+        return log
+
+    def _offset_path(self, topic: str, group_id: str) -> Path:
+        return self._topic_dir(topic) / "offsets" / f"{quote(group_id, safe='._-')}.json"
+
+    def committed_offset(self, topic: str, group_id: Optional[str] = None) -> int:
+        """Закоммиченный оффсет группы (0 - если группа новая: читаем с начала)."""
+        path = self._offset_path(topic, group_id or self.group_id)
+        if not path.exists():
+            return 0
+        return json.loads(path.read_text())["offset"]
+
+    def commit(self, topic: str, offset: int, group_id: Optional[str] = None):
+        """Атомарно сохраняет оффсет группы (следующая запись к чтению)."""
+        path = self._offset_path(topic, group_id or self.group_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"offset": offset}))
+        os.replace(tmp, path)
+
+    # --- IMessageBus ---
+    async def start(self):
+        """Снова открывает шину для публикаций после stop()."""
+        self.closed = False
+
+    async def publish(self, topic: str, message: OctaEvent):
+        """Дописывает тельце в конец лога топика и будит локальных слушателей."""
+        if self.closed:
+            raise BusClosedError(f"Файловая шина остановлена, '{topic}' не принят")
+        self._append(topic, message)
+
+    def _append(self, topic: str, message: OctaEvent):
+        offset = self._log(topic).append(pack_event(message))
+        print(f"[FILE BUS] 📤 '{message.event}' записано в '{topic}' (offset {offset}).")
+
+        wakeup = self._wakeups.get(topic)
+        if wakeup:
+            wakeup.set()
+
+    async def subscribe(
+        self, topic: str, handler: Callable, retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Запускает слушателя группы self.group_id с закоммиченного оффсета.
+        Для паттерна (orders.#) слушатели заводятся на каждый совпавший топик,
+        в том числе появившийся позже.
+        retry_policy включает ретраи и мертвые письма в <topic>.DLQ этого же лога.
+        """
+        if is_pattern(topic):
+            task = asyncio.create_task(self._pattern_watch(topic, handler, retry_policy))
+            self.consumers[(topic, self.group_id)] = task
+            print(f"[FILE BUS] 🎧 Подписка на паттерн '{topic}' ({self.group_id})")
+            return
+
+        key = (topic, self.group_id)
+        if key in self.consumers:
+            print(f"[FILE BUS] ⚠️ Топик '{topic}' уже имеет обработчик. Игнорируем.")
+            return
+
+        self._wakeups.setdefault(topic, asyncio.Event())
+        self.consumers[key] = asyncio.create_task(self._consume_loop(topic, handler, retry_policy))
+        print(f"[FILE BUS] 🎧 Подписка на '{topic}' ({self.group_id})")
+
+    async def replay(
+        self, topic: str, from_offset: int = 0
+    ) -> AsyncIterator[Tuple[int, OctaEvent]]:
+        """Проигрывает лог топика с произвольного оффсета (без коммита)."""
+        log = self._log(topic)
+        offset = from_offset
+        while True:
+            records = log.read(offset, self.batch_size)
+            if not records:
+                return
+            for offset, body in records:
+                yield offset, unpack_event(body)
+            offset += 1
+
+    async def stop(self, drain_timeout: float = 5.0) -> dict:
+        """
+        Останавливает шину: публикации отклоняются, слушатели дочитывают логи
+        не дольше drain_timeout, затем отменяются с коммитом доставленного.
+        В отчете - записи, оставшиеся в логе после оффсета группы.
+        """
+        self.closed = True
+
+        async def drained():
+            while any(
+                position < self.logs[topic].next_offset
+                for topic, position in self.positions.items()
+            ):
+                await asyncio.sleep(self.poll_interval / 4)
+            for delivery in self.deliveries.values():
+                while delivery.in_flight:
+                    await asyncio.gather(*delivery.in_flight, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(drained(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"[FILE BUS] ⏳ Дренаж не уложился в {drain_timeout}s, отменяю слушателей.")
+
+        tasks = list(self.consumers.values()) + [
+            task for delivery in self.deliveries.values() for task in delivery.in_flight
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.consumers.clear()
+        report = drain_report(
+            {
+                topic: self.logs[topic].next_offset - position
+                for topic, position in self.positions.items()
+            },
+            await self.wheel.close(),
+        )
+        self.positions.clear()
+        self.deliveries.clear()
+
+        for log in self.logs.values():
+            log.close()
+        self.logs.clear()
+        print(f"[FILE BUS] 🔴 Логи закрыты. Недоставлено: {report}")
+        return report
+
+    async def _pattern_watch(
+        self, pattern: str, handler: Callable, retry_policy: Optional[RetryPolicy]
+    ):
+        """Следит за каталогом логов и подписывает обработчик на новые совпавшие топики."""
+        regex = re.compile(pattern_to_regex(pattern))
+        while True:
+            if self.root.exists():
+                for path in self.root.iterdir():
+                    topic = unquote(path.name)
+                    key = (topic, self.group_id)
+                    if (
+                        path.is_dir()
+                        and key not in self.consumers
+                        and regex.match(topic)
+                        and not is_dead_letter_topic(topic)  # DLQ - только точная подписка
+                    ):
+                        self._wakeups.setdefault(topic, asyncio.Event())
+                        self.consumers[key] = asyncio.create_task(
+                            self._consume_loop(topic, handler, retry_policy)
+                        )
+                        print(f"[FILE BUS] 🔗 '{topic}' подключен к паттерну '{pattern}'")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _consume_loop(
+        self, topic: str, handler: Callable, retry_policy: Optional[RetryPolicy]
+    ):
+        # Ретраи и мертвые письма пишутся и во время дренажа (мимо проверки closed)
+        async def republish(dlq_topic: str, message: OctaEvent):
+            self._append(dlq_topic, message)
+
+        delivery = RetryingDelivery(
+            topic, handler, retry_policy, self.wheel, republish, tag="[FILE BUS]"
+        )
+        self.deliveries[topic] = delivery
+        log = self._log(topic)
+        wakeup = self._wakeups[topic]
+        offset = max(self.committed_offset(topic), log.earliest_offset)
+        self.positions[topic] = offset
+
+        try:
+            while True:
+                records = log.read(offset, self.batch_size)
+                if not records:
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                for record_offset, body in records:
+                    try:
+                        event = unpack_event(body)
+                    except Exception as e:
+                        print(f"[FILE BUS] ❌ Битая запись offset {record_offset} в {topic}: {e}")
+                    else:
+                        print(f"[FILE BUS] 📥 Получено из '{topic}': {event.event}")
+                        await delivery.deliver(event)
+                    # Оффсет двигается только после доставки: прерванная запись придет снова
+                    offset = self.positions[topic] = record_offset + 1
+
+                # At-least-once: коммитим после обработки пачки
+                self.commit(topic, offset)
+        finally:
+            # При отмене (stop) фиксируем все, что успели доставить
+            self.commit(topic, offset)
@@ -0,0 +1,58 @@
+# app/body/messaging/health.py
+import time
+
+
+class BusBreaker:
+    """
+    Автоматический выключатель (Circuit Breaker) для одной шины Сердца.
+
+    CLOSED    - шина здорова, публикации идут через нее.
+    OPEN      - шина отказала fail_max раз подряд; публикации ее пропускают,
+                а Сердце в фоне проверяет пульс шины.
+    HALF_OPEN - проба идет прямо сейчас; публикации все еще пропускают шину.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, fail_max: int = 3, reset_timeout: float = 5.0):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = ""
+
+    @property
+    def is_available(self) -> bool:
+        """Можно ли публиковать через шину прямо сейчас."""
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.last_error = ""
+
+    def record_failure(self, error: Exception) -> bool:
+        """
+        Учитывает сбой. Возвращает True, если именно этот сбой разомкнул цепь
+        (значит, Сердцу пора запускать фоновую пробу).
+        """
+        self.failures += 1
+        self.last_error = repr(error)
+        if self.state == self.CLOSED and self.failures >= self.fail_max:
+            self.trip()
+            return True
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        return False
+
+    def trip(self):
+        """Принудительно размыкает цепь (например, шина не стартовала)."""
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "last_error": self.last_error}
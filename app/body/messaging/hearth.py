@@ -1,21 +1,86 @@
 import asyncio
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional
 
 from app.body.blood import OctaEvent
-from app.body.interfaces import IMessageBus
+from app.body.interfaces import BusClosedError, IMessageBus
+from app.body.storage.blob_store import BlobStore
+
+from .claim_check import claim_check
+from .dedup import SeenWindow
+from .health import BusBreaker
+from .topic_trie import TopicTrie
 
 
 class HeartBus(IMessageBus):
     """
     Агрегатор всех шин данных.
     Работает как мультиплексор: отправляет во все, слушает из всех.
+
+    Для каждой шины Сердце держит выключатель (BusBreaker): отказавшая шина
+    пропускается при публикации, а ее пульс проверяется в фоне, пока она не оживет.
+
+    Политики маршрутизации (routing):
+    - "broadcast" - во все здоровые шины (по умолчанию);
+    - "primary"   - в первую здоровую шину из primary_order, при сбое - в следующую.
+    topic_routes задает предпочтительную шину для конкретного топика
+    (если она нездорова - срабатывает обычная политика).
+
+    claim_check_threshold включает claim check: payload от этого размера (байт JSON)
+    кладется в blob_store, а во все шины уходит тельце со ссылкой в заголовках
+    (получатели забирают payload через fetch_payload). claim_check_topics -
+    топики/паттерны, к которым это применяется (None - все).
     """
 
-    def __init__(self, buses: Dict[str, IMessageBus]):
+    BROADCAST = "broadcast"
+    PRIMARY = "primary"
+
+    def __init__(
+        self,
+        buses: Dict[str, IMessageBus],
+        dedup_ttl: float = 60.0,
+        dedup_max_size: int = 100_000,
+        routing: str = BROADCAST,
+        primary_order: Optional[List[str]] = None,
+        topic_routes: Optional[Dict[str, str]] = None,
+        publish_timeout: float = 5.0,
+        fail_max: int = 3,
+        reset_timeout: float = 5.0,
+        claim_check_threshold: Optional[int] = None,
+        claim_check_topics: Optional[List[str]] = None,
+        blob_store: Optional[BlobStore] = None,
+    ):
         self.buses = buses  # {'kafka': KafkaBus(...), 'inmemory': InMemoryBus(...)}
+        # Параметры окна дедупликации (одно окно на каждую подписку)
+        self.dedup_ttl = dedup_ttl
+        self.dedup_max_size = dedup_max_size
+
+        if routing not in (self.BROADCAST, self.PRIMARY):
+            raise ValueError(f"Неизвестная политика маршрутизации: {routing}")
+        self.routing = routing
+        self.primary_order = primary_order or list(buses.keys())
+        self.topic_routes = topic_routes or {}
+        self.publish_timeout = publish_timeout
+
+        # Здоровье шин: имя шины -> выключатель
+        self.breakers: Dict[str, BusBreaker] = {
+            name: BusBreaker(fail_max=fail_max, reset_timeout=reset_timeout) for name in buses
+        }
+        # Фоновые пробы отказавших шин
+        self._probe_tasks: Dict[str, asyncio.Task] = {}
+        self.closed = False
+
+        # Claim check больших payload (None - выключен)
+        self.claim_check_threshold = claim_check_threshold
+        self.blob_store = blob_store
+        self._claim_check_topics: Optional[TopicTrie] = None
+        if claim_check_topics is not None:
+            self._claim_check_topics = TopicTrie()
+            for pattern in claim_check_topics:
+                self._claim_check_topics.add(pattern, pattern)
 
     async def start(self):
         """Запускает все подключенные шины (если им это нужно)."""
+        self.closed = False
         for name, bus in self.buses.items():
             if hasattr(bus, "start"):
                 try:
@@ -23,52 +88,175 @@ class HeartBus(IMessageBus):
                     print(f"[HEART] ✅ Шина '{name}' запущена.")
                 except Exception as e:
                     print(f"[HEART] ⚠️ Ошибка запуска шины '{name}': {e}")
+                    # Не стартовавшая шина сразу выключается и уходит на пробы
+                    self.breakers[name].record_failure(e)
+                    self.breakers[name].trip()
+                    self._ensure_probe(name)
 
-    async def stop(self):
-        """Останавливает все шины."""
-        for name, bus in self.buses.items():
-            if hasattr(bus, "stop"):
-                await bus.stop()
+    async def stop(self, drain_timeout: float = 5.0) -> Dict[str, dict]:
+        """
+        Останавливает все шины: Сердце перестает принимать публикации,
+        шины дренируются параллельно (общий дедлайн drain_timeout, а не сумма).
+        Возвращает отчеты шин о недоставленном: имя шины -> отчет.
+        """
+        self.closed = True
+        for task in self._probe_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._probe_tasks.values(), return_exceptions=True)
+        self._probe_tasks.clear()
+
+        names = list(self.buses)
+        results = await asyncio.gather(
+            *(self.buses[name].stop(drain_timeout=drain_timeout) for name in names),
+            return_exceptions=True,
+        )
+        reports: Dict[str, dict] = {}
+        for name, result in zip(names, results, strict=True):
+            if isinstance(result, Exception):
+                print(f"[HEART] ⚠️ Ошибка остановки шины '{name}': {result!r}")
+                reports[name] = {"error": repr(result)}
+            else:
+                reports[name] = result
+        return reports
+
+    def get_health(self) -> Dict[str, dict]:
+        """Состояние выключателей всех шин."""
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
 
     async def publish(self, topic: str, message: OctaEvent, target_bus: str = None):
         """
         Отправляет сообщение.
-        Если target_bus не указан -> отправляет во ВСЕ живые шины (Broadcast).
+        Если target_bus не указан -> маршрутизирует по политике Сердца
+        (по умолчанию во ВСЕ живые шины - Broadcast).
         Если указан -> только в конкретную.
         """
+        if self.closed:
+            raise BusClosedError(f"Сердце остановлено, '{topic}' не принят")
+        if self.claim_check_threshold is not None and (
+            self._claim_check_topics is None or self._claim_check_topics.match(topic)
+        ):
+            # Один блоб на публикацию: во все шины едет одна и та же ссылка
+            message = await claim_check(message, self.claim_check_threshold, self.blob_store)
         if target_bus:
             # Точечная отправка (например, только в тесте)
-            if target_bus in self.buses:
-                await self.buses[target_bus].publish(topic, message)
-            else:
+            if target_bus not in self.buses:
                 print(f"[HEART] ❌ Шина '{target_bus}' не найдена.")
+            elif not self.breakers[target_bus].is_available:
+                print(f"[HEART] ⛔ Шина '{target_bus}' выключена, сообщение '{topic}' пропущено.")
+            else:
+                await self._publish_to(target_bus, topic, message)
             return
 
-        # Broadcast: качаем кровь везде
-        tasks = []
-        for name, bus in self.buses.items():
-            # Можно добавить проверку healthcheck, жива ли шина
-            tasks.append(bus.publish(topic, message))
+        # Предпочтение топика: если шина здорова и приняла сообщение - готово
+        preferred = self.topic_routes.get(topic)
+        if preferred in self.buses and self.breakers[preferred].is_available:
+            if await self._publish_to(preferred, topic, message):
+                return
+            # Предпочтительная шина отказала -> дальше по общей политике
 
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        candidates = [
+            name
+            for name in (self.primary_order if self.routing == self.PRIMARY else self.buses)
+            if name != preferred and self.breakers[name].is_available
+        ]
 
-    async def subscribe(self, topic: str, handler: Callable):
+        if self.routing == self.PRIMARY:
+            # Primary + fallback: первая здоровая шина, которая приняла сообщение
+            for name in candidates:
+                if await self._publish_to(name, topic, message):
+                    return
+            print(f"[HEART] ❌ Ни одна шина не приняла сообщение '{topic}'.")
+            return
+
+        # Broadcast: качаем кровь во все здоровые шины
+        if candidates:
+            await asyncio.gather(*(self._publish_to(name, topic, message) for name in candidates))
+
+    async def _publish_to(self, name: str, topic: str, message: OctaEvent) -> bool:
+        """Публикует в одну шину с таймаутом и учетом здоровья. True - успех."""
+        breaker = self.breakers[name]
+        try:
+            await asyncio.wait_for(
+                self.buses[name].publish(topic, message), timeout=self.publish_timeout
+            )
+        except Exception as e:
+            print(f"[HEART] ⚠️ Шина '{name}' не приняла сообщение '{topic}': {e!r}")
+            if breaker.record_failure(e):
+                print(f"[HEART] ⛔ Шина '{name}' выключена до восстановления пульса.")
+                self._ensure_probe(name)
+            return False
+
+        breaker.record_success()
+        return True
+
+    def _ensure_probe(self, name: str):
+        """Запускает фоновую пробу шины, если она еще не идет."""
+        task = self._probe_tasks.get(name)
+        if task and not task.done():
+            return
+        self._probe_tasks[name] = asyncio.create_task(self._probe_loop(name))
+
+    async def _probe_loop(self, name: str):
+        """Периодически щупает пульс выключенной шины, пока она не оживет."""
+        bus = self.buses[name]
+        breaker = self.breakers[name]
+
+        while True:
+            await asyncio.sleep(breaker.reset_timeout)
+            breaker.state = BusBreaker.HALF_OPEN
+            try:
+                if hasattr(bus, "health_check"):
+                    probe = bus.health_check()
+                elif hasattr(bus, "start"):
+                    probe = bus.start()
+                else:
+                    probe = asyncio.sleep(0)
+                await asyncio.wait_for(probe, timeout=self.publish_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                breaker.record_failure(e)
+                print(f"[HEART] 💔 Шина '{name}' все еще недоступна: {e!r}")
+                continue
+
+            breaker.record_success()
+            print(f"[HEART] 💓 Шина '{name}' снова в строю.")
+            return
+
+    async def subscribe(self, topic: str, handler: Callable, **options):
         """
         Подписывает обработчик Щупальца на этот топик во ВСЕХ шинах.
         Где бы ни появилось сообщение (Kafka или Memory), Щупальце его получит.
+        Broadcast-тельце приходит по каждой шине, поэтому доставка дедуплицируется
+        по event_id: обработчик вызывается один раз, по первой доставившей шине.
+        Упавшая доставка снимает отметку, чтобы ретрай (или копия из другой шины)
+        не был отброшен как дубль.
+
+        options (например, retry_policy) передаются в подписку каждой шины.
         """
+        # Общее окно для всех шин этой подписки
+        seen = SeenWindow(ttl=self.dedup_ttl, max_size=self.dedup_max_size)
+
         for name, bus in self.buses.items():
             # 👇 СОЗДАНИЕ КОНТЕКСТНОЙ ОБЕРТКИ
             # Эта функция будет вызвана underlying bus (KafkaBus или InMemoryBus)
             async def contextual_handler(event: OctaEvent, bus_name_for_closure=name):
+                event_id = getattr(event, "event_id", None)
+                if event_id and seen.seen(event_id):
+                    # Это же тельце уже пришло по другой шине
+                    return
                 # Вызываем оригинальный обработчик, передавая зафиксированное имя
-                await handler(event, source_bus=bus_name_for_closure)
+                try:
+                    await handler(event, source_bus=bus_name_for_closure)
+                except Exception:
+                    if event_id:
+                        seen.forget(event_id)
+                    raise
 
             try:
                 # Оригинальный bus подписывает обертку (contextual_handler),
                 # которая ожидает только один аргумент (event) от своего брокера.
-                await bus.subscribe(topic, contextual_handler)
+                await bus.subscribe(topic, contextual_handler, **options)
                 print(f"[HEART] 🔗 Привязал подписку '{topic}' к шине '{name}'")
             except Exception as e:
                 print(f"[HEART] ⚠️ Не удалось подписаться на '{name}': {e}")
@@ -1,68 +1,259 @@
 import asyncio
-from typing import Callable, Dict
+import zlib
+from itertools import count
+from typing import Callable, Dict, List, Optional, Sequence
 
 from app.body.blood import OctaEvent  # Ваш унифицированный тип
-from app.body.interfaces import IMessageBus
+from app.body.interfaces import BusClosedError, IMessageBus, drain_report
+
+from .lanes import PriorityLanes
+from .retry import (
+    RetryingDelivery,
+    RetryPolicy,
+    TimerWheel,
+    dead_letter_topic,
+    is_dead_letter_topic,
+    unwrap_dead_letter,
+)
+from .topic_trie import TopicTrie, validate_pattern
 
 
 class InMemoryMessageBus(IMessageBus):
-    def __init__(self):
-        # Queues: Топик (str) -> Очередь (asyncio.Queue)
-        self.queues: Dict[str, asyncio.Queue] = {}
-        # Handlers: Топик (str) -> Функция-обработчик (Callable)
+    """
+    Шина внутри одного event loop.
+
+    Подписка может быть паттерном: orders.*.created (ровно один сегмент)
+    или orders.# (ноль и больше сегментов). Очередь заводится на каждую подписку;
+    публикация находит подписки через дерево топиков (TopicTrie).
+
+    Очередь подписки разбита на полосы по OctaEvent.priority (PriorityLanes):
+    срочные события не ждут за массовым трафиком, а lane_weights задают,
+    сколько сообщений каждая полоса отдает за раунд (защита от голодания).
+
+    Подписка может задать RetryPolicy: упавшие доставки повторяются через общее
+    колесо таймеров, исчерпавшие попытки уходят в <topic>.DLQ (см. redrive).
+    <topic> - конкретный топик сообщения, даже если подписка - паттерн; DLQ-топики
+    доставляются только точной подписке, не wildcard-паттернам.
+
+    Очередь подписки может быть разбита на партиции (partitions / topic_partitions),
+    у каждой партиции свой слушатель. Тельца с одинаковым partition_key всегда
+    попадают в одну партицию (crc32 ключа) и обрабатываются по порядку, разные
+    ключи - параллельно, как в партициях Кафки. Тельца без ключа раскладываются
+    по партициям по кругу (без гарантии порядка между собой).
+
+    stop(drain_timeout) закрывает шину для публикаций, дает слушателям разобрать
+    очереди до дедлайна и отменяет их; недоставленное остается в очередях и в отчете.
+    """
+
+    def __init__(
+        self,
+        lane_weights: Sequence[int] = (8, 4, 1),
+        partitions: int = 1,
+        topic_partitions: Optional[Dict[str, int]] = None,
+    ):
+        self.lane_weights = lane_weights
+        # Число партиций: по умолчанию и для конкретных подписок/топиков
+        self.partitions = partitions
+        self.topic_partitions = topic_partitions or {}
+        # Queues: Подписка/Топик (str) -> Партиции (очереди с полосами приоритета)
+        self.queues: Dict[str, List[PriorityLanes]] = {}
+        # Handlers: Подписка (str) -> Функция-обработчик (Callable)
         self.handlers: Dict[str, Callable] = {}
+        # Дерево подписок: конкретный топик -> совпавшие подписки
+        self.subscriptions: TopicTrie[str] = TopicTrie()
+        # Доставка с ретраями: Подписка (str) -> RetryingDelivery
+        self.deliveries: Dict[str, RetryingDelivery] = {}
+        # Слушатели: Подписка (str) -> задачи партиций (ссылки держат их от GC, нужны для stop)
+        self.listeners: Dict[str, List[asyncio.Task]] = {}
+        # Круговой счетчик для телец без partition_key
+        self._round_robin = count()
+        self.wheel = TimerWheel()
+        self.closed = False
 
-    async def publish(self, topic: str, message: OctaEvent):
-        """Отправитель просто кладет сообщение в очередь."""
-        if topic not in self.queues:
-            # Создаем очередь, если ее нет (автоматическое создание топика)
-            self.queues[topic] = asyncio.Queue()
+    async def start(self):
+        """Снова открывает шину для публикаций после stop()."""
+        self.closed = False
 
+    async def publish(self, topic: str, message: OctaEvent):
+        """Отправитель кладет сообщение в очередь каждой совпавшей подписки."""
+        if self.closed:
+            raise BusClosedError(f"InMemory шина остановлена, '{topic}' не принят")
         print(f"[BUS] 📤 Сообщение '{message.event}' отправлено в топик '{topic}'.")
-        await self.queues[topic].put(message)
+        self._route(topic, message)
+
+    def _route(self, topic: str, message: OctaEvent):
+        matched = self.subscriptions.match(topic)
+        if is_dead_letter_topic(topic):
+            # orders.# не должен получать свои же мертвые письма из orders.x.DLQ
+            matched = [pattern for pattern in matched if pattern == topic]
+        if not matched:
+            # Подписчиков еще нет: копим сообщения в очереди топика
+            # (ее подхватит точная подписка на этот топик)
+            matched = [topic]
+
+        # В очереди подписки - (конкретный топик, тельце): паттерн топик не восстановит
+        for pattern in matched:
+            partitions = self._partitions(pattern)
+            partitions[self._partition_of(message, len(partitions))].put_nowait(
+                (topic, message), message.priority
+            )
+
+    def _partitions(self, topic: str) -> List[PriorityLanes]:
+        partitions = self.queues.get(topic)
+        if partitions is None:
+            size = self.topic_partitions.get(topic, self.partitions)
+            partitions = [PriorityLanes(self.lane_weights) for _ in range(max(1, size))]
+            self.queues[topic] = partitions
+        return partitions
 
-    async def subscribe(self, topic: str, handler: Callable):
-        """Регистрирует обработчик и запускает постоянную задачу прослушивания."""
+    def _partition_of(self, message: OctaEvent, size: int) -> int:
+        if size == 1:
+            return 0
+        key = getattr(message, "partition_key", None)
+        if key is None:
+            return next(self._round_robin) % size
+        # Стабильный хэш (в отличие от hash() не зависит от PYTHONHASHSEED)
+        return zlib.crc32(key.encode("utf-8")) % size
+
+    def qsize(self, topic: str) -> int:
+        """Сообщений в очереди подписки/топика (по всем партициям)."""
+        return sum(partition.qsize() for partition in self.queues.get(topic, ()))
+
+    async def subscribe(
+        self, topic: str, handler: Callable, retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Регистрирует обработчик и запускает постоянную задачу прослушивания.
+        topic может быть паттерном с wildcard (* и #).
+        """
+        validate_pattern(topic)
         if topic in self.handlers:
             # Убедимся, что на один топик подписывается только один обработчик
             print(f"[BUS] ⚠️ Топик '{topic}' уже имеет обработчик. Игнорируем.")
             return
 
-        if topic not in self.queues:
-            self.queues[topic] = asyncio.Queue()
-
+        partitions = self._partitions(topic)
         self.handlers[topic] = handler
+        # Ретраи и мертвые письма идут мимо проверки closed: их дожидается дренаж
+        self.deliveries[topic] = RetryingDelivery(
+            topic, handler, retry_policy, self.wheel, self._republish, tag="[BUS]"
+        )
+        self.subscriptions.add(topic, topic)
+
+        print(
+            f"[BUS] ✅ Подписка на топик '{topic}' установлена. "
+            f"Запускаем слушателей ({len(partitions)} партиций)..."
+        )
 
-        print(f"[BUS] ✅ Подписка на топик '{topic}' установлена. Запускаем слушателя...")
+        # Запускаем непрерывные задачи, которые будут "потреблять" сообщения.
+        self.listeners[topic] = [
+            asyncio.create_task(self._listener_task(topic, partition)) for partition in partitions
+        ]
+
+    async def unsubscribe(self, topic: str):
+        """Снимает подписку: слушатели отменяются, недоставленное из ее очереди отбрасывается."""
+        if topic not in self.handlers:
+            return
+        self.subscriptions.remove(topic, topic)
+        del self.handlers[topic]
+        self.deliveries.pop(topic, None)
+        current = asyncio.current_task()
+        listeners = [task for task in self.listeners.pop(topic, []) if task is not current]
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        self.queues.pop(topic, None)
+        print(f"[BUS] 🔕 Подписка на '{topic}' снята.")
 
-        # Запускаем непрерывную задачу, которая будет "потреблять" сообщения.
-        asyncio.create_task(self._listener_task(topic))
+    async def _republish(self, topic: str, message: OctaEvent):
+        self._route(topic, message)
 
-    async def _listener_task(self, topic: str):
+    async def _listener_task(self, topic: str, queue: PriorityLanes):
         """
-        Непрерывная задача прослушивания (Listener), которая достает сообщения
-        из очереди и вызывает обработчик Щупальца.
+        Непрерывная задача прослушивания (Listener) одной партиции, которая достает
+        сообщения из очереди и вызывает обработчик Щупальца.
         """
-        queue = self.queues[topic]
-        handler = self.handlers[topic]
+        delivery = self.deliveries[topic]
 
         while True:
             # Блокировка: ждем, пока в очереди появится сообщение
-            message: OctaEvent = await queue.get()
+            message_topic, message = await queue.get()
 
-            print(f"[BUS] 📥 Сообщение '{message.event}' получено из '{topic}'.")
+            print(f"[BUS] 📥 Сообщение '{message.event}' получено из '{message_topic}'.")
 
             # === СУТЬ ЛОГИКИ ОБРАБОТКИ ===
-            # Вызываем функцию-обработчик (метод Щупальца)
-            try:
-                # Предполагаем, что обработчик - это асинхронная функция
-                await handler(message)
-            except Exception as e:
-                print(f"[BUS] ❌ Ошибка обработки сообщения в {topic}: {e}")
+            # Вызываем функцию-обработчик (метод Щупальца); сбои уходят в ретраи/DLQ
+            await delivery.deliver(message, topic=message_topic)
 
             # Уведомляем очередь, что элемент обработан
             queue.task_done()
 
+    async def redrive(self, topic: str, limit: Optional[int] = None) -> int:
+        """
+        Переотправляет мертвые письма из <topic>.DLQ обратно в исходные топики.
+        Работает с письмами, которые никто не забрал (у DLQ нет подписчика).
+        Возвращает число переотправленных сообщений.
+        """
+        redriven = 0
+        for queue in self.queues.get(dead_letter_topic(topic), ()):
+            while not queue.empty() and (limit is None or redriven < limit):
+                _, letter = queue.get_nowait()
+                queue.task_done()
+                original_topic, original = unwrap_dead_letter(letter)
+                await self.publish(original_topic, original)
+                redriven += 1
+
+        print(f"[BUS] ♻️ Из {dead_letter_topic(topic)} переотправлено сообщений: {redriven}")
+        return redriven
+
+    async def stop(self, drain_timeout: float = 5.0) -> dict:
+        """
+        Останавливает шину: новые публикации отклоняются, слушатели дорабатывают
+        очереди (и уже снятые с колеса ретраи) не дольше drain_timeout, затем
+        отменяются. Отложенные на колесе ретраи не ждутся - они попадают в отчет.
+        """
+        self.closed = True
+
+        async def drained():
+            for topic in self.listeners:
+                for queue in self.queues[topic]:
+                    await queue.join()
+            for delivery in self.deliveries.values():
+                while delivery.in_flight:
+                    await asyncio.gather(*delivery.in_flight, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(drained(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"[BUS] ⏳ Дренаж не уложился в {drain_timeout}s, отменяю слушателей.")
+
+        for delivery in self.deliveries.values():
+            for task in delivery.in_flight:
+                task.cancel()
+        listeners = [task for tasks in self.listeners.values() for task in tasks]
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(
+            *listeners,
+            *(task for d in self.deliveries.values() for task in d.in_flight),
+            return_exceptions=True,
+        )
+        pending_retries = await self.wheel.close()
+
+        # Недоставленное = в очереди + взятое слушателем, но не подтвержденное
+        report = drain_report(
+            {topic: sum(q.unfinished() for q in queues) for topic, queues in self.queues.items()},
+            pending_retries,
+        )
+        # Подписки снимаются: после start() на них можно подписаться заново
+        for topic in list(self.listeners):
+            self.subscriptions.remove(topic, topic)
+        self.listeners.clear()
+        self.handlers.clear()
+        self.deliveries.clear()
+        print(f"[BUS] 🔴 Шина остановлена. Недоставлено: {report}")
+        return report
+
 
 # 1. Сборка Мозга (инициализация долговременных инстансов)
 bus = InMemoryMessageBus()
@@ -1,11 +1,40 @@
 import asyncio
-from typing import Callable
+from typing import Callable, Dict, List, Optional
 
 from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
 
-from app.body.blood import OctaEvent  # Ваша модель события
+from app.body.blood import (  # Ваша модель события
+    EventPriority,
+    OctaEvent,
+    decode_event,
+    encode_event,
+)
 
-from ..interfaces import IMessageBus
+from ..interfaces import BusClosedError, IMessageBus, drain_report
+from .retry import (
+    RetryingDelivery,
+    RetryPolicy,
+    TimerWheel,
+    dead_letter_topic,
+    unwrap_dead_letter,
+)
+from .topic_trie import is_pattern, pattern_to_regex
+
+# Полосы приоритета в Кафке - соседние топики: ORDER_TOPIC.__urgent, ORDER_TOPIC.__bulk.
+# NORMAL остается в исходном топике (совместимость со старыми продюсерами).
+PRIORITY_SUFFIXES = {
+    EventPriority.URGENT: ".__urgent",
+    EventPriority.BULK: ".__bulk",
+}
+
+
+# Заголовок записи с конвертом тельца; value записи - только payload
+ENVELOPE_HEADER = "octa-envelope"
+
+
+def priority_topic(topic: str, priority: int) -> str:
+    """Топик Кафки для полосы приоритета."""
+    return topic + PRIORITY_SUFFIXES.get(priority, "")
 
 
 class KafkaMessageBus(IMessageBus):
@@ -17,21 +46,60 @@ class KafkaMessageBus(IMessageBus):
         self.producer = None
         # Храним активные таски consumer-ов, чтобы они не собирались GC
         self.active_tasks = []
+        # Ретраи подписок: общее колесо таймеров на шину
+        self.deliveries: List[RetryingDelivery] = []
+        self.wheel = TimerWheel()
+        # Полосы, чей consumer прямо сейчас внутри обработчика (их ждет дренаж)
+        self.delivering: Dict[str, int] = {}
+        self.closed = False
 
     async def start(self):
         """Инициализация продюсера (нужно вызвать при старте Тела)"""
-        self.producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers)
-        await self.producer.start()
+        self.closed = False
+        if self.producer:
+            return
+        producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers)
+        try:
+            await producer.start()
+        except Exception:
+            # Не оставляем полуживой продюсер: следующий старт попробует заново
+            await producer.stop()
+            raise
+        self.producer = producer
         print(f"[KAFKA BUS] ✅ Продюсер подключен к {self.bootstrap_servers}")
 
-    async def stop(self):
-        """Гарантирует корректное завершение работы продюсера и консьюмеров."""
-        # 1. Сначала останавливаем Producer
-        if self.producer:
-            await self.producer.stop()
-            print("[KAFKA BUS] 🔴 Продюсер остановлен.")
+    async def health_check(self):
+        """Проба пульса для Сердца: поднимает продюсер и запрашивает метаданные кластера."""
+        if not self.producer:
+            await self.start()
+        await self.producer.client.fetch_all_metadata()
+
+    async def stop(self, drain_timeout: float = 5.0) -> dict:
+        """
+        Гарантирует корректное завершение работы продюсера и консьюмеров.
+        Публикации отклоняются сразу; consumer-ы дообрабатывают взятые сообщения
+        (не дольше drain_timeout) и новых не берут - непрочитанное остается в Кафке.
+        """
+        self.closed = True
+
+        # 1. Дренаж: ждем обработчики и снятые с колеса ретраи
+        async def drained():
+            while any(self.delivering.values()):
+                await asyncio.sleep(0.05)
+            for delivery in self.deliveries:
+                while delivery.in_flight:
+                    await asyncio.gather(*delivery.in_flight, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(drained(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"[KAFKA BUS] ⏳ Дренаж не уложился в {drain_timeout}s, отменяю consumer-ов.")
+        # Прерванные посреди обработки сообщения (их оффсет мог уйти в автокоммит)
+        undelivered = dict(self.delivering)
 
         # 2. Аккуратно отменяем все запущенные Consumer-таски
+        for delivery in self.deliveries:
+            self.active_tasks.extend(delivery.in_flight)
         if self.active_tasks:
             print(f"[KAFKA BUS] 🛑 Отменяю {len(self.active_tasks)} фоновых задач...")
             for task in self.active_tasks:
@@ -45,59 +113,161 @@ class KafkaMessageBus(IMessageBus):
 
         # Очищаем список после завершения
         self.active_tasks.clear()
+        self.delivering.clear()
+        report = drain_report(undelivered, await self.wheel.close())
+
+        # 3. Продюсер - последним: stop() досылает буфер (в т.ч. мертвые письма дренажа)
+        if self.producer:
+            await self.producer.stop()
+            self.producer = None
+            print("[KAFKA BUS] 🔴 Продюсер остановлен.")
+        if report["undelivered"] or report["pending_retries"]:
+            print(f"[KAFKA BUS] ⚠️ Недоставлено при остановке: {report}")
+        return report
 
     async def publish(self, topic: str, message: OctaEvent):
         """
-        Сериализуем OctaEvent в JSON и отправляем в байтах.
+        Сериализуем OctaEvent и отправляем в байтах:
+        конверт - в заголовке записи, payload - в value.
         """
+        if self.closed:
+            raise BusClosedError(f"Kafka шина остановлена, '{topic}' не принят")
+        await self._send(topic, message)
+
+    async def _send(self, topic: str, message: OctaEvent):
         if not self.producer:
             await self.start()  # Ленивый старт, если забыли вызвать явно
 
-        # Pydantic v2: model_dump_json() -> превращаем объект в строку
-        value_json = message.model_dump_json()
+        envelope, value = encode_event(message)
+        # Срочные и массовые тельца идут в свои топики-полосы
+        lane_topic = priority_topic(topic, message.priority)
 
         try:
-            await self.producer.send_and_wait(topic, value=value_json.encode("utf-8"))
-            print(f"[KAFKA BUS] 📤 Отправлено в '{topic}': {message.event}")
+            await self.producer.send_and_wait(
+                lane_topic,
+                value=value,
+                # Ключ записи -> партиция Кафки: порядок в пределах partition_key
+                key=message.partition_key.encode("utf-8") if message.partition_key else None,
+                headers=[(ENVELOPE_HEADER, envelope)],
+            )
+            print(f"[KAFKA BUS] 📤 Отправлено в '{lane_topic}': {message.event}")
         except Exception as e:
             print(f"[KAFKA BUS] ❌ Ошибка отправки: {e}")
+            # Пробрасываем дальше: Сердце учитывает сбой в здоровье шины
+            raise
 
-    async def subscribe(self, topic: str, handler: Callable):
+    async def subscribe(
+        self, topic: str, handler: Callable, retry_policy: Optional[RetryPolicy] = None
+    ):
         """
         Создает отдельную задачу (Consumer) для прослушивания топика.
+        На точный топик заводится по consumer-у на каждую полосу приоритета,
+        чтобы срочные сообщения не стояли за бэклогом массовых.
+        retry_policy включает ретраи через колесо таймеров и DLQ (<topic>.DLQ).
         """
         print(f"[KAFKA BUS] 🎧 Подписка на '{topic}' (Handler: {handler.__name__})")
 
+        if is_pattern(topic):
+            lanes = [topic]
+        else:
+            lanes = [topic] + [topic + suffix for suffix in PRIORITY_SUFFIXES.values()]
+
+        # Ретраи и мертвые письма уходят и во время дренажа (мимо проверки closed)
+        delivery = RetryingDelivery(
+            topic, handler, retry_policy, self.wheel, self._send, tag="[KAFKA BUS]"
+        )
+        self.deliveries.append(delivery)
+
         # Запускаем бесконечный цикл чтения в фоне
-        task = asyncio.create_task(self._consumption_loop(topic, handler))
-        self.active_tasks.append(task)
+        for lane_topic in lanes:
+            task = asyncio.create_task(self._consumption_loop(lane_topic, delivery))
+            self.active_tasks.append(task)
 
-    async def _consumption_loop(self, topic: str, handler: Callable):
+    async def _consumption_loop(self, topic: str, delivery: RetryingDelivery):
         """
         Внутренний цикл, который висит на Kafka и ждет сообщений.
         """
-        consumer = AIOKafkaConsumer(
-            topic,
+        consumer_options = dict(
             bootstrap_servers=self.bootstrap_servers,
             group_id=self.group_id,
             # Начинаем читать с ранних сообщений, если группа новая
             auto_offset_reset="earliest",
         )
+        if is_pattern(topic):
+            # orders.*.created / orders.# -> подписка Кафки по регулярке
+            consumer = AIOKafkaConsumer(**consumer_options)
+            # (полосы приоритета совпадают с тем же паттерном)
+            lanes = "|".join(suffix.replace(".", r"\.") for suffix in PRIORITY_SUFFIXES.values())
+            regex = pattern_to_regex(topic)
+            consumer.subscribe(pattern=f"^(?:{regex[1:-1]})(?:{lanes})?$")
+        else:
+            consumer = AIOKafkaConsumer(topic, **consumer_options)
 
         await consumer.start()
         try:
             async for msg in consumer:
                 try:
-                    # 1. Десериализация: Байты -> JSON -> OctaEvent
-                    payload_str = msg.value.decode("utf-8")
-                    event_data = OctaEvent.model_validate_json(payload_str)
+                    # 1. Десериализация: разбираем только конверт, payload - лениво
+                    event_data = self._decode_record(msg)
 
                     print(f"[KAFKA BUS] 📥 Получено из '{topic}': {event_data.event}")
 
-                    # 2. Вызов обработчика Щупальца
-                    await handler(event_data)
+                    # 2. Вызов обработчика Щупальца (сбои -> ретраи/DLQ)
+                    self.delivering[topic] = self.delivering.get(topic, 0) + 1
+                    try:
+                        await delivery.deliver(event_data)
+                    finally:
+                        self.delivering[topic] -= 1
 
                 except Exception as e:
                     print(f"[KAFKA BUS] ⚠️ Ошибка обработки сообщения: {e}")
+
+                if self.closed:
+                    # Остановка: следующее сообщение не берем, оно останется в топике
+                    break
+        finally:
+            await consumer.stop()
+
+    @staticmethod
+    def _decode_record(record):
+        """Запись Кафки -> тельце. Записи старых продюсеров (целый JSON без конверта) тоже."""
+        envelope = dict(record.headers or ()).get(ENVELOPE_HEADER)
+        if envelope is None:
+            return OctaEvent.model_validate_json(record.value)
+        return decode_event(envelope, record.value)
+
+    async def redrive(
+        self, topic: str, limit: Optional[int] = None, idle_timeout_ms: int = 1000
+    ) -> int:
+        """
+        Переотправляет мертвые письма из <topic>.DLQ обратно в исходные топики.
+        Читает DLQ отдельной группой (<group_id>.redrive), пока не дочитает до конца
+        (нет новых писем idle_timeout_ms) или до limit, и коммитит прочитанное.
+        """
+        consumer = AIOKafkaConsumer(
+            dead_letter_topic(topic),
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=f"{self.group_id}.redrive",
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+        )
+        await consumer.start()
+        redriven = 0
+        try:
+            while limit is None or redriven < limit:
+                max_records = None if limit is None else limit - redriven
+                batch = await consumer.getmany(timeout_ms=idle_timeout_ms, max_records=max_records)
+                if not batch:
+                    break
+                for records in batch.values():
+                    for record in records:
+                        letter = self._decode_record(record)
+                        original_topic, original = unwrap_dead_letter(letter)
+                        await self.publish(original_topic, original)
+                        redriven += 1
+                await consumer.commit()
         finally:
             await consumer.stop()
+
+        print(f"[KAFKA BUS] ♻️ Из {dead_letter_topic(topic)} переотправлено: {redriven}")
+        return redriven
@@ -0,0 +1,102 @@
+# app/body/messaging/lanes.py
+import asyncio
+from collections import deque
+from typing import Any, Deque, List, Sequence
+
+from app.body.blood import EventPriority
+
+
+class PriorityLanes:
+    """
+    Очередь с полосами приоритета и взвешенным round-robin между ними.
+
+    За один "раунд" полоса i отдает не больше weights[i] сообщений, после чего
+    уступает следующей - так срочные события обгоняют массовый трафик,
+    а нижние полосы не голодают. Когда у всех непустых полос кончились кредиты,
+    раунд начинается заново.
+
+    API повторяет asyncio.Queue: put/put_nowait, get, task_done, join, qsize.
+    """
+
+    def __init__(self, weights: Sequence[int] = (8, 4, 1)):
+        if not weights or any(w <= 0 for w in weights):
+            raise ValueError("Веса полос должны быть положительными")
+        self.weights = list(weights)
+        self._lanes: List[Deque[Any]] = [deque() for _ in weights]
+        self._credits = list(weights)
+        self._size = 0
+        self._getters: Deque[asyncio.Future] = deque()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def unfinished(self) -> int:
+        """Сообщения без task_done(): в очереди плюс взятые, но не обработанные."""
+        return self._unfinished
+
+    def lane_sizes(self) -> List[int]:
+        return [len(lane) for lane in self._lanes]
+
+    def _lane_of(self, priority: int) -> int:
+        # Неизвестные приоритеты прижимаются к крайним полосам
+        return min(max(int(priority), 0), len(self._lanes) - 1)
+
+    def put_nowait(self, item: Any, priority: int = EventPriority.NORMAL):
+        self._lanes[self._lane_of(priority)].append(item)
+        self._size += 1
+        self._unfinished += 1
+        self._finished.clear()
+        self._wake_next()
+
+    async def put(self, item: Any, priority: int = EventPriority.NORMAL):
+        self.put_nowait(item, priority)
+
+    def get_nowait(self) -> Any:
+        if not self._size:
+            raise asyncio.QueueEmpty
+        for _ in range(2):
+            for i, lane in enumerate(self._lanes):
+                if lane and self._credits[i] > 0:
+                    self._credits[i] -= 1
+                    self._size -= 1
+                    return lane.popleft()
+            # Кредиты непустых полос исчерпаны - новый раунд
+            self._credits = list(self.weights)
+        raise RuntimeError("PriorityLanes: рассинхронизация счетчика")  # pragma: no cover
+
+    async def get(self) -> Any:
+        while not self._size:
+            getter = asyncio.get_running_loop().create_future()
+            self._getters.append(getter)
+            try:
+                await getter
+            except asyncio.CancelledError:
+                getter.cancel()
+                if self._size and not getter.cancelled():
+                    # Нас разбудили, но мы уходим - будим следующего
+                    self._wake_next()
+                raise
+        return self.get_nowait()
+
+    def _wake_next(self):
+        while self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                break
+
+    def task_done(self):
+        if self._unfinished <= 0:
+            raise ValueError("task_done() вызван больше раз, чем было сообщений")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
@@ -0,0 +1,225 @@
+# app/body/messaging/retry.py
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.body.blood import OctaEvent
+
+# Топик мертвых писем: ORDER_TOPIC -> ORDER_TOPIC.DLQ
+DEAD_LETTER_SUFFIX = ".DLQ"
+DEAD_LETTER_EVENT = "DEAD_LETTER"
+
+
+def dead_letter_topic(topic: str) -> str:
+    return topic + DEAD_LETTER_SUFFIX
+
+
+def is_dead_letter_topic(topic: str) -> bool:
+    """DLQ-топики не совпадают с wildcard-подписками: только точная подписка."""
+    return topic.endswith(DEAD_LETTER_SUFFIX)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Политика повторной доставки для подписки.
+
+    max_attempts - всего попыток, включая первую;
+    задержка перед попыткой n+1: base_delay * multiplier**(n-1), не больше max_delay,
+    со случайным джиттером (доля jitter срезается случайно, чтобы ретраи не шли стаей).
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    dead_letter: bool = True  # Исчерпавшие попытки сообщения -> <topic>.DLQ
+
+    def delay(self, attempt: int) -> float:
+        """Задержка после неудачной попытки attempt (1, 2, ...)."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class TimerWheel:
+    """
+    Хэшированное колесо таймеров.
+
+    Тысячи отложенных ретраев живут в слотах колеса, а не в тысячах спящих задач:
+    одна задача-водитель проворачивает колесо раз в tick и запускает созревшие колбэки.
+    Водитель стартует лениво и засыпает, когда таймеров не осталось.
+    """
+
+    def __init__(self, tick: float = 0.05, slots: int = 512):
+        self.tick = tick
+        self.slots: List[List[list]] = [[] for _ in range(slots)]
+        self._cursor = 0
+        self._pending = 0
+        self._driver: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+        self._ticks = 0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        """Ставит callback через delay секунд. Возвращает хэндл для cancel()."""
+        ticks = max(1, round(delay / self.tick))
+        slot = (self._cursor + ticks) % len(self.slots)
+        # [оставшиеся обороты колеса, колбэк, отменен?]
+        timer = [(ticks - 1) // len(self.slots), callback, False]
+        self.slots[slot].append(timer)
+        self._pending += 1
+
+        if self._driver is None or self._driver.done():
+            self._started_at = time.monotonic()
+            self._ticks = 0
+            self._driver = asyncio.create_task(self._drive())
+        return timer
+
+    def cancel(self, timer: list):
+        if not timer[2]:
+            timer[2] = True
+            self._pending -= 1
+
+    async def _drive(self):
+        while self._pending:
+            # Держим шаг по монотонным часам, чтобы дрейф sleep не накапливался
+            self._ticks += 1
+            wake_at = self._started_at + self._ticks * self.tick
+            await asyncio.sleep(max(0.0, wake_at - time.monotonic()))
+
+            self._cursor = (self._cursor + 1) % len(self.slots)
+            bucket = self.slots[self._cursor]
+            due, keep = [], []
+            for timer in bucket:
+                if timer[2]:
+                    continue
+                if timer[0] > 0:
+                    timer[0] -= 1
+                    keep.append(timer)
+                else:
+                    due.append(timer)
+            self.slots[self._cursor] = keep
+
+            for timer in due:
+                timer[2] = True
+                self._pending -= 1
+                try:
+                    timer[1]()
+                except Exception as e:
+                    print(f"[RETRY] ❌ Ошибка колбэка таймера: {e}")
+
+    async def close(self) -> int:
+        """Останавливает колесо. Возвращает число так и не сработавших таймеров."""
+        pending = self._pending
+        if self._driver and not self._driver.done():
+            self._driver.cancel()
+            await asyncio.gather(self._driver, return_exceptions=True)
+        for bucket in self.slots:
+            bucket.clear()
+        self._pending = 0
+        return pending
+
+
+def make_dead_letter(topic: str, message: OctaEvent, error: Exception, attempts: int) -> OctaEvent:
+    """Заворачивает исчерпавшее попытки тельце в мертвое письмо с метаданными сбоя."""
+    try:
+        original = message.model_dump(mode="json")
+    except Exception:
+        original = message.model_dump()
+    return OctaEvent(
+        event=DEAD_LETTER_EVENT,
+        payload={
+            "topic": topic,
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "attempts": attempts,
+            "failed_at": datetime.now().isoformat(),
+            "original": original,
+        },
+        priority=message.priority,
+    )
+
+
+def unwrap_dead_letter(letter: OctaEvent) -> Tuple[str, OctaEvent]:
+    """Исходный топик и тельце из мертвого письма (для redrive)."""
+    payload = letter.payload
+    return payload["topic"], OctaEvent.model_validate(payload["original"])
+
+
+class RetryingDelivery:
+    """
+    Доставка сообщений одной подписки с ретраями.
+
+    Упавшая доставка ставится на колесо таймеров; когда попытки исчерпаны,
+    тельце уходит мертвым письмом в <topic>.DLQ через publish шины.
+    topic в deliver - конкретный топик сообщения (подписка может быть паттерном,
+    а мертвое письмо и redrive должны указывать на настоящий топик).
+    Мертвое письмо, на котором упал обработчик, повторно в DLQ не уходит.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        handler: Callable,
+        policy: Optional[RetryPolicy],
+        wheel: TimerWheel,
+        publish: Callable[[str, OctaEvent], Awaitable],
+        tag: str = "[BUS]",
+    ):
+        self.topic = topic
+        self.handler = handler
+        self.policy = policy
+        self.wheel = wheel
+        self.publish = publish
+        self.tag = tag
+        # Задачи ретраев, уже снятых с колеса и выполняющихся прямо сейчас
+        self.in_flight: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {"retried": 0, "dead_lettered": 0}
+
+    async def deliver(self, message: OctaEvent, attempt: int = 1, topic: Optional[str] = None):
+        try:
+            await self.handler(message)
+            return
+        except Exception as e:
+            error = e
+
+        topic = topic or self.topic
+        policy = self.policy
+        if policy is None:
+            # Без политики - прежнее поведение: сообщаем и отбрасываем
+            print(f"{self.tag} ❌ Ошибка обработки сообщения в {topic}: {error}")
+            return
+
+        if attempt < policy.max_attempts:
+            delay = policy.delay(attempt)
+            self.stats["retried"] += 1
+            print(
+                f"{self.tag} 🔁 '{message.event}' в {topic}: попытка {attempt} упала "
+                f"({error}), повтор через {delay:.2f}s"
+            )
+            self.wheel.schedule(delay, lambda: self._spawn(message, attempt + 1, topic))
+            return
+
+        print(f"{self.tag} ☠️ '{message.event}' в {topic}: попытки исчерпаны ({error})")
+        if message.event == DEAD_LETTER_EVENT or is_dead_letter_topic(topic):
+            # Письмо из DLQ обратно в DLQ не шлем: иначе цикл (и топик .DLQ.DLQ)
+            print(f"{self.tag} ⚠️ Мертвое письмо в {topic} отброшено")
+            return
+        if policy.dead_letter:
+            self.stats["dead_lettered"] += 1
+            letter = make_dead_letter(topic, message, error, attempt)
+            try:
+                await self.publish(dead_letter_topic(topic), letter)
+            except Exception as e:
+                print(f"{self.tag} ❌ Не удалось отправить мертвое письмо: {e}")
+
+    def _spawn(self, message: OctaEvent, attempt: int, topic: str):
+        task = asyncio.create_task(self.deliver(message, attempt, topic))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
@@ -0,0 +1,387 @@
+# app/body/messaging/shm_bus.py
+import asyncio
+import hashlib
+import os
+import socket
+import struct
+import tempfile
+import time
+from itertools import count
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.body.blood import OctaEvent, pack_event, unpack_event
+from app.body.interfaces import BusClosedError, IMessageBus, drain_report
+
+from .retry import RetryingDelivery, RetryPolicy, TimerWheel
+from .topic_trie import is_pattern
+
+try:  # POSIX: межпроцессная блокировка через flock
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+# Заголовок кольца: magic, slot_count, slot_size, reserved, head (следующий seq на запись)
+_HEADER = struct.Struct("<IIIIQ")
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 16
+# Заголовок слота: seq+1 записанного сообщения (0 - пусто), длина тела
+_SLOT = struct.Struct("<QI")
+_SLOT_HEADER_SIZE = 16
+_MAGIC = 0x4F435441  # "OCTA"
+
+# Как часто писатель перечитывает список сокетов подписчиков топика
+_PEERS_TTL = 1.0
+
+
+def _unix_dgram_socket() -> Optional[socket.socket]:
+    """Неблокирующий Unix datagram-сокет или None, если платформа их не умеет."""
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    except (AttributeError, OSError):
+        return None
+    sock.setblocking(False)
+    return sock
+
+
+class _FileLock:
+    """Межпроцессная блокировка на lock-файле (flock / msvcrt.locking)."""
+
+    def __init__(self, path: Path):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:  # pragma: no cover - Windows
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Ring:
+    """
+    Кольцевой буфер топика в разделяемой памяти (MPMC).
+
+    Писатели сериализуются lock-файлом; читатели не блокируются и проверяют
+    seq слота до и после копирования (seqlock), чтобы не прочитать
+    перезаписанный слот.
+    """
+
+    def __init__(self, name: str, slot_count: int, slot_size: int, lock_path: Path):
+        self.name = name
+        self.lock = _FileLock(lock_path)
+        size = _HEADER_SIZE + slot_count * slot_size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _HEADER.pack_into(self.shm.buf, 0, 0, slot_count, slot_size, 0, 0)
+            # magic пишется последним: сигнал подключающимся, что кольцо готово
+            struct.pack_into("<I", self.shm.buf, 0, _MAGIC)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self._wait_ready()
+        # Временем жизни сегмента управляет шина (owner), а не resource_tracker процесса
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        _, self.slot_count, self.slot_size, _, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        self.max_body = self.slot_size - _SLOT_HEADER_SIZE
+
+    def _wait_ready(self, timeout: float = 1.0):
+        deadline = time.monotonic() + timeout
+        while struct.unpack_from("<I", self.shm.buf, 0)[0] != _MAGIC:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Кольцо '{self.name}' не инициализировано создателем")
+            time.sleep(0.001)
+
+    @property
+    def head(self) -> int:
+        return struct.unpack_from("<Q", self.shm.buf, _HEAD_OFFSET)[0]
+
+    def _slot_offset(self, seq: int) -> int:
+        return _HEADER_SIZE + (seq % self.slot_count) * self.slot_size
+
+    def write(self, body: bytes) -> int:
+        if len(body) > self.max_body:
+            raise ValueError(
+                f"Сообщение {len(body)} байт не помещается в слот ({self.max_body} байт)"
+            )
+        buf = self.shm.buf
+        with self.lock:
+            seq = self.head
+            offset = self._slot_offset(seq)
+            # 1. Инвалидируем слот, 2. пишем тело, 3. публикуем seq и сдвигаем head
+            _SLOT.pack_into(buf, offset, 0, len(body))
+            start = offset + _SLOT_HEADER_SIZE
+            buf[start : start + len(body)] = body
+            _SLOT.pack_into(buf, offset, seq + 1, len(body))
+            struct.pack_into("<Q", buf, _HEAD_OFFSET, seq + 1)
+        return seq
+
+    def read(self, seq: int) -> Optional[bytes]:
+        """Тело сообщения seq или None, если слот уже перезаписан писателем."""
+        buf = self.shm.buf
+        offset = self._slot_offset(seq)
+        marker, length = _SLOT.unpack_from(buf, offset)
+        if marker != seq + 1:
+            return None
+        start = offset + _SLOT_HEADER_SIZE
+        body = bytes(buf[start : start + length])
+        if _SLOT.unpack_from(buf, offset)[0] != marker:
+            return None
+        return body
+
+    def close(self, unlink: bool = False):
+        self.shm.close()
+        self.lock.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class SharedMemoryMessageBus(IMessageBus):
+    """
+    Межпроцессная шина для процессов одного хоста.
+
+    Каждый топик - кольцевой буфер в multiprocessing.shared_memory: сериализованные
+    OctaEvent копируются прямо в слоты, без брокера и сетевого стека.
+    Писателей и читателей на топик может быть сколько угодно; каждый подписчик
+    получает все сообщения (fan-out) начиная с момента подписки.
+
+    Канал уведомлений - Unix datagram-сокеты подписчиков в notify_dir: писатель
+    будит их одним байтом. Где AF_UNIX недоступен, подписчики переходят на поллинг.
+    Отстающий читатель, которого обогнало кольцо, теряет перезаписанные сообщения
+    (счетчик self.lost). При stop() недочитанное подписчиками этого процесса
+    попадает в отчет: после остановки кольцо его перезапишет.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "octamillia",
+        slot_count: int = 256,
+        slot_size: int = 16 * 1024,
+        poll_interval: float = 0.05,
+        notify_dir: Optional[str] = None,
+        owner: bool = False,
+    ):
+        self.namespace = namespace
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.poll_interval = poll_interval
+        # Владелец удаляет сегменты разделяемой памяти при остановке
+        self.owner = owner
+        self.notify_dir = Path(notify_dir or Path(tempfile.gettempdir()) / f"octa_shm_{namespace}")
+        self.notify_dir.mkdir(parents=True, exist_ok=True)
+
+        self.rings: Dict[str, _Ring] = {}
+        self.active_tasks: List[asyncio.Task] = []
+        # Курсоры подписок (следующий seq к доставке): id подписки -> [топик, кольцо, курсор]
+        self.cursors: Dict[int, list] = {}
+        self.deliveries: List[RetryingDelivery] = []
+        self.closed = False
+        self.lost = 0
+        self.wheel = TimerWheel()
+        self._sockets: List[socket.socket] = []
+        self._sub_ids = count()
+        self._sender = _unix_dgram_socket()
+        # Кэш сокетов подписчиков: топик -> (момент устаревания, пути)
+        self._peers: Dict[str, tuple] = {}
+
+    def _ring_name(self, topic: str) -> str:
+        digest = hashlib.sha1(topic.encode("utf-8")).hexdigest()[:16]
+        return f"octa_{self.namespace}_{digest}"
+
+    def _ring(self, topic: str) -> _Ring:
+        ring = self.rings.get(topic)
+        if ring is None:
+            name = self._ring_name(topic)
+            ring = _Ring(name, self.slot_count, self.slot_size, self.notify_dir / f"{name}.lock")
+            self.rings[topic] = ring
+        return ring
+
+    def _topic_notify_dir(self, topic: str) -> Path:
+        path = self.notify_dir / self._ring_name(topic)
+        path.mkdir(exist_ok=True)
+        return path
+
+    async def start(self):
+        """Снова открывает шину для публикаций после stop()."""
+        self.closed = False
+
+    async def publish(self, topic: str, message: OctaEvent):
+        """Кладет сериализованное тельце в кольцо топика и будит подписчиков."""
+        if self.closed:
+            raise BusClosedError(f"SHM шина остановлена, '{topic}' не принят")
+        await self._write(topic, message)
+
+    async def _write(self, topic: str, message: OctaEvent):
+        seq = self._ring(topic).write(pack_event(message))
+        print(f"[SHM BUS] 📤 '{message.event}' записано в '{topic}' (seq {seq}).")
+        self._notify(topic)
+
+    def _notify(self, topic: str):
+        if not self._sender:
+            return
+        expires, peers = self._peers.get(topic, (0.0, []))
+        if time.monotonic() > expires:
+            peers = list(self._topic_notify_dir(topic).glob("*.sock"))
+            self._peers[topic] = (time.monotonic() + _PEERS_TTL, peers)
+
+        for sock_path in peers:
+            try:
+                self._sender.sendto(b"\x01", str(sock_path))
+            except BlockingIOError:
+                pass  # Очередь подписчика полна - он и так проснется
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Подписчик умер, не убрав за собой сокет
+                sock_path.unlink(missing_ok=True)
+
+    async def subscribe(
+        self, topic: str, handler: Callable, retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Запускает слушателя кольца топика с текущей головы.
+        retry_policy включает ретраи и мертвые письма в <topic>.DLQ.
+        """
+        if is_pattern(topic):
+            # Кольца адресуются хэшем конкретного топика - перечислить их нельзя
+            raise ValueError(f"SharedMemoryMessageBus не поддерживает паттерны: '{topic}'")
+        ring = self._ring(topic)
+        sub_id = next(self._sub_ids)
+        sock = _unix_dgram_socket() if self._sender else None
+        if sock:
+            sock_path = self._topic_notify_dir(topic) / f"{os.getpid()}_{sub_id}.sock"
+            sock_path.unlink(missing_ok=True)
+            try:
+                sock.bind(str(sock_path))
+            except OSError as e:
+                # Например, слишком длинный путь для AF_UNIX - слушаем поллингом
+                print(f"[SHM BUS] ⚠️ Сокет уведомлений недоступен ({e}), перехожу на поллинг")
+                sock.close()
+                sock = None
+        if sock:
+            self._sockets.append(sock)
+            self._peers.pop(topic, None)
+
+        # Ретраи и мертвые письма пишутся и во время дренажа (мимо проверки closed)
+        delivery = RetryingDelivery(
+            topic, handler, retry_policy, self.wheel, self._write, tag="[SHM BUS]"
+        )
+        self.deliveries.append(delivery)
+        self.cursors[sub_id] = [topic, ring, ring.head]
+        task = asyncio.create_task(self._listener_task(sub_id, delivery, sock))
+        self.active_tasks.append(task)
+        print(f"[SHM BUS] 🎧 Подписка на '{topic}' (кольцо {ring.name})")
+
+    async def _listener_task(
+        self, sub_id: int, delivery: RetryingDelivery, sock: Optional[socket.socket]
+    ):
+        loop = asyncio.get_running_loop()
+        state = self.cursors[sub_id]
+        topic, ring, cursor = state
+
+        while True:
+            head = ring.head
+            if cursor >= head:
+                await self._wait_for_signal(loop, sock)
+                continue
+
+            if head - cursor > ring.slot_count:
+                # Кольцо обогнало читателя: старые слоты уже перезаписаны
+                self.lost += head - cursor - ring.slot_count
+                cursor = head - ring.slot_count
+
+            body = ring.read(cursor)
+            cursor += 1
+            if body is None:
+                self.lost += 1
+                state[2] = cursor
+                continue
+
+            try:
+                event = unpack_event(body)
+            except Exception as e:
+                print(f"[SHM BUS] ❌ Битое сообщение в {topic}: {e}")
+            else:
+                print(f"[SHM BUS] 📥 Получено из '{topic}': {event.event}")
+                await delivery.deliver(event)
+            # Курсор подписки двигается только после доставки (его ждет дренаж)
+            state[2] = cursor
+
+    async def _wait_for_signal(self, loop, sock: Optional[socket.socket]):
+        if sock is None:
+            await asyncio.sleep(self.poll_interval)
+            return
+        try:
+            await asyncio.wait_for(loop.sock_recv(sock, 64), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        # Схлопываем накопившиеся уведомления: одно пробуждение на пачку
+        while True:
+            try:
+                sock.recv(64)
+            except BlockingIOError:
+                break
+
+    def _backlog(self, state: list) -> int:
+        topic, ring, cursor = state
+        return min(ring.head - cursor, ring.slot_count)
+
+    async def stop(self, drain_timeout: float = 5.0) -> dict:
+        """
+        Останавливает шину: публикации отклоняются, слушатели дочитывают кольца
+        не дольше drain_timeout, затем отменяются; сокеты и кольца закрываются.
+        """
+        self.closed = True
+
+        async def drained():
+            while any(self._backlog(state) > 0 for state in self.cursors.values()):
+                await asyncio.sleep(self.poll_interval / 4)
+            for delivery in self.deliveries:
+                while delivery.in_flight:
+                    await asyncio.gather(*delivery.in_flight, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(drained(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"[SHM BUS] ⏳ Дренаж не уложился в {drain_timeout}s, отменяю слушателей.")
+
+        tasks = self.active_tasks + [t for d in self.deliveries for t in d.in_flight]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.active_tasks.clear()
+
+        undelivered: Dict[str, int] = {}
+        for state in self.cursors.values():
+            undelivered[state[0]] = undelivered.get(state[0], 0) + self._backlog(state)
+        report = drain_report(undelivered, await self.wheel.close())
+        self.cursors.clear()
+        self.deliveries.clear()
+
+        if self._sender:
+            self._sender.close()
+            self._sender = None
+        for sock in self._sockets:
+            path = sock.getsockname()
+            sock.close()
+            Path(path).unlink(missing_ok=True)
+        self._sockets.clear()
+
+        for ring in self.rings.values():
+            ring.close(unlink=self.owner)
+        self.rings.clear()
+        print(f"[SHM BUS] 🔴 Кольца закрыты. Недоставлено: {report}")
+        return report
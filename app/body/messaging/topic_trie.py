@@ -0,0 +1,142 @@
+# app/body/messaging/topic_trie.py
+import re
+from typing import Dict, Generic, List, Optional, TypeVar
+
+V = TypeVar("V")
+
+SEPARATOR = "."
+# Ровно один сегмент: orders.*.created
+WILDCARD_ONE = "*"
+# Ноль или больше сегментов: orders.#
+WILDCARD_MANY = "#"
+
+
+def is_pattern(topic: str) -> bool:
+    """Содержит ли топик wildcard-сегменты."""
+    return any(seg in (WILDCARD_ONE, WILDCARD_MANY) for seg in topic.split(SEPARATOR))
+
+
+def validate_pattern(pattern: str) -> str:
+    """Проверяет, что wildcard занимают сегмент целиком (orders.* - да, orders.ord* - нет)."""
+    for segment in pattern.split(SEPARATOR):
+        if not segment:
+            raise ValueError(f"Пустой сегмент в топике '{pattern}'")
+        if segment not in (WILDCARD_ONE, WILDCARD_MANY) and (
+            WILDCARD_ONE in segment or WILDCARD_MANY in segment
+        ):
+            raise ValueError(f"Wildcard должен занимать сегмент целиком: '{pattern}'")
+    return pattern
+
+
+def pattern_to_regex(pattern: str) -> str:
+    """Переводит паттерн в регулярку (для брокеров с подпиской по regex, например Kafka)."""
+    segments = []
+    for segment in validate_pattern(pattern).split(SEPARATOR):
+        # Подряд идущие "#" эквивалентны одному
+        if not (segment == WILDCARD_MANY and segments and segments[-1] == WILDCARD_MANY):
+            segments.append(segment)
+    if segments == [WILDCARD_MANY]:
+        return r"^.*$"
+
+    parts = []
+    for i, segment in enumerate(segments):
+        if segment == WILDCARD_MANY:
+            # Ведущий "#" съедает сегменты вместе с точкой после них, остальные - перед
+            parts.append(r"(?:[^.]+\.)*" if i == 0 else r"(?:\.[^.]+)*")
+            continue
+        piece = r"[^.]+" if segment == WILDCARD_ONE else re.escape(segment)
+        leading = i == 0 or (i == 1 and segments[0] == WILDCARD_MANY)
+        parts.append(piece if leading else r"\." + piece)
+    return f"^{''.join(parts)}$"
+
+
+class _Node:
+    __slots__ = ("children", "star", "hash", "values")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.star: Optional["_Node"] = None
+        self.hash: Optional["_Node"] = None
+        self.values: list = []
+
+
+class TopicTrie(Generic[V]):
+    """
+    Скомпилированное дерево подписок по сегментам топика.
+
+    Стоимость match зависит от глубины топика (и числа wildcard-веток на пути),
+    а не от общего числа подписок. Результаты кэшируются по конкретному топику;
+    кэш сбрасывается при изменении набора подписок.
+    """
+
+    def __init__(self, cache_size: int = 10_000):
+        self._root = _Node()
+        self._cache: Dict[str, List[V]] = {}
+        self._cache_size = cache_size
+
+    def add(self, pattern: str, value: V):
+        node = self._root
+        for segment in validate_pattern(pattern).split(SEPARATOR):
+            if segment == WILDCARD_ONE:
+                node.star = node.star or _Node()
+                node = node.star
+            elif segment == WILDCARD_MANY:
+                node.hash = node.hash or _Node()
+                node = node.hash
+            else:
+                node = node.children.setdefault(segment, _Node())
+        node.values.append(value)
+        self._cache.clear()
+
+    def remove(self, pattern: str, value: V) -> bool:
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            if segment == WILDCARD_ONE:
+                node = node.star
+            elif segment == WILDCARD_MANY:
+                node = node.hash
+            else:
+                node = node.children.get(segment)
+            if node is None:
+                return False
+        if value not in node.values:
+            return False
+        node.values.remove(value)
+        self._cache.clear()
+        return True
+
+    def match(self, topic: str) -> List[V]:
+        """Все значения подписок, чьи паттерны совпали с конкретным топиком."""
+        cached = self._cache.get(topic)
+        if cached is not None:
+            return cached
+
+        segments = topic.split(SEPARATOR)
+        found: Dict[int, V] = {}
+        visited = set()
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if (id(node), i) in visited:
+                continue
+            visited.add((id(node), i))
+
+            if node.hash is not None:
+                # "#" съедает от нуля до всех оставшихся сегментов
+                for j in range(i, len(segments) + 1):
+                    stack.append((node.hash, j))
+            if i == len(segments):
+                for value in node.values:
+                    found.setdefault(id(value), value)
+                continue
+            child = node.children.get(segments[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            if node.star is not None:
+                stack.append((node.star, i + 1))
+
+        result = list(found.values())
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[topic] = result
+        return result
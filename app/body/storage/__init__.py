@@ -0,0 +1,4 @@
+from .blob_store import BlobStore, blob_store
+from .checkpoints import CheckpointStore, checkpoint_store
+from .commit_buffer import CommitBuffer, ICommitBackend, SQLiteCommitBackend, commit_buffer
+from .error_journal import ErrorJournal, error_journal
@@ -0,0 +1,75 @@
+# app/body/storage/blob_store.py
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Union
+
+
+class BlobStore:
+    """
+    Локальное хранилище блобов с адресацией по содержимому.
+
+    Ссылка на блоб - sha256 его байтов: одинаковые данные лежат один раз,
+    а содержимое по ссылке никогда не меняется (его можно кэшировать
+    и проверять). Файлы - <directory>/<первые 2 символа>/<sha256>;
+    запись атомарна (временный файл + os.replace).
+    """
+
+    def __init__(self, directory: Union[str, Path] = "./storage/blobs"):
+        # Относительный путь разрешается при обращении (от текущей директории)
+        self.directory = Path(directory)
+
+    def _path(self, ref: str) -> Path:
+        if len(ref) != 64 or not all(c in "0123456789abcdef" for c in ref):
+            raise ValueError(f"Некорректная ссылка на блоб: {ref!r}")
+        return self.directory / ref[:2] / ref
+
+    async def put(self, blob: bytes) -> str:
+        """Сохраняет байты, возвращает ссылку (sha256)."""
+        return await asyncio.to_thread(self._put, blob)
+
+    def _put(self, blob: bytes) -> str:
+        ref = hashlib.sha256(blob).hexdigest()
+        path = self._path(ref)
+        if path.exists():
+            return ref  # Те же байты уже лежат
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{ref}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return ref
+
+    async def get(self, ref: str) -> bytes:
+        """Байты по ссылке (FileNotFoundError - блоба нет)."""
+        return await asyncio.to_thread(self.read, ref)
+
+    def read(self, ref: str) -> bytes:
+        """Синхронное чтение (для потоков и скриптов)."""
+        return self._path(ref).read_bytes()
+
+    def exists(self, ref: str) -> bool:
+        return self._path(ref).exists()
+
+    async def prune(self, max_age: float) -> int:
+        """Удаляет блобы старше max_age секунд. Возвращает их число."""
+        return await asyncio.to_thread(self._prune, max_age)
+
+    def _prune(self, max_age: float) -> int:
+        if not self.directory.exists():
+            return 0
+        deadline = time.time() - max_age
+        removed = 0
+        for path in self.directory.glob("??/*"):
+            if not path.name.endswith(".tmp") and path.stat().st_mtime < deadline:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+# Общее хранилище блобов процесса
+blob_store = BlobStore()
@@ -0,0 +1,68 @@
+# app/body/storage/checkpoints.py
+import asyncio
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import quote, unquote
+
+_SUFFIX = ".json"
+
+
+class CheckpointStore:
+    """
+    Чекпоинты долгих прогонов конвейера: файл <correlation_id>.json на прогон.
+
+    Чекпоинт - словарь, который пишет конвейер: input_offset (сколько записей
+    входа обработано целиком), committed_watermark (сколько результатов
+    надежно в пред-жопии), stages (состояние по стадиям) и т.д.
+    Запись атомарна (временный файл + os.replace): после сбоя на диске
+    остается предыдущий целый чекпоинт, а не половина нового.
+    """
+
+    def __init__(self, directory: Union[str, Path] = "./storage/checkpoints"):
+        # Относительный путь разрешается при обращении (от текущей директории)
+        self.directory = Path(directory)
+
+    def _path(self, correlation_id: str) -> Path:
+        return self.directory / f"{quote(correlation_id, safe='')}{_SUFFIX}"
+
+    async def load(self, correlation_id: str) -> Optional[Dict[str, Any]]:
+        """Последний чекпоинт прогона или None."""
+        return await asyncio.to_thread(self._load, correlation_id)
+
+    def _load(self, correlation_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._path(correlation_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    async def save(self, correlation_id: str, state: Dict[str, Any]):
+        state = {**state, "correlation_id": correlation_id}
+        state["updated_at"] = datetime.now().isoformat()
+        await asyncio.to_thread(self._save, correlation_id, state)
+
+    def _save(self, correlation_id: str, state: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(correlation_id)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    async def clear(self, correlation_id: str):
+        """Удаляет чекпоинт (прогон завершен: повтор с тем же id начнется заново)."""
+        await asyncio.to_thread(self._path(correlation_id).unlink, missing_ok=True)
+
+    def list(self) -> List[str]:
+        """correlation_id прогонов с незавершенными чекпоинтами."""
+        if not self.directory.exists():
+            return []
+        return sorted(unquote(p.name[: -len(_SUFFIX)]) for p in self.directory.glob(f"*{_SUFFIX}"))
+
+
+# Общее хранилище чекпоинтов процесса
+checkpoint_store = CheckpointStore()
@@ -0,0 +1,239 @@
+# app/body/storage/commit_buffer.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Union
+
+from app.body.messaging.retry import RetryPolicy
+
+
+class ICommitBackend(ABC):
+    """Хранилище пред-жопия: принимает батч записей одной транзакцией."""
+
+    @abstractmethod
+    def write_batch(self, records: List[Dict[str, Any]]):
+        """Пишет батч целиком или не пишет ничего (бросает исключение). Вызывается из потока."""
+
+    def close(self):  # noqa: B027 - закрывать есть что не у всех бэкендов
+        """Освобождает ресурсы бэкенда (по умолчанию нечего)."""
+
+
+class SQLiteCommitBackend(ICommitBackend):
+    """
+    SQLite по умолчанию: один файл, одна транзакция (executemany) на батч.
+    Соединение открывается лениво в потоке писателя; путь разрешается при открытии.
+    """
+
+    def __init__(self, path: Union[str, Path] = "./storage/pre_ass.db", table: str = "results"):
+        self.path = Path(path)
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened_at: Optional[Path] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        target = self.path.resolve()
+        if self._conn is not None and self._opened_at == target:
+            return self._conn
+        self.close()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Пишут потоки asyncio.to_thread - по очереди, под self._lock
+        conn = sqlite3.connect(target, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, pipeline_id TEXT, correlation_id TEXT,"
+            " status TEXT, data TEXT, metadata TEXT, committed_at TEXT)"
+        )
+        self._conn, self._opened_at = conn, target
+        return conn
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        committed_at = datetime.now().isoformat()
+        rows = [
+            (
+                record["metadata"].get("pipeline_id"),
+                record["metadata"].get("correlation_id"),
+                record["status"],
+                json.dumps(record["data"], ensure_ascii=False, default=str),
+                json.dumps(record["metadata"], ensure_ascii=False, default=str),
+                committed_at,
+            )
+            for record in records
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:  # Транзакция: commit или rollback всего батча
+                conn.executemany(
+                    f"INSERT INTO {self.table} (pipeline_id, correlation_id, status, data,"
+                    " metadata, committed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def count(self, **match: Any) -> int:
+        """Число записей (match - по pipeline_id/correlation_id/status)."""
+        where = " AND ".join(f"{key} = ?" for key in match)
+        sql = f"SELECT COUNT(*) FROM {self.table}" + (f" WHERE {where}" if where else "")
+        with self._lock:
+            return self._connect().execute(sql, tuple(match.values())).fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = self._opened_at = None
+
+
+class CommitBuffer:
+    """
+    Пред-жопие: write-behind буфер успешных результатов конвейеров.
+
+    add() кладет результат в текущий батч; полный (batch_size) или
+    постаревший (flush_interval) батч запечатывается и встает в очередь
+    сброса. Фоновый сбросщик пишет батчи в бэкенд по одному (одна транзакция
+    на батч, I/O - в потоке). Неудачный сброс повторяется по retry_policy,
+    батч остается в голове очереди - порядок сохраняется. Когда
+    запечатанных батчей max_in_flight, add() ждет: память ограничена.
+
+    close() (или flush()) принудительно сбрасывает все; что не удалось
+    записать, остается в буфере и попадает в отчет.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[ICommitBackend] = None,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        max_in_flight: int = 8,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.backend = backend or SQLiteCommitBackend()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_in_flight = max_in_flight
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=5, base_delay=0.2)
+        self._current: List[Dict[str, Any]] = []
+        self._current_since = 0.0
+        # Запечатанные, но еще не записанные батчи (голова - пишется сейчас)
+        self._sealed: Deque[List[Dict[str, Any]]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flusher: Optional[asyncio.Task] = None
+        # Сбрасывает кто-то один: фоновый сбросщик или явный flush()
+        self._draining: Optional[asyncio.Lock] = None
+        self.stats = {"added": 0, "committed": 0, "batches": 0, "retries": 0, "failures": 0}
+
+    @property
+    def in_flight(self) -> int:
+        """Запечатанные батчи, ожидающие записи."""
+        return len(self._sealed)
+
+    def pending(self) -> int:
+        """Записи, еще не попавшие в бэкенд."""
+        return len(self._current) + sum(len(batch) for batch in self._sealed)
+
+    def _bind_loop(self):
+        """Примитивы синхронизации - для текущего event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Новый цикл (рестарт, тесты): старый сбросщик умер вместе со своим циклом
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._draining = asyncio.Lock()
+            self._flusher = None
+
+    def _ensure_flusher(self):
+        self._bind_loop()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = self._loop.create_task(self._flush_loop())
+
+    async def add(self, context: Any):
+        """Принимает результат (SuckerContext/FastSuckerContext или готовый словарь)."""
+        self._ensure_flusher()
+        record = context if isinstance(context, dict) else context.model_dump()
+        if not self._current:
+            self._current_since = time.monotonic()
+        self._current.append(record)
+        self.stats["added"] += 1
+        if len(self._current) >= self.batch_size:
+            await self._seal(wait_for_space=True)
+
+    async def _seal(self, wait_for_space: bool):
+        if wait_for_space and len(self._sealed) >= self.max_in_flight:
+            async with self._space:
+                await self._space.wait_for(lambda: len(self._sealed) < self.max_in_flight)
+        if self._current:
+            self._sealed.append(self._current)
+            self._current = []
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._current and time.monotonic() - self._current_since >= self.flush_interval:
+                await self._seal(wait_for_space=False)
+            await self._drain(self.retry_policy.max_attempts)
+
+    async def _drain(self, attempts: int) -> bool:
+        """Пишет запечатанные батчи по порядку. False - голова так и не записалась."""
+        async with self._draining:
+            return await self._drain_locked(attempts)
+
+    async def _drain_locked(self, attempts: int) -> bool:
+        while self._sealed:
+            batch = self._sealed[0]
+            for attempt in range(1, attempts + 1):
+                try:
+                    await asyncio.to_thread(self.backend.write_batch, batch)
+                    break
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    print(f"[CommitBuffer] 💥 Сброс батча ({len(batch)}) не удался: {e}")
+                    if attempt == attempts:
+                        return False  # Батч остается в голове до следующего сброса
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self.retry_policy.delay(attempt))
+            self._sealed.popleft()
+            self.stats["committed"] += len(batch)
+            self.stats["batches"] += 1
+            async with self._space:
+                self._space.notify_all()
+        return True
+
+    async def flush(self) -> bool:
+        """Запечатывает текущий батч и пишет все. False - часть осталась незаписанной."""
+        self._bind_loop()
+        await self._seal(wait_for_space=False)
+        return await self._drain(self.retry_policy.max_attempts)
+
+    async def close(self, timeout: float = 10.0) -> Dict[str, int]:
+        """Принудительный сброс при остановке. Возвращает отчет: что не записано."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self.pending():
+            try:
+                await asyncio.wait_for(self.flush(), timeout=timeout)
+            except asyncio.TimeoutError:
+                print(f"[CommitBuffer] ⏳ Сброс не уложился в {timeout}s")
+        await asyncio.to_thread(self.backend.close)
+        report = {"uncommitted": self.pending(), "in_flight": self.in_flight}
+        print(f"[CommitBuffer] 🔴 Буфер закрыт: {self.stats}, не записано: {report}")
+        return report
+
+
+# Общий буфер пред-жопия процесса (SQLite в ./storage/pre_ass.db)
+commit_buffer = CommitBuffer()
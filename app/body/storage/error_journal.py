@@ -0,0 +1,245 @@
+# app/body/storage/error_journal.py
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+_SEGMENT_PREFIX = "errors-"
+_SEGMENT_SUFFIX = ".jsonl"
+
+
+class ErrorJournal:
+    """
+    Журнал ошибок конвейеров ("жопа"): append-only JSONL в сегментах.
+
+    append() не блокирует и не трогает диск: запись ложится в ограниченный
+    буфер, а фоновый писатель сбрасывает его пачкой, когда набралось
+    flush_size записей или прошло flush_interval секунд. Файловый I/O идет
+    в потоке (asyncio.to_thread), так что всплеск ошибок не морозит event loop.
+    Если буфер переполнен, новые записи отбрасываются и считаются в dropped.
+
+    Сегмент называется по времени создания (errors-<epoch_ms>.jsonl)
+    и закрывается, когда превысит segment_bytes или станет старше
+    segment_age секунд; max_segments (если задан) ограничивает число
+    хранимых сегментов - самые старые удаляются.
+
+    Чтение (read/query/replay) видит только сброшенные записи: перед ним
+    можно вызвать flush(). Оборванная сбоем последняя строка пропускается.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = "./storage/ass_errors",
+        buffer_size: int = 10_000,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        segment_bytes: int = 16 * 1024 * 1024,
+        segment_age: Optional[float] = 24 * 3600,
+        max_segments: Optional[int] = None,
+    ):
+        # Относительный путь разрешается при записи (от текущей директории)
+        self.directory = Path(directory)
+        self.buffer_size = buffer_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.segment_age = segment_age
+        self.max_segments = max_segments
+        self._buffer: Deque[str] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Текущий сегмент: путь, время создания (epoch, с), размер
+        self._segment: Optional[Path] = None
+        self._segment_created = 0.0
+        self._segment_size = 0
+        self.stats = {"appended": 0, "written": 0, "dropped": 0, "flushes": 0, "segments": 0}
+
+    # =======================================================
+    # Запись
+    # =======================================================
+    def append(self, entry: Dict[str, Any]) -> bool:
+        """Ставит запись в буфер. False - буфер полон, запись отброшена."""
+        if len(self._buffer) >= self.buffer_size:
+            if not self.stats["dropped"]:
+                print(f"[ErrorJournal] ⚠️ Буфер переполнен ({self.buffer_size}), записи теряются")
+            self.stats["dropped"] += 1
+            return False
+        self._buffer.append(json.dumps(entry, ensure_ascii=False, default=str))
+        self.stats["appended"] += 1
+        self._ensure_writer()
+        if len(self._buffer) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _bind_loop(self) -> bool:
+        """Примитивы синхронизации - для текущего event loop. False - цикла нет."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._loop is not loop:
+            # Новый цикл (рестарт, тесты): старый писатель умер вместе со своим циклом
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._writer = None
+        return True
+
+    def _ensure_writer(self):
+        """Поднимает фонового писателя в текущем event loop (вне цикла - ждем flush)."""
+        if not self._bind_loop():
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = self._loop.create_task(self._writer_loop())
+
+    async def _writer_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Диск недоступен и т.п.: записи остаются в буфере до следующей попытки
+                print(f"[ErrorJournal] 💥 Не удалось сбросить журнал: {e}")
+
+    async def flush(self) -> int:
+        """Сбрасывает буфер на диск. Возвращает число записанных строк."""
+        self._bind_loop()
+        async with self._lock:
+            if not self._buffer:
+                return 0
+            lines = list(self._buffer)
+            await asyncio.to_thread(self._write, lines)
+            for _ in lines:
+                self._buffer.popleft()
+            return len(lines)
+
+    async def close(self):
+        """Останавливает писателя и дописывает буфер."""
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        written = await self.flush() if self._buffer else 0
+        print(f"[ErrorJournal] 🔴 Журнал закрыт (дописано при закрытии: {written}): {self.stats}")
+
+    # --- файловая часть (выполняется в потоке) ---
+    def _write(self, lines: List[str]):
+        blob = ("\n".join(lines) + "\n").encode("utf-8")
+        self._rotate_if_needed(len(blob))
+        with open(self._segment, "ab") as f:
+            f.write(blob)
+        self._segment_size += len(blob)
+        self.stats["written"] += len(lines)
+        self.stats["flushes"] += 1
+
+    def _rotate_if_needed(self, incoming: int):
+        now = time.time()
+        if self._segment is not None and self._segment.parent != self.directory:
+            self._segment = None  # Каталог журнала сменили на ходу
+        if self._segment is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # После рестарта продолжаем последний сегмент, если он еще не закрыт
+            segments = self.segments()
+            if segments:
+                self._open(segments[-1])
+        if self._segment is not None and self._segment.exists():
+            too_big = self._segment_size and self._segment_size + incoming > self.segment_bytes
+            too_old = (
+                self.segment_age is not None and now - self._segment_created > self.segment_age
+            )
+            if not (too_big or too_old):
+                return
+        created_ms = int(now * 1000)
+        if self._segment is not None:
+            # Имена сегментов строго растут, даже если два открыты в одну миллисекунду
+            created_ms = max(created_ms, _segment_created_ms(self._segment) + 1)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open(self.directory / f"{_SEGMENT_PREFIX}{created_ms:013d}{_SEGMENT_SUFFIX}")
+        self.stats["segments"] += 1
+        self._apply_retention()
+
+    def _open(self, path: Path):
+        self._segment = path
+        self._segment_created = _segment_created_ms(path) / 1000
+        self._segment_size = path.stat().st_size if path.exists() else 0
+
+    def _apply_retention(self):
+        if self.max_segments is None:
+            return
+        segments = self.segments()
+        for old in segments[: max(0, len(segments) - self.max_segments)]:
+            old.unlink(missing_ok=True)
+
+    # =======================================================
+    # Чтение
+    # =======================================================
+    def segments(self) -> List[Path]:
+        """Сегменты журнала от старых к новым."""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"))
+
+    def read(
+        self,
+        since: Optional[Union[datetime, str]] = None,
+        until: Optional[Union[datetime, str]] = None,
+        limit: Optional[int] = None,
+        **match: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Записи журнала по порядку (синхронно, для потоков и скриптов).
+        since/until - границы по timestamp записи; match - точное совпадение
+        полей верхнего уровня (pipeline_id=..., failed_at=...).
+        """
+        since = since.isoformat() if isinstance(since, datetime) else since
+        until = until.isoformat() if isinstance(until, datetime) else until
+        found = 0
+        for segment in self.segments():
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Оборванная сбоем строка
+                    timestamp = entry.get("timestamp") or ""
+                    if since is not None and timestamp < since:
+                        continue
+                    if until is not None and timestamp >= until:
+                        continue
+                    if any(entry.get(key) != value for key, value in match.items()):
+                        continue
+                    yield entry
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+
+    async def query(self, **filters: Any) -> List[Dict[str, Any]]:
+        """read() в потоке: список записей без блокировки event loop."""
+        return await asyncio.to_thread(lambda: list(self.read(**filters)))
+
+    async def replay(
+        self, handler: Callable[[Dict[str, Any]], Awaitable[Any]], **filters: Any
+    ) -> int:
+        """Передает найденные записи обработчику по порядку. Возвращает их число."""
+        entries = await self.query(**filters)
+        for entry in entries:
+            await handler(entry)
+        print(f"[ErrorJournal] ♻️ Переиграно записей: {len(entries)}")
+        return len(entries)
+
+
+def _segment_created_ms(path: Path) -> int:
+    return int(path.name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)])
+
+
+# Общий журнал процесса (каталог относительно текущей директории)
+error_journal = ErrorJournal()
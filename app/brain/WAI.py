@@ -68,6 +68,7 @@ class CommandDispatchTentacle(TentacleContract, ABC):
     _COMMAND_HANDLERS: Dict[str, str] = {}
     # НОВЫЙ КОНТРАКТ: Для асинхронных событий (подписывается Мозгом на шину)
     # Ключ: Имя Топика/События (вена/артерия). Значение: Имя метода-обработчика.
+    # Ключ может быть паттерном: "orders.*.created" (один сегмент), "orders.#" (любые).
     _EVENT_HANDLERS: Dict[str, str] = {}
 
     def __init__(self, **kwargs):
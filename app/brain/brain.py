@@ -1,8 +1,11 @@
 # app/brain/brain.py
 import importlib
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
+from app.body.messaging.topic_trie import is_pattern, validate_pattern
+
+from .bus_client import BusTentacleClient
 from .dependency_provider import BodyServiceProvider
 from .external_client import ExternalTentacleClient
 from .logger import logger
@@ -22,7 +25,9 @@ class Brain:
 
     def __init__(self, body_provider: BodyServiceProvider):
         self.registry = WAI_REGISTRY
-        self.active_external_tentacles: Dict[str, ExternalTentacleClient] = {}
+        self.active_external_tentacles: Dict[
+            str, Union[ExternalTentacleClient, BusTentacleClient]
+        ] = {}
         self.last_used_index: Dict[str, int] = {}
         self.command_map = {}  # Карта пока пуста
         self.body_provider = body_provider
@@ -50,8 +55,13 @@ class Brain:
             try:
                 module = importlib.import_module(module_path)
 
-                if hasattr(module, "TENTACLE_METADATA"):
-                    metadata = module.TENTACLE_METADATA
+                if not hasattr(module, "TENTACLE_METADATA"):
+                    continue
+                # Модуль может предложить несколько щупалец (фабрика конвейеров из YAML)
+                offers = module.TENTACLE_METADATA
+                if not isinstance(offers, list):
+                    offers = [offers]
+                for metadata in offers:
                     if metadata.tentacle_id not in self.registry:
                         self.registry[metadata.tentacle_id] = metadata
                         # 1. Создаем Инстанс Щупальца, используя инжекцию!
@@ -84,6 +94,19 @@ class Brain:
                 cmap[cmd].append(meta.tentacle_id)
         return cmap
 
+    def attach_bus_tentacle(self, tentacle_id: str, **client_options) -> BusTentacleClient:
+        """
+        Подключает внешнее щупальце через шину (request/reply вместо HTTP).
+        Сами щупальца на той стороне запускают serve_commands() на свои команды.
+        """
+        message_bus = self.body_provider.get_common_dependencies().get("message_bus")
+        if not message_bus:
+            raise RuntimeError("Шина сообщений не найдена: RPC по шине недоступен.")
+        client = BusTentacleClient(message_bus, **client_options)
+        self.active_external_tentacles[tentacle_id] = client
+        print(f"  [BRAIN]: Щупальце {tentacle_id} подключено через шину ({client.reply_topic}).")
+        return client
+
     def initiate_regeneration(self, tentacle_id: str):
         """Паттерн Регенерации: Мозг дает команду Телу отрастить новое щупальце."""
         # Только если это внешняя тентакля
@@ -188,12 +211,23 @@ class Brain:
         handlers = instance.get_event_handlers()
 
         for topic, method_name in handlers.items():
+            # Ключ _EVENT_HANDLERS может быть паттерном: orders.*.created, orders.#
+            try:
+                validate_pattern(topic)
+            except ValueError as e:
+                print(f"  [BRAIN WARNING]: {instance.tentacle_id}.{method_name}: {e}")
+                continue
+
             handler_method = getattr(instance, method_name)
 
             # Теперь подписка идет в СЕРДЦЕ -> которое подписывает И Kafka, И Memory
             await message_bus.subscribe(topic, handler_method)
 
-            print(f"  [BRAIN ASYNCSYNC]: Подписка {instance.tentacle_id}.{method_name} -> {topic}")
+            kind = "паттерн" if is_pattern(topic) else "топик"
+            print(
+                f"  [BRAIN ASYNCSYNC]: Подписка {instance.tentacle_id}.{method_name} -> "
+                f"{kind} {topic}"
+            )
 
 
 # =======================================================
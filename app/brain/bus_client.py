@@ -0,0 +1,181 @@
+# app/brain/bus_client.py
+import asyncio
+import time
+from typing import Any, Dict, Iterable, Optional
+from uuid import uuid4
+
+from app.body.blood import EventPriority, OctaEvent
+from app.body.interfaces import IMessageBus
+from app.body.messaging.health import BusBreaker
+
+from .models import OctaResponse
+from .WAI import CommandContext, TentacleContract
+
+# Команды идут в COMMAND.<имя команды>, ответы - в общий топик ответов
+COMMAND_TOPIC_PREFIX = "COMMAND."
+DEFAULT_REPLY_TOPIC = "COMMAND_REPLY"
+COMMAND_EVENT = "COMMAND_REQUEST"
+REPLY_EVENT = "COMMAND_REPLY"
+# Заголовки тельца, по которым ответ находит ожидающий его запрос
+REPLY_TO_HEADER = "reply_to"
+CORRELATION_HEADER = "correlation_id"
+
+
+def command_topic(command_name: str) -> str:
+    return COMMAND_TOPIC_PREFIX + command_name
+
+
+class BusTentacleClient:
+    """
+    RPC-клиент внешнего щупальца поверх шины (request/reply).
+
+    Тот же контракт, что у ExternalTentacleClient (process_command, get_health),
+    но без HTTP: CommandContext публикуется в COMMAND.<команда>, ответ OctaResponse
+    приходит в общий топик ответов и сопоставляется с ожидающим future по correlation_id.
+    Щупальца масштабируются членством в группе консьюмеров - адреса Мозгу не нужны.
+
+    Пульс не опрашивается: здоровье - это предохранитель по таймаутам ответов.
+    Через reset_timeout после размыкания предохранитель переходит в HALF_OPEN
+    и пропускает один пробный запрос: успех замыкает цепь, сбой - снова OPEN.
+    """
+
+    def __init__(
+        self,
+        bus: IMessageBus,
+        reply_topic: str = DEFAULT_REPLY_TOPIC,
+        timeout: float = 30.0,
+        fail_max: int = 3,
+        reset_timeout: float = 10.0,
+    ):
+        self.bus = bus
+        self.reply_topic = reply_topic
+        self.timeout = timeout
+        self.breaker = BusBreaker(fail_max=fail_max, reset_timeout=reset_timeout)
+        # correlation_id -> future ответа
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.stats: Dict[str, int] = {"sent": 0, "replied": 0, "timeouts": 0, "orphans": 0}
+        self._listening = False
+        self._probing = False  # Пробный запрос HALF_OPEN уже в пути
+        self._listen_lock = asyncio.Lock()
+
+    async def start(self):
+        """Подписка на топик ответов (один раз на клиента)."""
+        async with self._listen_lock:
+            if self._listening:
+                return
+            await self.bus.subscribe(self.reply_topic, self._on_reply)
+            self._listening = True
+
+    async def process_command(
+        self, context: CommandContext, timeout: Optional[float] = None
+    ) -> OctaResponse[Any]:
+        await self.start()
+        breaker = self.breaker
+        probe = breaker.state == BusBreaker.HALF_OPEN and not self._probing
+        if probe:
+            self._probing = True
+        try:
+            return await self._request(context, timeout)
+        finally:
+            if probe:
+                self._probing = False
+
+    async def _request(
+        self, context: CommandContext, timeout: Optional[float]
+    ) -> OctaResponse[Any]:
+        # correlation_id контекста - ключ идемпотентности и может повторяться,
+        # поэтому каждый запрос получает свой суффикс
+        correlation_id = f"{context.correlation_id}:{uuid4().hex[:12]}"
+        future = asyncio.get_running_loop().create_future()
+        self.pending[correlation_id] = future
+
+        request = OctaEvent(
+            event=COMMAND_EVENT,
+            payload=context.model_dump(mode="json"),
+            headers={REPLY_TO_HEADER: self.reply_topic, CORRELATION_HEADER: correlation_id},
+        )
+        try:
+            await self.bus.publish(command_topic(context.command_name), request)
+            self.stats["sent"] += 1
+            response = await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError as e:
+            self.stats["timeouts"] += 1
+            self.breaker.record_failure(e)
+            print(f"[BUS RPC] ⏳ Нет ответа на {context.command_name} ({correlation_id})")
+            return OctaResponse.fail(
+                f"Таймаут ответа на команду {context.command_name}", correlation_id=correlation_id
+            )
+        except Exception as e:
+            self.breaker.record_failure(e)
+            print(f"[BUS RPC] ❌ Не удалось отправить {context.command_name}: {e}")
+            return OctaResponse.fail(f"Шина недоступна: {e}", correlation_id=correlation_id)
+        finally:
+            # Поздний ответ на снятый запрос уйдет в orphans
+            self.pending.pop(correlation_id, None)
+
+        self.breaker.record_success()
+        return response
+
+    async def _on_reply(self, event: OctaEvent, source_bus: Optional[str] = None):
+        future = self.pending.pop(event.headers.get(CORRELATION_HEADER, ""), None)
+        if future is None or future.done():
+            # Ответ на запрос, который уже истек, или чужой ответ в общем топике
+            self.stats["orphans"] += 1
+            return
+        try:
+            future.set_result(OctaResponse.model_validate(event.payload))
+        except Exception as e:
+            future.set_result(OctaResponse.fail(f"Некорректный ответ щупальца: {e}"))
+        self.stats["replied"] += 1
+
+    async def get_health(self) -> float:
+        breaker = self.breaker
+        if (
+            breaker.state == BusBreaker.OPEN
+            and time.monotonic() - breaker.opened_at >= breaker.reset_timeout
+        ):
+            # Пора пробовать: следующий запрос станет пробным
+            breaker.state = BusBreaker.HALF_OPEN
+        if breaker.state == BusBreaker.HALF_OPEN:
+            return 0.0 if self._probing else 1.0
+        return 1.0 if breaker.is_available else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self.pending), **self.breaker.snapshot()}
+
+
+async def serve_commands(
+    bus: IMessageBus,
+    tentacle: TentacleContract,
+    commands: Optional[Iterable[str]] = None,
+    **subscribe_options,
+):
+    """
+    Сторона щупальца: подписывает его на COMMAND.<команда> для каждой команды
+    (по умолчанию - все get_capabilities()) и публикует OctaResponse в reply_to запроса.
+    """
+
+    async def handle(event: OctaEvent, source_bus: Optional[str] = None):
+        reply_to = event.headers.get(REPLY_TO_HEADER)
+        correlation_id = event.headers.get(CORRELATION_HEADER, "")
+        try:
+            context = CommandContext.model_validate(event.payload)
+            response = await tentacle.process_command(context)
+        except Exception as e:
+            print(f"[BUS RPC] ❌ Ошибка исполнения команды ({correlation_id}): {e}")
+            response = OctaResponse.fail(str(e))
+
+        if not reply_to:
+            return
+        reply = OctaEvent(
+            event=REPLY_EVENT,
+            payload=response.model_dump(mode="json"),
+            headers={CORRELATION_HEADER: correlation_id},
+            # Ответ не должен стоять в очереди за массовым трафиком
+            priority=min(event.priority, EventPriority.NORMAL),
+        )
+        await bus.publish(reply_to, reply)
+
+    for command in commands or tentacle.get_capabilities():
+        await bus.subscribe(command_topic(command), handle, **subscribe_options)
+        print(f"[BUS RPC] 🎧 {type(tentacle).__name__} обслуживает {command_topic(command)}")
@@ -5,14 +5,16 @@ from app.body.messaging.hearth import HeartBus
 
 
 class BodyServiceProvider:
-    def __init__(self, logger_instance, bus_implementations: Dict[str, IMessageBus]):
+    def __init__(
+        self, logger_instance, bus_implementations: Dict[str, IMessageBus], **heart_options
+    ):
         self.logger = logger_instance
 
         # 1. Храним реализации, которые нам передали
         self.bus_implementations = bus_implementations
 
-        # 2. Создаем Сердце из того, что получили
-        self.heart = HeartBus(buses=self.bus_implementations)
+        # 2. Создаем Сердце из того, что получили (heart_options - политики Сердца)
+        self.heart = HeartBus(buses=self.bus_implementations, **heart_options)
 
         print("[PROVIDER] Провайдер инициализирован. Шины загружены извне.")
 
@@ -1,8 +1,13 @@
 # app/suckers/base.py
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Mapping, MutableMapping, Sequence
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+
+try:  # NumPy необязателен: без него столбцы - обычные списки
+    import numpy as np
+except ImportError:  # pragma: no cover - окружение без numpy
+    np = None
 
 
 class SuckerContext(BaseModel):
@@ -13,8 +18,220 @@ class SuckerContext(BaseModel):
     status: str = "PROCESSING"  # PROCESSING, SUCCESS, ERROR
 
 
+class LayeredMetadata(dict):
+    """
+    Метаданные записи: свой слой (обычный dict) поверх общих метаданных конвейера.
+
+    Запись и чтение своих ключей идут по быстрому пути dict, чужие ключи
+    читаются из shared (__missing__). Итерация, len, сравнение и repr видят
+    объединенное содержимое; общий слой не копируется и не изменяется.
+    """
+
+    __slots__ = ("shared",)
+
+    def __init__(self, shared: Mapping[str, Any], *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.shared = shared
+
+    def __missing__(self, key: str) -> Any:
+        return self.shared[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.shared.get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or key in self.shared
+
+    def flatten(self) -> Dict[str, Any]:
+        """Обычный словарь: общие ключи, затем свои (свои перекрывают общие)."""
+        merged = dict(self.shared)
+        merged.update(dict.items(self))
+        return merged
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.flatten())
+
+    def __len__(self) -> int:
+        return len(self.flatten())
+
+    def keys(self):
+        return self.flatten().keys()
+
+    def items(self):
+        return self.flatten().items()
+
+    def values(self):
+        return self.flatten().values()
+
+    def copy(self) -> Dict[str, Any]:
+        return self.flatten()
+
+    def __eq__(self, other: object) -> bool:
+        return self.flatten() == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self.flatten())
+
+    def __reduce__(self):
+        return (dict, (self.flatten(),))
+
+
+def plain_metadata(metadata: Mapping[str, Any]) -> Dict[str, Any]:
+    """Метаданные для краев (pydantic, JSON, другой процесс): всегда обычный dict."""
+    if isinstance(metadata, LayeredMetadata):
+        return metadata.flatten()
+    return dict(metadata)
+
+
+class FastSuckerContext:
+    """
+    Контекст присосок для горячего пути конвейера: те же поля, что у SuckerContext,
+    но на __slots__ и без валидации. В pydantic-модель превращается только
+    на краях - в ответе команды и в событиях шины (to_model / model_dump).
+
+    metadata - LayeredMetadata над общими метаданными конвейера: присоски
+    дописывают ключи в свой слой, а общая часть не копируется на каждую запись.
+    """
+
+    __slots__ = ("data", "metadata", "status")
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        metadata: MutableMapping[str, Any],
+        status: str = "PROCESSING",
+    ):
+        self.data = data
+        self.metadata = metadata
+        self.status = status
+
+    @classmethod
+    def over(cls, data: Dict[str, Any], shared: Mapping[str, Any], **extra: Any):
+        """Контекст записи поверх общих метаданных (shared не изменяется)."""
+        return cls(data, LayeredMetadata(shared, extra))
+
+    def model_dump(self) -> Dict[str, Any]:
+        """То же, что SuckerContext.model_dump(): для payload событий."""
+        return {"data": self.data, "metadata": plain_metadata(self.metadata), "status": self.status}
+
+    def to_model(self) -> SuckerContext:
+        return SuckerContext(
+            data=self.data, metadata=plain_metadata(self.metadata), status=self.status
+        )
+
+    def __repr__(self) -> str:
+        return f"FastSuckerContext(status={self.status!r}, data={self.data!r})"
+
+
+def as_column(values: Sequence[Any]) -> Any:
+    """Столбец батча: numpy-массив (если numpy есть), иначе список."""
+    if np is None:
+        return list(values)
+    if isinstance(values, np.ndarray):
+        return values
+    try:
+        column = np.asarray(values)
+    except ValueError:  # Разнородные вложенные значения
+        column = None
+    # numpy молча приводит ["a", 3] к строкам, а вложенные списки - к матрице:
+    # в таких случаях храним значения как есть в объектном массиве
+    if (
+        column is None
+        or column.ndim != 1
+        or (column.dtype.kind == "U" and not all(isinstance(v, str) for v in values))
+    ):
+        column = np.empty(len(values), dtype=object)
+        column[:] = list(values)
+    return column
+
+
+class SuckerBatch(BaseModel):
+    """
+    Колоночный батч записей, передаваемый между присосками в пакетном режиме.
+
+    columns - имя поля -> столбец значений (numpy-массив или список),
+    row_ids - исходные номера записей: по ним адресуются отбракованные строки.
+    Отбракованная запись (reject) удаляется из всех столбцов, причина
+    остается в errors, а конвейер продолжает работу с остальными.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    columns: Dict[str, Any]
+    row_ids: List[int]
+    metadata: Dict[str, Any]
+    status: str = "PROCESSING"  # PROCESSING, SUCCESS, ERROR, ROLLBACK
+    errors: Dict[int, str] = Field(default_factory=dict)  # row_id -> причина отбраковки
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], metadata: Dict[str, Any]):
+        """Транспонирует записи в столбцы. Набор полей у всех записей должен совпадать."""
+        fields = list(records[0]) if records else []
+        for i, record in enumerate(records):
+            if record.keys() != set(fields):
+                raise ValueError(f"Запись {i} не совпадает по полям с первой: {sorted(record)}")
+        columns = {name: as_column([record[name] for record in records]) for name in fields}
+        return cls(columns=columns, row_ids=list(range(len(records))), metadata=metadata)
+
+    @property
+    def size(self) -> int:
+        return len(self.row_ids)
+
+    def record(self, position: int) -> Dict[str, Any]:
+        """Одна запись батча (по позиции, не по row_id)."""
+        return {name: py_value(column[position]) for name, column in self.columns.items()}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        plain = {name: _to_list(column) for name, column in self.columns.items()}
+        return [{name: plain[name][i] for name in plain} for i in range(self.size)]
+
+    def reject(self, positions: Dict[int, str]):
+        """Отбраковывает записи: позиция в батче -> причина."""
+        if not positions:
+            return
+        for position, reason in positions.items():
+            self.errors[self.row_ids[position]] = reason
+        keep = [i for i in range(self.size) if i not in positions]
+        self.row_ids = [self.row_ids[i] for i in keep]
+        for name, column in self.columns.items():
+            if np is not None and isinstance(column, np.ndarray):
+                self.columns[name] = column[keep]
+            else:
+                self.columns[name] = [column[i] for i in keep]
+
+
+def py_value(value: Any) -> Any:
+    """numpy-скаляр -> обычное значение Python (для JSON и pydantic)."""
+    return value.item() if np is not None and isinstance(value, np.generic) else value
+
+
+def _to_list(column: Any) -> list:
+    return column.tolist() if np is not None and isinstance(column, np.ndarray) else list(column)
+
+
 class ISucker(ABC):
-    """Контракт присоски"""
+    """
+    Контракт присоски.
+
+    Пакетный режим необязателен: присоска может реализовать
+    async def process_batch(self, batch: SuckerBatch) -> SuckerBatch.
+    Для присосок без него конвейер прогоняет батч через process() по записи.
+
+    В process() конвейер передает FastSuckerContext (data, metadata, status -
+    как у SuckerContext, метаданные - dict или LayeredMetadata).
+
+    Компиляция тоже необязательна: def compile_step(self) -> Optional[CompiledStep]
+    (app.suckers.compiler) описывает присоску как чистое преобразование/проверку
+    значений, и компилятор сливает ее с соседями в один проход по записи.
+    None - присоска в текущей конфигурации не компилируется.
+
+    get_config()["deterministic"] = True - результат зависит только от data
+    и конфигурации: исполнитель кэширует его (app.suckers.memo).
+    """
 
     @abstractmethod
     async def process(self, context: SuckerContext) -> SuckerContext:
@@ -0,0 +1,197 @@
+# app/suckers/compiler.py
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.suckers.base import FastSuckerContext, ISucker
+from app.suckers.execution import INLINE, SuckerExecutor, default_executor
+from app.suckers.profiling import PipelineProfiler
+
+# Метка метаданных: (metadata, ключи записи) -> None
+Mark = Callable[[Dict[str, Any], List[str]], None]
+
+
+class Rejected(Exception):
+    """Значение не прошло проверку шага (бросается из CompiledStep.apply)."""
+
+
+class CompiledStep:
+    """
+    Присоска в форме, понятной компилятору конвейера (см. ISucker.compile_step).
+
+    apply - чистое преобразование одного значения записи; проверка возвращает
+    значение как есть или бросает Rejected, а reject_message(ключ, значение)
+    дает текст ошибки. marks - что присоска пишет в метаданные после успешной
+    обработки; fuse - слияние с идущим следом шагом: новый шаг или None.
+    Шаг без apply (например, выключенный логгер) оставляет только метки
+    и в проход по данным не попадает.
+    """
+
+    __slots__ = ("name", "op", "params", "apply", "reject_message", "marks", "fuse")
+
+    def __init__(
+        self,
+        name: str,
+        op: str,
+        params: Optional[Dict[str, Any]] = None,
+        apply: Optional[Callable[[Any], Any]] = None,
+        reject_message: Optional[Callable[[str, Any], str]] = None,
+        marks: Optional[List[Mark]] = None,
+        fuse: Optional[Callable[["CompiledStep"], Optional["CompiledStep"]]] = None,
+    ):
+        self.name = name
+        self.op = op
+        self.params = params or {}
+        self.apply = apply
+        self.reject_message = reject_message
+        self.marks = marks or []
+        self.fuse = fuse
+
+
+def _compose(first: Callable[[Any], Any], second: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda value: second(first(value))
+
+
+class _Segment:
+    """Подряд идущие компилируемые присоски: один проход по значениям записи."""
+
+    def __init__(self, steps: List[CompiledStep]):
+        self.names = [step.name for step in steps]
+        # Метки - в исходном порядке присосок, с номером присоски в сегменте
+        self.marks: List[Tuple[int, Mark]] = [
+            (index, mark) for index, step in enumerate(steps) for mark in step.marks
+        ]
+        # Исходные шаги - для точного разбора записи, которая не прошла проверку
+        self.steps = [(index, step) for index, step in enumerate(steps) if step.apply]
+        # Соседние шаги сливаются (check_int + x3 + x2 -> одно int() * 6)
+        self.ops: List[CompiledStep] = []
+        for _, step in self.steps:
+            merged = None
+            if self.ops and self.ops[-1].fuse is not None:
+                merged = self.ops[-1].fuse(step)
+            if merged is not None:
+                self.ops[-1] = merged
+            else:
+                self.ops.append(step)
+        self._apply = None
+        for op in self.ops:
+            self._apply = op.apply if self._apply is None else _compose(self._apply, op.apply)
+
+    @property
+    def name(self) -> str:
+        return "+".join(self.names)
+
+    def describe(self) -> str:
+        ops = " -> ".join(f"{step.op}{step.params or ''}" for step in self.ops)
+        return f"fused[{' + '.join(self.names)}]: {ops or 'только метки'}"
+
+    def run(self, context: FastSuckerContext) -> Optional[str]:
+        """Прогоняет запись; при ошибке возвращает имя присоски, на которой она случилась."""
+        keys = list(context.data)
+        if self._apply is not None:
+            apply = self._apply
+            try:
+                context.data = {key: apply(value) for key, value in context.data.items()}
+            except Rejected:
+                return self._reject(context, keys)
+        for _, mark in self.marks:
+            mark(context.metadata, keys)
+        return None
+
+    def _reject(self, context: FastSuckerContext, keys: List[str]) -> str:
+        """
+        Медленный путь для отбракованной записи: без слияния каждая присоска
+        увидела бы все ключи до следующей, поэтому ошибка - у самой ранней
+        присоски, а внутри нее - у первого ключа.
+        """
+        steps = self.steps
+        failed: Optional[Tuple[int, str]] = None
+        for key, value in context.data.items():
+            for index, step in steps:
+                try:
+                    value = step.apply(value)
+                except Rejected:
+                    failed = (index, step.reject_message(key, value))
+                    steps = [s for s in steps if s[0] < index]
+                    break
+
+        index, error = failed
+        for mark_index, mark in self.marks:
+            if mark_index < index:
+                mark(context.metadata, keys)
+        context.status = "ERROR"
+        context.data = {"error": error}
+        return self.names[index]
+
+
+class CompiledPipeline:
+    """
+    Скомпилированная цепочка присосок: один вызов run() на запись.
+
+    Компилируемые присоски (с compile_step) подряд сливаются в сегмент -
+    один проход по данным; остальные остаются отдельными стадиями и
+    выполняются как обычно (через executor). Результат совпадает
+    с последовательным прогоном исходных присосок.
+    """
+
+    def __init__(
+        self,
+        stages: List[Union[_Segment, ISucker]],
+        executor: Optional[SuckerExecutor] = None,
+    ):
+        self.stages = stages
+        self.executor = executor or default_executor
+
+    def describe(self) -> List[str]:
+        return [
+            stage.describe() if isinstance(stage, _Segment) else stage.__class__.__name__
+            for stage in self.stages
+        ]
+
+    async def run(
+        self, context: FastSuckerContext, profiler: Optional[PipelineProfiler] = None
+    ) -> Tuple[FastSuckerContext, Optional[str]]:
+        """
+        Прогоняет запись по всем стадиям. Возвращает контекст и имя присоски,
+        на которой конвейер остановился (статус ERROR/ROLLBACK), либо None.
+        profiler учитывает стадии как есть: сегмент - одна стадия "A+B+C".
+        """
+        for stage in self.stages:
+            mark = profiler.begin() if profiler is not None else None
+            if isinstance(stage, _Segment):
+                failed_at = stage.run(context)
+                if profiler is not None:
+                    profiler.end_status(stage.name, mark, context.status)
+                if failed_at is not None:
+                    return context, failed_at
+                continue
+            context = await self.executor.run(stage, context)
+            if profiler is not None:
+                profiler.end_status(stage.__class__.__name__, mark, context.status)
+            if context.status in ("ERROR", "ROLLBACK"):
+                return context, stage.__class__.__name__
+        return context, None
+
+
+def compile_pipeline(
+    suckers: List[ISucker], executor: Optional[SuckerExecutor] = None
+) -> CompiledPipeline:
+    """
+    Собирает CompiledPipeline по compile_step() присосок. Присоски, вынесенные
+    в пулы (execution=thread/process), не сливаются: они остаются стадиями.
+    """
+    executor = executor or default_executor
+    stages: List[Union[_Segment, ISucker]] = []
+    run: List[CompiledStep] = []
+    for sucker in suckers:
+        step = None
+        if hasattr(sucker, "compile_step") and executor.execution_of(sucker) == INLINE:
+            step = sucker.compile_step()
+        if step is not None:
+            run.append(step)
+            continue
+        if run:
+            stages.append(_Segment(run))
+            run = []
+        stages.append(sucker)
+    if run:
+        stages.append(_Segment(run))
+    return CompiledPipeline(stages, executor)
@@ -0,0 +1,291 @@
+# app/suckers/execution.py
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import pickle
+import threading
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.suckers.base import FastSuckerContext, ISucker, plain_metadata
+from app.suckers.memo import SuckerMemo, sucker_memo
+
+# Классы исполнения присоски (get_config()["execution"])
+INLINE = "inline"  # Прямо в event loop (по умолчанию)
+THREAD = "thread"  # Общий пул потоков: блокирующий I/O, код, отпускающий GIL
+PROCESS = "process"  # Общий пул процессов: CPU-тяжелые присоски
+EXECUTION_CLASSES = (INLINE, THREAD, PROCESS)
+
+# Запись между процессами: только data/metadata/status, без pydantic-обертки
+Packed = Tuple[Dict[str, Any], Dict[str, Any], str]
+
+
+def execution_class(sucker: ISucker) -> str:
+    """Класс исполнения присоски: get_config()["execution"], по умолчанию inline."""
+    try:
+        value = sucker.get_config().get("execution", INLINE)
+    except Exception:
+        return INLINE
+    if value not in EXECUTION_CLASSES:
+        raise ValueError(
+            f"{sucker.__class__.__name__}: неизвестный класс исполнения '{value}', "
+            f"ожидается один из {EXECUTION_CLASSES}"
+        )
+    return value
+
+
+def offload_batch(sucker: ISucker) -> int:
+    """Сколько записей отправлять в пул одним заданием: get_config()["offload_batch"]."""
+    try:
+        return max(1, int(sucker.get_config().get("offload_batch", 1)))
+    except Exception:
+        return 1
+
+
+def _pack(context: FastSuckerContext) -> Packed:
+    # Слоистые метаданные в процесс уходят плоским словарем
+    return (context.data, plain_metadata(context.metadata), context.status)
+
+
+# =======================================================
+# Сторона воркера (пул процессов / пул потоков)
+# =======================================================
+# Присоски, уже распакованные в процессе воркера: ключ -> инстанс
+_worker_suckers: Dict[str, ISucker] = {}
+_WORKER_SUCKERS_LIMIT = 32
+# Свой event loop на каждый поток воркера: process() у присоски асинхронный
+_worker_local = threading.local()
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_worker_local, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        _worker_local.loop = loop
+    return loop
+
+
+def _process_packed(sucker: ISucker, items: Sequence[Packed]) -> List[Union[Packed, Exception]]:
+    """Прогоняет записи через process() присоски; сбой одной записи не мешает остальным."""
+    loop = _worker_loop()
+    results: List[Union[Packed, Exception]] = []
+    for data, metadata, status in items:
+        try:
+            context = loop.run_until_complete(
+                sucker.process(FastSuckerContext(data, metadata, status))
+            )
+            results.append(_pack(context))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _run_in_process(key: str, blob: bytes, items: Sequence[Packed]) -> list:
+    """Точка входа задания в пуле процессов."""
+    sucker = _worker_suckers.get(key)
+    if sucker is None:
+        sucker = pickle.loads(blob)
+        if len(_worker_suckers) >= _WORKER_SUCKERS_LIMIT:
+            _worker_suckers.pop(next(iter(_worker_suckers)))
+        _worker_suckers[key] = sucker
+    results = _process_packed(sucker, items)
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            try:
+                pickle.dumps(result)
+            except Exception:
+                # Исключение не переживет передачу в родителя - отдаем текстом
+                results[i] = RuntimeError(f"{result.__class__.__name__}: {result}")
+    return results
+
+
+def _run_in_thread(sucker: ISucker, context: FastSuckerContext) -> FastSuckerContext:
+    return _worker_loop().run_until_complete(sucker.process(context))
+
+
+# =======================================================
+# Сторона конвейера
+# =======================================================
+class SuckerExecutor:
+    """
+    Выносит process() присосок с event loop по их классу исполнения.
+
+    inline - обычный await; thread - общий пул потоков; process - общий
+    ограниченный ProcessPoolExecutor. В процесс уходит присоска (pickle, один раз
+    на воркер - дальше она берется из кэша по хэшу) и записи как кортежи
+    (data, metadata, status) без pydantic-обертки. Присоска должна быть pickle-
+    совместимой и не менять свое состояние после первого выноса: ее снимок
+    кэшируется.
+
+    run_many отправляет записи пачками по offload_batch штук на задание,
+    чтобы накладные расходы IPC делились на всю пачку.
+
+    Присоски с get_config()["deterministic"] идут через memo (SuckerMemo):
+    повторная запись с теми же data не пересчитывается, в том числе и
+    в пуле процессов. process_batch() и скомпилированные сегменты мимо кэша.
+    """
+
+    def __init__(
+        self,
+        max_processes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        start_method: str = "spawn",
+        memo: Optional[SuckerMemo] = None,
+    ):
+        # Один процессор оставляем event loop'у
+        self.max_processes = max_processes or max(1, (os.cpu_count() or 2) - 1)
+        self.max_threads = max_threads
+        # fork процесса с работающим event loop и потоками небезопасен
+        self.start_method = start_method
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        # Присоска -> (класс исполнения, ключ и снимок для процессов)
+        self._classes: "weakref.WeakKeyDictionary[ISucker, str]" = weakref.WeakKeyDictionary()
+        self._blobs: "weakref.WeakKeyDictionary[ISucker, Tuple[str, bytes]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.stats = {"inline": 0, "thread": 0, "process": 0, "process_tasks": 0}
+        # Кэш детерминированных присосок (None - без кэша)
+        self.memo = memo
+
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.max_processes,
+                mp_context=multiprocessing.get_context(self.start_method),
+            )
+            print(f"[SuckerExecutor] Пул процессов запущен ({self.max_processes} воркеров)")
+        return self._process_pool
+
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_threads, thread_name_prefix="sucker"
+            )
+        return self._thread_pool
+
+    def execution_of(self, sucker: ISucker) -> str:
+        mode = self._classes.get(sucker)
+        if mode is None:
+            mode = execution_class(sucker)
+            self._classes[sucker] = mode
+        return mode
+
+    def _snapshot(self, sucker: ISucker) -> Tuple[str, bytes]:
+        snapshot = self._blobs.get(sucker)
+        if snapshot is None:
+            blob = pickle.dumps(sucker, protocol=pickle.HIGHEST_PROTOCOL)
+            snapshot = (hashlib.blake2b(blob, digest_size=12).hexdigest(), blob)
+            self._blobs[sucker] = snapshot
+        return snapshot
+
+    async def run(self, sucker: ISucker, context: FastSuckerContext) -> FastSuckerContext:
+        """process() присоски в ее классе исполнения. Исключения пробрасываются как есть."""
+        memo = self.memo
+        if memo is None or not memo.enabled_for(sucker):
+            return await self._dispatch(sucker, context)
+        key = memo.key(sucker, context.data)
+        if key is None:
+            return await self._dispatch(sucker, context)
+        cached = await memo.get(sucker, key, context)
+        if cached is not None:
+            return cached
+        before = dict(context.metadata)
+        result = await self._dispatch(sucker, context)
+        await memo.put(key, before, result)
+        return result
+
+    async def _dispatch(self, sucker: ISucker, context: FastSuckerContext) -> FastSuckerContext:
+        mode = self.execution_of(sucker)
+        self.stats[mode] += 1
+        if mode == INLINE:
+            return await sucker.process(context)
+        if mode == THREAD:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.thread_pool(), _run_in_thread, sucker, context)
+        (result,) = await self._submit(sucker, [_pack(context)])
+        if isinstance(result, Exception):
+            raise result
+        return FastSuckerContext(*result)
+
+    async def run_many(
+        self, sucker: ISucker, contexts: Sequence[FastSuckerContext], batch: Optional[int] = None
+    ) -> List[Union[FastSuckerContext, Exception]]:
+        """
+        Прогоняет несколько записей. Результаты - в порядке входа; упавшая запись
+        возвращается исключением (как gather(..., return_exceptions=True)).
+        """
+        if self.execution_of(sucker) != PROCESS:
+            return list(
+                await asyncio.gather(
+                    *(self.run(sucker, context) for context in contexts), return_exceptions=True
+                )
+            )
+
+        memo = self.memo
+        if memo is None or not memo.enabled_for(sucker):
+            return await self._run_many_in_process(sucker, contexts, batch)
+        # В пул уходят только промахи кэша
+        results: List[Union[FastSuckerContext, Exception, None]] = [None] * len(contexts)
+        misses, repeats, queued = [], [], set()
+        for i, context in enumerate(contexts):
+            key = memo.key(sucker, context.data)
+            if key is not None and key in queued:
+                repeats.append((i, key))  # Такая же запись уже едет в пул
+                continue
+            cached = await memo.get(sucker, key, context) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append((i, key, dict(context.metadata)))
+                queued.add(key)
+        if misses:
+            computed = await self._run_many_in_process(
+                sucker, [contexts[i] for i, _, _ in misses], batch
+            )
+            for (i, key, before), result in zip(misses, computed, strict=True):
+                if key is not None and not isinstance(result, Exception):
+                    await memo.put(key, before, result)
+                results[i] = result
+        for i, key in repeats:
+            # Копия результата первой такой записи (после сбоя - пересчет)
+            cached = await memo.get(sucker, key, contexts[i])
+            results[i] = cached or (await self._run_many_in_process(sucker, [contexts[i]], 1))[0]
+        return results
+
+    async def _run_many_in_process(
+        self, sucker: ISucker, contexts: Sequence[FastSuckerContext], batch: Optional[int]
+    ) -> List[Union[FastSuckerContext, Exception]]:
+        self.stats[PROCESS] += len(contexts)
+        size = batch or offload_batch(sucker)
+        packed = [_pack(context) for context in contexts]
+        chunks = await asyncio.gather(
+            *(self._submit(sucker, packed[i : i + size]) for i in range(0, len(packed), size))
+        )
+        return [
+            result if isinstance(result, Exception) else FastSuckerContext(*result)
+            for chunk in chunks
+            for result in chunk
+        ]
+
+    async def _submit(self, sucker: ISucker, items: List[Packed]) -> list:
+        key, blob = self._snapshot(sucker)
+        self.stats["process_tasks"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool(), _run_in_process, key, blob, items)
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает пулы (следующий вынос запустит их заново)."""
+        pools: List[Executor] = [p for p in (self._process_pool, self._thread_pool) if p]
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+        self._process_pool = self._thread_pool = None
+        self._blobs.clear()
+        if pools:
+            print(f"[SuckerExecutor] Пулы остановлены. Статистика: {self.stats}")
+
+
+# Общий исполнитель процесса: пулы одни на все конвейеры
+default_executor = SuckerExecutor(memo=sucker_memo)
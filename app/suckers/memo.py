@@ -0,0 +1,214 @@
+# app/suckers/memo.py
+import asyncio
+import hashlib
+import json
+import pickle
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from app.suckers.base import FastSuckerContext, ISucker
+
+_SUFFIX = ".pkl"
+
+
+def is_deterministic(sucker: ISucker) -> bool:
+    """Присоска объявила себя чистой функцией data: get_config()["deterministic"]."""
+    try:
+        return bool(sucker.get_config().get("deterministic", False))
+    except Exception:
+        return False
+
+
+class SuckerMemo:
+    """
+    Кэш результатов детерминированных присосок.
+
+    Ключ - стабильный хэш data записи и get_config() присоски (другой
+    коэффициент - другой ключ). Значение - результат в pickle: на попадание
+    запись получает свежую копию, и следующая присоска может менять ее на месте.
+
+    Память ограничена memory_budget байт (LRU по размеру значений). Если
+    задан directory, вытесненные записи сбрасываются на диск (до disk_budget
+    байт, старые файлы удаляются), а промах в памяти проверяет диск;
+    диск переживает рестарт - повторная загрузка тех же данных попадает в кэш.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = 64 * 1024 * 1024,
+        directory: Optional[Union[str, Path]] = None,
+        disk_budget: int = 1024 * 1024 * 1024,
+    ):
+        self.memory_budget = memory_budget
+        self.directory = Path(directory) if directory is not None else None
+        self.disk_budget = disk_budget
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # Считается при первом сбросе на диск
+        # Присоска -> (детерминирована ли, хэш ее класса и конфигурации)
+        self._suckers: "weakref.WeakKeyDictionary[ISucker, Tuple[bool, str]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self.stats = {"evicted": 0, "spilled": 0, "disk_pruned": 0, "uncacheable": 0}
+
+    # --- ключи ---
+    def _identity(self, sucker: ISucker) -> Tuple[bool, str]:
+        identity = self._suckers.get(sucker)
+        if identity is None:
+            config = json.dumps(
+                [type(sucker).__qualname__, sucker.get_config()], sort_keys=True, default=str
+            )
+            identity = (is_deterministic(sucker), config)
+            self._suckers[sucker] = identity
+        return identity
+
+    def enabled_for(self, sucker: ISucker) -> bool:
+        return self._identity(sucker)[0]
+
+    def key(self, sucker: ISucker, data: Dict[str, Any]) -> Optional[str]:
+        """Ключ записи (None - data не сериализуется стабильно, кэш пропускается)."""
+        try:
+            payload = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            self.stats["uncacheable"] += 1
+            return None
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self._identity(sucker)[1].encode("utf-8"))
+        digest.update(payload.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _stage(self, sucker: ISucker) -> Dict[str, int]:
+        name = sucker.__class__.__name__
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"hits": 0, "disk_hits": 0, "misses": 0}
+        return stage
+
+    # --- чтение/запись ---
+    async def get(
+        self, sucker: ISucker, key: str, context: FastSuckerContext
+    ) -> Optional[FastSuckerContext]:
+        """Применяет закэшированный результат к записи; None - промах."""
+        stage = self._stage(sucker)
+        blob = self._entries.get(key)
+        if blob is not None:
+            self._entries.move_to_end(key)
+            stage["hits"] += 1
+        elif self.directory is not None:
+            blob = await asyncio.to_thread(self._read_disk, key)
+            if blob is not None:
+                stage["disk_hits"] += 1
+                await self._remember(key, blob)
+        if blob is None:
+            stage["misses"] += 1
+            return None
+        # (data, status, метаданные, которые присоска дописала)
+        data, status, metadata = pickle.loads(blob)
+        context.data = data
+        context.status = status
+        context.metadata.update(metadata)
+        return context
+
+    async def put(self, key: str, before: Dict[str, Any], result: FastSuckerContext):
+        """Запоминает результат; before - метаданные записи до присоски."""
+        added = {
+            name: value
+            for name, value in result.metadata.items()
+            if name not in before or before[name] != value
+        }
+        try:
+            blob = pickle.dumps((result.data, result.status, added), pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self.stats["uncacheable"] += 1
+            return
+        await self._remember(key, blob)
+
+    async def _remember(self, key: str, blob: bytes):
+        if len(blob) > self.memory_budget:
+            # Больше всего бюджета: в память не кладем, только на диск
+            if self.directory is not None:
+                await asyncio.to_thread(self._spill, [(key, blob)])
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous)
+        self._entries[key] = blob
+        self.memory_bytes += len(blob)
+        evicted = []
+        while self.memory_bytes > self.memory_budget:
+            old_key, old_blob = self._entries.popitem(last=False)
+            self.memory_bytes -= len(old_blob)
+            self.stats["evicted"] += 1
+            evicted.append((old_key, old_blob))
+        if evicted and self.directory is not None:
+            await asyncio.to_thread(self._spill, evicted)
+
+    # --- дисковый уровень (выполняется в потоке) ---
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{_SUFFIX}"
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _spill(self, entries: Iterable[Tuple[str, bytes]]):
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(p.stat().st_size for p in self._disk_files())
+        for key, blob in entries:
+            path = self._path(key)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(blob)
+            self._disk_bytes += len(blob)
+            self.stats["spilled"] += 1
+        if self._disk_bytes > self.disk_budget:
+            self._prune_disk()
+
+    def _disk_files(self):
+        if self.directory is None or not self.directory.exists():
+            return []
+        return list(self.directory.glob(f"*/*{_SUFFIX}"))
+
+    def _prune_disk(self):
+        """Удаляет самые старые файлы, пока диск не уложится в 90% бюджета."""
+        files = sorted(self._disk_files(), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            if self._disk_bytes <= self.disk_budget * 0.9:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._disk_bytes -= size
+            self.stats["disk_pruned"] += 1
+
+    # --- отчеты ---
+    def report(self, stages: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Попадания по стадиям (stages - только эти имена присосок) и заполнение кэша."""
+        names = self.stages if stages is None else [s for s in stages if s in self.stages]
+        per_stage = {}
+        for name in names:
+            stage = self.stages[name]
+            lookups = stage["hits"] + stage["disk_hits"] + stage["misses"]
+            hit_rate = (stage["hits"] + stage["disk_hits"]) / lookups if lookups else 0.0
+            per_stage[name] = {**stage, "hit_rate": round(hit_rate, 4)}
+        return {
+            "stages": per_stage,
+            "entries": len(self._entries),
+            "memory_bytes": self.memory_bytes,
+            "memory_budget": self.memory_budget,
+            **self.stats,
+        }
+
+    def clear(self):
+        """Очищает память (дисковый уровень остается)."""
+        self._entries.clear()
+        self.memory_bytes = 0
+
+
+# Общий кэш процесса (только память): его использует default_executor
+sucker_memo = SuckerMemo()
@@ -1,18 +1,64 @@
 # app/suckers/outputs/logger.py
-from app.suckers.base import ISucker, SuckerContext
+import logging
+from typing import Optional, Union
+
+from app.suckers.base import ISucker, SuckerBatch, SuckerContext
+from app.suckers.compiler import CompiledStep
+
+# Уровень присосок-логгеров наследуется от логгера приложения "app"
+sucker_logger = logging.getLogger("app.suckers")
+
+
+def _mark_logged(metadata, keys):
+    metadata["logged_at"] = "some_timestamp"
 
 
 class LoggerSucker(ISucker):
-    """Присоска-логгер: логирует состояние данных"""
+    """
+    Присоска-логгер: логирует состояние данных.
+    Ниже уровня логгера "app.suckers" молчит и только ставит метку logged_at.
+    """
+
+    def __init__(self, level: Union[int, str] = logging.INFO):
+        # Из YAML уровень приходит именем: "DEBUG", "INFO", ...
+        self.level = (
+            logging.getLevelNamesMapping()[level.upper()] if isinstance(level, str) else level
+        )
 
     def get_config(self):
-        return {"name": "Logger", "type": "output", "version": "1.0"}
+        return {
+            "name": "Logger",
+            "type": "output",
+            "level": logging.getLevelName(self.level),
+            "version": "1.0",
+        }
+
+    def enabled(self) -> bool:
+        return sucker_logger.isEnabledFor(self.level)
+
+    def compile_step(self) -> Optional[CompiledStep]:
+        # Включенный логгер печатает данные в своей точке конвейера - не сливается
+        if self.enabled():
+            return None
+        return CompiledStep("LoggerSucker", "noop", marks=[_mark_logged])
 
     async def process(self, context: SuckerContext) -> SuckerContext:
-        print(f"[LoggerSucker] Текущие данные: {context.data}")
-        print(f"[LoggerSucker] Метаданные: {context.metadata}")
-        print(f"[LoggerSucker] Статус: {context.status}")
+        if self.enabled():
+            print(f"[LoggerSucker] Текущие данные: {context.data}")
+            print(f"[LoggerSucker] Метаданные: {context.metadata}")
+            print(f"[LoggerSucker] Статус: {context.status}")
 
         # Добавляем метку о логировании
         context.metadata["logged_at"] = "some_timestamp"
         return context
+
+    async def process_batch(self, batch: SuckerBatch) -> SuckerBatch:
+        if self.enabled():
+            # Весь батч не печатаем: размер, поля и первая запись
+            preview = batch.record(0) if batch.size else {}
+            print(f"[LoggerSucker] Батч: {batch.size} записей, поля {list(batch.columns)}")
+            print(f"[LoggerSucker] Первая запись: {preview}")
+            print(f"[LoggerSucker] Отбраковано: {len(batch.errors)}, статус: {batch.status}")
+
+        batch.metadata["logged_at"] = "some_timestamp"
+        return batch
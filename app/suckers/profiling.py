@@ -0,0 +1,202 @@
+# app/suckers/profiling.py
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+# Отметка начала замера: (perf_counter, память tracemalloc на старте или None)
+Mark = Tuple[float, Optional[int]]
+
+
+class StageProfile:
+    """
+    Профиль одной стадии конвейера.
+
+    Счетчики (вызовы, записи, ошибки, откаты) точные. Время меряется
+    у выборки вызовов; задержки на запись хранятся в резервуаре
+    фиксированного размера (Algorithm R), из него - перцентили.
+    """
+
+    def __init__(self, name: str, reservoir_size: int = 1024):
+        self.name = name
+        self.reservoir_size = reservoir_size
+        self.calls = 0
+        self.records = 0
+        self.errors = 0
+        self.rollbacks = 0
+        # Замеренная выборка
+        self.sampled_calls = 0
+        self.sampled_records = 0
+        self.sampled_seconds = 0.0
+        self.latencies: List[float] = []  # Секунды на запись
+        self._seen = 0
+        self.alloc_total = 0
+        self.alloc_peak = 0
+        self.alloc_samples = 0
+
+    def observe(
+        self,
+        records: int,
+        errors: int,
+        rollbacks: int,
+        seconds: Optional[float] = None,
+        alloc: Optional[int] = None,
+    ):
+        self.calls += 1
+        self.records += records
+        self.errors += errors
+        self.rollbacks += rollbacks
+        if seconds is None:
+            return
+        self.sampled_calls += 1
+        self.sampled_records += records
+        self.sampled_seconds += seconds
+        latency = seconds / max(records, 1)
+        self._seen += 1
+        if len(self.latencies) < self.reservoir_size:
+            self.latencies.append(latency)
+        else:
+            slot = random.randrange(self._seen)
+            if slot < self.reservoir_size:
+                self.latencies[slot] = latency
+        if alloc is not None:
+            self.alloc_samples += 1
+            self.alloc_total += alloc
+            self.alloc_peak = max(self.alloc_peak, alloc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 4)
+
+        # Полное время - экстраполяция выборки на все вызовы
+        total = (
+            self.sampled_seconds * self.calls / self.sampled_calls if self.sampled_calls else 0.0
+        )
+        snapshot = {
+            "stage": self.name,
+            "calls": self.calls,
+            "records": self.records,
+            "sampled_calls": self.sampled_calls,
+            "total_seconds": round(total, 6),
+            "p50_ms": percentile(0.50),
+            "p90_ms": percentile(0.90),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1] * 1000, 4) if ordered else None,
+            # Пропускная способность стадии: записей в секунду ее собственного времени
+            "rps": round(self.sampled_records / self.sampled_seconds, 1)
+            if self.sampled_seconds
+            else None,
+            "errors": self.errors,
+            "rollbacks": self.rollbacks,
+            "error_rate": round(self.errors / self.records, 4) if self.records else 0.0,
+            "rollback_rate": round(self.rollbacks / self.records, 4) if self.records else 0.0,
+        }
+        if self.alloc_samples:
+            snapshot["alloc_mean_bytes"] = self.alloc_total // self.alloc_samples
+            snapshot["alloc_peak_bytes"] = self.alloc_peak
+        return snapshot
+
+
+class PipelineProfiler:
+    """
+    Профилировщик конвейера: по StageProfile на стадию.
+
+    Замеряется каждый sample_every-й вызов (begin() возвращает None
+    у остальных - на них только счетчики, без perf_counter).
+    track_allocations включает tracemalloc: у замеренных вызовов
+    пишется пик памяти над уровнем на старте. Это дорого и при
+    параллельных стадиях шумно (tracemalloc общий на процесс) - только
+    для разбора конкретного конвейера.
+    """
+
+    def __init__(
+        self,
+        name: str = "pipeline",
+        sample_every: int = 16,
+        reservoir_size: int = 1024,
+        track_allocations: bool = False,
+    ):
+        self.name = name
+        self.sample_every = max(1, sample_every)
+        self.reservoir_size = reservoir_size
+        self.track_allocations = track_allocations
+        self.stages: Dict[str, StageProfile] = {}
+        self._tick = 0
+        self.started_at = time.time()
+
+    def stage(self, name: str) -> StageProfile:
+        profile = self.stages.get(name)
+        if profile is None:
+            profile = self.stages[name] = StageProfile(name, self.reservoir_size)
+        return profile
+
+    def begin(self, force: bool = False) -> Optional[Mark]:
+        """Отметка начала, если вызов попал в выборку (force - замерить всегда)."""
+        self._tick += 1
+        if not force and self._tick % self.sample_every:
+            return None
+        memory = None
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        return time.perf_counter(), memory
+
+    def end(
+        self,
+        stage: str,
+        mark: Optional[Mark],
+        records: int = 1,
+        errors: int = 0,
+        rollbacks: int = 0,
+    ):
+        """Учитывает вызов стадии (mark - из begin(), None - без замера времени)."""
+        seconds = alloc = None
+        if mark is not None:
+            seconds = time.perf_counter() - mark[0]
+            if mark[1] is not None and tracemalloc.is_tracing():
+                alloc = max(0, tracemalloc.get_traced_memory()[1] - mark[1])
+        self.stage(stage).observe(records, errors, rollbacks, seconds, alloc)
+
+    def end_status(self, stage: str, mark: Optional[Mark], status: str):
+        """end() для одной записи по ее статусу после стадии."""
+        self.end(stage, mark, 1, int(status == "ERROR"), int(status == "ROLLBACK"))
+
+    def report(self) -> Dict[str, Any]:
+        stages = [profile.snapshot() for profile in self.stages.values()]
+        return {
+            "pipeline": self.name,
+            "sample_every": self.sample_every,
+            "track_allocations": self.track_allocations,
+            "since": self.started_at,
+            "stages": stages,
+            # Самая дорогая стадия - по оценке полного времени
+            "hottest": max(stages, key=lambda s: s["total_seconds"])["stage"] if stages else None,
+        }
+
+    def reset(self):
+        self.stages.clear()
+        self._tick = 0
+        self.started_at = time.time()
+
+
+# Профили конвейеров процесса: имя конвейера -> профилировщик
+profilers: Dict[str, PipelineProfiler] = {}
+
+
+def pipeline_profiler(name: str, **options: Any) -> PipelineProfiler:
+    """Общий профилировщик конвейера (переживает экземпляры щупалец на запрос)."""
+    profiler = profilers.get(name)
+    if profiler is None:
+        profiler = profilers[name] = PipelineProfiler(name, **options)
+    return profiler
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Метрики всех конвейеров процесса: имя -> report()."""
+    return {name: profiler.report() for name, profiler in profilers.items()}
@@ -0,0 +1,54 @@
+# app/suckers/registry.py
+import importlib
+from typing import Any, Dict, List, Type
+
+from app.suckers.base import ISucker
+
+# Тип присоски в YAML -> "модуль:Класс". Модуль импортируется при первой сборке,
+# так что описание десятков конвейеров не тянет за собой импорт всех присосок.
+SUCKER_REGISTRY: Dict[str, str] = {
+    "int_validator": "app.suckers.validators.int_validator:IntValidatorSucker",
+    "schema_validator": "app.suckers.validators.schema_validator:SchemaValidatorSucker",
+    "multiplier": "app.suckers.transformers.multiplier:MultiplierSucker",
+    "logger": "app.suckers.outputs.logger:LoggerSucker",
+}
+
+_classes: Dict[str, Type[ISucker]] = {}
+
+
+def register_sucker(name: str, target: str):
+    """Регистрирует тип присоски: target - "пакет.модуль:Класс"."""
+    if ":" not in target:
+        raise ValueError(f"Присоска '{name}': ожидается 'модуль:Класс', получено '{target}'")
+    SUCKER_REGISTRY[name] = target
+    _classes.pop(name, None)
+
+
+def sucker_class(name: str) -> Type[ISucker]:
+    """Класс присоски по имени типа (импорт модуля - при первом обращении)."""
+    if name not in _classes:
+        try:
+            module_name, class_name = SUCKER_REGISTRY[name].split(":")
+        except KeyError:
+            raise ValueError(
+                f"Неизвестный тип присоски '{name}', доступны: {sorted(SUCKER_REGISTRY)}"
+            ) from None
+        _classes[name] = getattr(importlib.import_module(module_name), class_name)
+    return _classes[name]
+
+
+def build_sucker(spec: Dict[str, Any]) -> ISucker:
+    """Присоска по описанию {"type": ..., <параметры конструктора>}."""
+    params = dict(spec)
+    try:
+        name = params.pop("type")
+    except KeyError:
+        raise ValueError(f"В описании присоски нет 'type': {spec}") from None
+    try:
+        return sucker_class(name)(**params)
+    except TypeError as e:
+        raise ValueError(f"Присоска '{name}': некорректные параметры {params}: {e}") from None
+
+
+def build_suckers(specs: List[Dict[str, Any]]) -> List[ISucker]:
+    return [build_sucker(spec) for spec in specs]
@@ -0,0 +1,319 @@
+# app/suckers/streaming.py
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+import aiofiles
+
+from app.body.blood import OctaEvent
+from app.body.interfaces import IMessageBus
+from app.body.messaging.claim_check import fetch_payload
+from app.suckers.base import FastSuckerContext, ISucker
+from app.suckers.execution import PROCESS, SuckerExecutor, default_executor, offload_batch
+from app.suckers.profiling import PipelineProfiler
+
+# Событие в топике-источнике, которым продюсер закрывает поток
+STREAM_END_EVENT = "STREAM_END"
+
+# Маркер конца потока между стадиями
+_END = object()
+
+
+# =======================================================
+# Источники записей (async-итераторы словарей)
+# =======================================================
+async def records_from_params(
+    records: Iterable[Dict[str, Any]], chunk_size: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """Записи из параметров команды; каждые chunk_size записей отдаем управление циклу."""
+    for i, record in enumerate(records, start=1):
+        yield record
+        if i % chunk_size == 0:
+            await asyncio.sleep(0)
+
+
+async def records_from_jsonl(path: str, encoding: str = "utf-8") -> AsyncIterator[Dict[str, Any]]:
+    """Записи из JSONL-файла, построчно: файл целиком в память не читается."""
+    async with aiofiles.open(path, mode="r", encoding=encoding) as f:
+        async for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+async def records_from_topic(
+    bus: IMessageBus,
+    topic: str,
+    buffer_size: int = 1000,
+    idle_timeout: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Записи из топика шины: payload каждого тельца - одна запись.
+    Поток заканчивается тельцем STREAM_END, после limit записей
+    или если новых телец нет idle_timeout секунд.
+
+    Топик должен принадлежать одному потоку (например, JOB.<id>). После конца
+    потока подписка снимается, если шина умеет unsubscribe; иначе обработчик
+    отбрасывает тельца, а буфер очищается, чтобы слушатель шины не завис на put.
+    Тельце, пришедшее ссылкой (claim check), забирается из хранилища блобов,
+    когда до его записи доходит очередь.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+    finished = False
+
+    def discard():
+        # get_nowait будит ждущих места put: они допишут и сами вызовут discard
+        while not queue.empty():
+            queue.get_nowait()
+
+    async def handler(event: OctaEvent, source_bus: Optional[str] = None):
+        if finished:
+            return
+        # Ограниченный буфер: медленный конвейер притормаживает слушателя шины
+        await queue.put(_END if event.event == STREAM_END_EVENT else event)
+        if finished:
+            discard()
+
+    await bus.subscribe(topic, handler)
+    received = 0
+    try:
+        while limit is None or received < limit:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _END:
+                break
+            received += 1
+            yield await fetch_payload(item)
+    finally:
+        finished = True
+        discard()
+        unsubscribe = getattr(bus, "unsubscribe", None)
+        if unsubscribe is not None:
+            await unsubscribe(topic)
+
+
+async def skip_records(
+    records: AsyncIterator[Dict[str, Any]], count: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """Пропускает первые count записей источника (возобновление с чекпоинта)."""
+    skipped = 0
+    async for record in records:
+        if skipped < count:
+            skipped += 1
+            continue
+        yield record
+
+
+# =======================================================
+# Потоковый конвейер
+# =======================================================
+class StageStats:
+    """Счетчики стадии конвейера: сколько записей, сколько времени воркеры были заняты."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0  # Суммарное время внутри process() по всем воркерам
+        self.queue_peak = 0  # Максимальная глубина входной очереди
+
+    def snapshot(self, elapsed: float) -> Dict[str, Any]:
+        capacity = elapsed * self.workers
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy, 6),
+            # Доля времени, которую воркеры стадии работали, а не ждали
+            "utilization": round(self.busy / capacity, 4) if capacity else 0.0,
+            "queue_peak": self.queue_peak,
+        }
+
+
+def _stage_workers(sucker: ISucker, explicit: Optional[int]) -> int:
+    """Число воркеров стадии: явно заданное или из get_config()["workers"] присоски."""
+    if explicit is not None:
+        return max(1, explicit)
+    try:
+        return max(1, int(sucker.get_config().get("workers", 1)))
+    except Exception:
+        return 1
+
+
+async def stream_pipeline(
+    suckers: List[ISucker],
+    records: AsyncIterator[Dict[str, Any]],
+    metadata: Dict[str, Any],
+    buffer_size: int = 100,
+    workers: Optional[Sequence[Optional[int]]] = None,
+    ordered: bool = False,
+    report: Optional[Dict[str, Any]] = None,
+    executor: Optional[SuckerExecutor] = None,
+    start_index: int = 0,
+    profiler: Optional[PipelineProfiler] = None,
+) -> AsyncIterator[FastSuckerContext]:
+    """
+    Прогоняет поток записей через присоски и отдает результаты по мере готовности.
+
+    Каждая присоска - стадия со своей входной очередью на buffer_size записей
+    и своими воркерами (workers[i] или get_config()["workers"], по умолчанию 1):
+    разные записи одновременно находятся на разных стадиях, а медленная
+    I/O-стадия может обрабатывать несколько записей параллельно.
+    Память ограничена буферами, а не объемом данных, и первый результат
+    выходит раньше, чем закончится вход.
+
+    Записи идут как FastSuckerContext: метаданные записи - LayeredMetadata
+    поверх общих metadata (с record_index), общая часть не копируется.
+
+    Несколько воркеров перемешивают записи; ordered=True восстанавливает порядок
+    входа на выходе (в работе одновременно не больше окна из буферов всех стадий).
+    Запись со статусом ERROR/ROLLBACK дальше не обрабатывается, но выходит
+    из конвейера (со статусом), чтобы потребитель учел отбраковку.
+
+    report (если передан) по завершении заполняется загрузкой стадий:
+    {"elapsed": ..., "stages": [...], "bottleneck": имя самой загруженной стадии}.
+
+    Присоски с классом исполнения thread/process работают вне event loop
+    (executor, по умолчанию общий default_executor). Воркер process-стадии
+    забирает из очереди все готовые записи (до offload_batch) и отправляет
+    их в пул одним заданием.
+
+    start_index - номер первой записи (record_index) при возобновлении
+    с чекпоинта: нумерация продолжается с места остановки.
+
+    profiler (PipelineProfiler) получает вызовы стадий: записи, отказы
+    и время у выборки вызовов.
+    """
+    executor = executor or default_executor
+    workers = list(workers or [])
+    counts = [
+        _stage_workers(sucker, workers[i] if i < len(workers) else None)
+        for i, sucker in enumerate(suckers)
+    ]
+    stats = [
+        StageStats(sucker.__class__.__name__, n) for sucker, n in zip(suckers, counts, strict=True)
+    ]
+    queues = [asyncio.Queue(maxsize=buffer_size) for _ in range(len(suckers) + 1)]
+
+    # Окно упорядоченного режима: вход ждет, пока выход не догонит
+    window = buffer_size * len(queues) + sum(counts)
+    emitted = start_index
+    progress = asyncio.Condition()
+
+    async def feed():
+        try:
+            index = start_index
+            async for record in records:
+                if ordered:
+                    async with progress:
+                        await progress.wait_for(lambda i=index: i - emitted < window)
+                context = FastSuckerContext.over(record, metadata, record_index=index)
+                await queues[0].put(context)
+                index += 1
+        except Exception:
+            # Сбой источника: закрываем поток, ошибку отдаст gather ниже
+            await queues[0].put(_END)
+            raise
+        await queues[0].put(_END)
+
+    finished = [0] * len(suckers)
+
+    async def stage(i: int, sucker: ISucker, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        stat = stats[i]
+        batch = offload_batch(sucker) if executor.execution_of(sucker) == PROCESS else 1
+        while True:
+            stat.queue_peak = max(stat.queue_peak, inbox.qsize())
+            items = [await inbox.get()]
+            # Пачка для пула процессов: только то, что уже ждет в очереди
+            while len(items) < batch and items[-1] is not _END and not inbox.empty():
+                items.append(inbox.get_nowait())
+            end = items[-1] is _END
+            if end:
+                items.pop()
+
+            pending = [k for k, c in enumerate(items) if c.status == "PROCESSING"]
+            if pending:
+                mark = profiler.begin() if profiler is not None else None
+                started = time.perf_counter()
+                if len(pending) == 1:
+                    try:
+                        results = [await executor.run(sucker, items[pending[0]])]
+                    except Exception as e:
+                        results = [e]
+                else:
+                    results = await executor.run_many(sucker, [items[j] for j in pending], batch)
+                stat.busy += time.perf_counter() - started
+                errors = rollbacks = 0
+                for j, context in zip(pending, results, strict=True):
+                    if isinstance(context, Exception):
+                        error = context
+                        context = items[j]
+                        context.status = "ERROR"
+                        context.data = {"error": f"Сбой в присоске {stat.name}: {error}"}
+                    stat.processed += 1
+                    if context.status != "PROCESSING":
+                        stat.failed += 1
+                        context.metadata["failed_at"] = stat.name
+                        errors += context.status == "ERROR"
+                        rollbacks += context.status == "ROLLBACK"
+                    items[j] = context
+                if profiler is not None:
+                    profiler.end(stat.name, mark, len(pending), errors, rollbacks)
+            for context in items:
+                await outbox.put(context)
+
+            if end:
+                # Конец потока видят все воркеры стадии; дальше его передает последний
+                finished[i] += 1
+                if finished[i] == counts[i]:
+                    await outbox.put(_END)
+                else:
+                    await inbox.put(_END)
+                return
+
+    started_at = time.perf_counter()
+    tasks = [asyncio.create_task(feed())] + [
+        asyncio.create_task(stage(i, sucker, queues[i], queues[i + 1]))
+        for i, sucker in enumerate(suckers)
+        for _ in range(counts[i])
+    ]
+    # Упорядоченный режим: результаты, пришедшие раньше своей очереди
+    pending: Dict[int, FastSuckerContext] = {}
+    try:
+        while True:
+            context = await queues[-1].get()
+            if context is _END:
+                break
+            ready = [context]
+            if ordered:
+                pending[context.metadata["record_index"]] = context
+                ready = []
+                while emitted + len(ready) in pending:
+                    ready.append(pending.pop(emitted + len(ready)))
+            for result in ready:
+                if result.status == "PROCESSING":
+                    result.status = "SUCCESS"
+                emitted += 1
+                yield result
+            if ordered and ready:
+                async with progress:
+                    progress.notify_all()
+        # Пробрасываем сбой источника (например, битый JSON в файле)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if report is not None:
+            elapsed = time.perf_counter() - started_at
+            report["elapsed"] = round(elapsed, 6)
+            report["stages"] = [stat.snapshot(elapsed) for stat in stats]
+            report["bottleneck"] = (
+                max(report["stages"], key=lambda s: s["utilization"])["stage"] if stats else None
+            )
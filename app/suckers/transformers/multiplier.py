@@ -1,5 +1,37 @@
 # app/suckers/transformers/multiplier.py
-from app.suckers.base import ISucker, SuckerContext
+from math import prod
+from typing import List
+
+from app.suckers.base import ISucker, SuckerBatch, SuckerContext, as_column, np
+from app.suckers.compiler import CompiledStep
+
+
+def _multiply_step(factors: List[int]) -> CompiledStep:
+    """Шаг компилятора: x a, потом x b - то же, что x (a*b) за одно int()."""
+    total = prod(factors)
+
+    def multiply(value):
+        try:
+            return int(value) * total
+        except (ValueError, TypeError):
+            return value  # Оставляем как есть, если не число
+
+    def fuse(other: CompiledStep):
+        if other.op != "multiply":
+            return None
+        return _multiply_step(factors + other.params["factors"])
+
+    def mark(metadata, keys, factor=factors[0]):
+        metadata[f"multiplied_by_{factor}"] = True
+
+    return CompiledStep(
+        "MultiplierSucker",
+        "multiply",
+        params={"factors": factors},
+        apply=multiply,
+        marks=[mark],
+        fuse=fuse,
+    )
 
 
 class MultiplierSucker(ISucker):
@@ -30,3 +62,34 @@ class MultiplierSucker(ISucker):
         context.data = transformed
         context.metadata[f"multiplied_by_{self.factor}"] = True
         return context
+
+    def compile_step(self) -> CompiledStep:
+        return _multiply_step([self.factor])
+
+    async def process_batch(self, batch: SuckerBatch) -> SuckerBatch:
+        for key, column in batch.columns.items():
+            batch.columns[key] = self._multiply_column(column)
+
+        batch.metadata[f"multiplied_by_{self.factor}"] = True
+        return batch
+
+    def _multiply_column(self, column):
+        if np is not None and isinstance(column, np.ndarray) and column.dtype.kind in "iubfU":
+            try:
+                # int() по всему столбцу разом (для строк numpy разбирает их так же, как int())
+                ints = column.astype(np.int64)
+            except (ValueError, OverflowError):
+                ints = None
+            finite = column.dtype.kind != "f" or np.isfinite(column).all()
+            limit = np.iinfo(np.int64).max // max(abs(self.factor), 1)
+            # Переполнение int64 numpy не ловит - такие столбцы считаем поэлементно
+            if ints is not None and finite and (ints.size == 0 or np.abs(ints).max() <= limit):
+                return ints * self.factor
+
+        transformed = []
+        for value in column:
+            try:
+                transformed.append(int(value) * self.factor)
+            except (ValueError, TypeError, OverflowError):
+                transformed.append(value)  # Оставляем как есть, если не число
+        return as_column(transformed)
@@ -1,5 +1,75 @@
 # app/suckers/validators/int_validator.py
-from app.suckers.base import ISucker, SuckerContext
+from math import prod
+from typing import List, Optional
+
+from app.suckers.base import ISucker, SuckerBatch, SuckerContext, np, py_value
+from app.suckers.compiler import CompiledStep, Rejected
+
+
+def _non_int_positions(column) -> List[int]:
+    """Позиции значений столбца, которые не приводятся к int."""
+    if np is not None and isinstance(column, np.ndarray):
+        kind = column.dtype.kind
+        if kind in "iub":
+            return []
+        if kind == "f":
+            return np.flatnonzero(~np.isfinite(column)).tolist()
+        if kind == "U":
+            try:
+                # Быстрый путь: весь столбец разбирается без исключений
+                column.astype(np.int64)
+                return []
+            except (ValueError, OverflowError):
+                pass  # Ищем виновников поэлементно
+    positions = []
+    for i, value in enumerate(column):
+        try:
+            int(value)
+        except (ValueError, TypeError, OverflowError):
+            positions.append(i)
+    return positions
+
+
+def _check_int(value):
+    try:
+        int(value)
+    except (ValueError, TypeError):
+        raise Rejected from None
+    return value
+
+
+def _reject_message(key, value) -> str:
+    return f"Значение '{key}'={value} не является числом"
+
+
+def _fuse_check_int(other: CompiledStep) -> Optional[CompiledStep]:
+    """Проверка + множитель: после успешного int() множитель не может промахнуться."""
+    if other.op != "multiply":
+        return None
+    return _check_int_multiply(other.params["factors"])
+
+
+def _check_int_multiply(factors: List[int]) -> CompiledStep:
+    total = prod(factors)
+
+    def apply(value):
+        try:
+            return int(value) * total
+        except (ValueError, TypeError):
+            raise Rejected from None
+
+    def fuse(other: CompiledStep) -> Optional[CompiledStep]:
+        if other.op != "multiply":
+            return None
+        return _check_int_multiply(factors + other.params["factors"])
+
+    return CompiledStep(
+        "IntValidatorSucker",
+        "check_int_multiply",
+        params={"factors": factors},
+        apply=apply,
+        fuse=fuse,
+    )
 
 
 class IntValidatorSucker(ISucker):
@@ -24,3 +94,32 @@ class IntValidatorSucker(ISucker):
         context.metadata["validated"] = True
         context.metadata["validated_fields"] = list(data.keys())
         return context
+
+    def compile_step(self) -> CompiledStep:
+        def mark(metadata, keys):
+            metadata["validated"] = True
+            metadata["validated_fields"] = list(keys)
+
+        return CompiledStep(
+            "IntValidatorSucker",
+            "check_int",
+            apply=_check_int,
+            reject_message=_reject_message,
+            marks=[mark],
+            fuse=_fuse_check_int,
+        )
+
+    async def process_batch(self, batch: SuckerBatch) -> SuckerBatch:
+        # Записи с нечисловыми значениями отбраковываются, остальные идут дальше
+        rejected = {}
+        for key, column in batch.columns.items():
+            for position in _non_int_positions(column):
+                rejected.setdefault(
+                    position,
+                    f"Значение '{key}'={py_value(column[position])} не является числом",
+                )
+        batch.reject(rejected)
+
+        batch.metadata["validated"] = True
+        batch.metadata["validated_fields"] = list(batch.columns.keys())
+        return batch
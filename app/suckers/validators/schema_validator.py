@@ -0,0 +1,340 @@
+# app/suckers/validators/schema_validator.py
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.suckers.base import ISucker, SuckerBatch, SuckerContext, as_column, np, py_value
+
+# Ошибка поля: (поле, правило, сообщение)
+FieldError = Tuple[str, str, str]
+
+# Типы схемы -> проверка значения (bool - не число, хоть и подкласс int)
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "int": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "float": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "str": lambda v: isinstance(v, str),
+    "bool": lambda v: isinstance(v, bool),
+    "list": lambda v: isinstance(v, list),
+    "dict": lambda v: isinstance(v, dict),
+}
+_TYPES["number"] = _TYPES["float"]
+_NUMERIC = {"int", "float", "number"}
+# Приведение строк для coerce: true
+_COERCE = {"int": int, "float": float, "number": float}
+# dtype.kind numpy-столбца, целиком подходящий под тип
+_KINDS = {"int": "iu", "float": "iuf", "number": "iuf", "str": "U", "bool": "b"}
+_RULES = {"type", "required", "min", "max", "pattern", "enum", "coerce"}
+
+
+class _Invalid(Exception):
+    """Значение не прошло проверку типа: остальные правила поля не применяются."""
+
+
+class _FieldRule:
+    """Правила одного поля, разобранные один раз: проверки - только заданные в схеме."""
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        unknown = set(spec) - _RULES
+        if unknown:
+            raise ValueError(f"Поле '{name}': неизвестные правила {sorted(unknown)}")
+        self.name = name
+        self.type: Optional[str] = spec.get("type")
+        if self.type is not None and self.type not in _TYPES:
+            raise ValueError(f"Поле '{name}': неизвестный тип '{self.type}'")
+        self.required = spec.get("required", True)
+        self.coerce = _COERCE.get(self.type) if spec.get("coerce") else None
+        self.min = spec.get("min")
+        self.max = spec.get("max")
+        if (self.min is not None or self.max is not None) and self.type not in _NUMERIC:
+            raise ValueError(f"Поле '{name}': min/max только для типов {sorted(_NUMERIC)}")
+        pattern = spec.get("pattern")
+        self.pattern = re.compile(pattern) if pattern is not None else None
+        enum = spec.get("enum")
+        self.enum_values: Optional[List[Any]] = list(enum) if enum is not None else None
+        try:
+            self.enum = frozenset(enum) if enum is not None else None
+        except TypeError:  # Нехэшируемые значения - проверка списком
+            self.enum = self.enum_values
+        self.is_type = _TYPES[self.type] if self.type else None
+        self.check = self._compile()
+
+    # --- сообщения (одинаковые в пакетном и обычном режиме) ---
+    def missing(self) -> FieldError:
+        return (self.name, "required", f"Поле '{self.name}' обязательно")
+
+    def wrong_type(self, value) -> FieldError:
+        return (self.name, "type", f"Поле '{self.name}'={value!r}: ожидается {self.type}")
+
+    def below(self, value) -> FieldError:
+        return (self.name, "min", f"Поле '{self.name}'={value!r} меньше минимума {self.min}")
+
+    def above(self, value) -> FieldError:
+        return (self.name, "max", f"Поле '{self.name}'={value!r} больше максимума {self.max}")
+
+    def mismatch(self, value) -> FieldError:
+        return (
+            self.name,
+            "pattern",
+            f"Поле '{self.name}'={value!r} не соответствует шаблону {self.pattern.pattern!r}",
+        )
+
+    def not_in_enum(self, value) -> FieldError:
+        return (
+            self.name,
+            "enum",
+            f"Поле '{self.name}'={value!r} не из допустимых значений {self.enum_values}",
+        )
+
+    def _compile(self) -> Callable[[Any, List[FieldError]], Any]:
+        """
+        Проверка значения: дописывает ошибки в список и возвращает значение
+        (приведенное, если coerce). Собираются только заданные правила.
+        """
+        steps: List[Callable[[Any, List[FieldError]], Any]] = []
+        if self.is_type is not None:
+            is_type, coerce = self.is_type, self.coerce
+
+            def check_type(value, errors):
+                if is_type(value):
+                    return value
+                if coerce is not None and isinstance(value, str):
+                    try:
+                        return coerce(value)
+                    except ValueError:
+                        pass
+                errors.append(self.wrong_type(value))
+                raise _Invalid
+
+            steps.append(check_type)
+        if self.min is not None:
+            low = self.min
+
+            def check_min(value, errors):
+                if value < low:
+                    errors.append(self.below(value))
+                return value
+
+            steps.append(check_min)
+        if self.max is not None:
+            high = self.max
+
+            def check_max(value, errors):
+                if value > high:
+                    errors.append(self.above(value))
+                return value
+
+            steps.append(check_max)
+        if self.pattern is not None:
+            search = self.pattern.search
+
+            def check_pattern(value, errors):
+                if not isinstance(value, str) or search(value) is None:
+                    errors.append(self.mismatch(value))
+                return value
+
+            steps.append(check_pattern)
+        if self.enum is not None:
+            allowed = self.enum
+
+            def check_enum(value, errors):
+                try:
+                    found = value in allowed
+                except TypeError:  # Нехэшируемое значение
+                    found = False
+                if not found:
+                    errors.append(self.not_in_enum(value))
+                return value
+
+            steps.append(check_enum)
+
+        if len(steps) == 1:
+            (only,) = steps
+
+            def check(value, errors):
+                try:
+                    return only(value, errors)
+                except _Invalid:
+                    return value
+
+            return check
+
+        def check(value, errors):
+            try:
+                for step in steps:
+                    value = step(value, errors)
+            except _Invalid:
+                pass
+            return value
+
+        return check
+
+    # --- столбец батча ---
+    def check_column(self, column) -> Tuple[Any, Dict[int, List[FieldError]]]:
+        """
+        Проверка целого столбца: векторно для numpy-столбцов подходящего dtype,
+        иначе - та же поэлементная проверка, что и для записи.
+        Возвращает столбец (приведенный, если coerce) и ошибки по позициям.
+        """
+        if np is None or not isinstance(column, np.ndarray) or column.dtype.kind == "O":
+            return self._check_elementwise(column)
+        bad: Dict[int, List[FieldError]] = {}
+        kind = column.dtype.kind
+        if self.type is not None and self.type in _KINDS:
+            if kind not in _KINDS[self.type]:
+                coerced = self._coerce_column(column) if kind == "U" else None
+                if coerced is None:
+                    # Столбец целиком не того типа (или не приводится векторно)
+                    return self._check_elementwise(column)
+                column = coerced
+                kind = column.dtype.kind
+        elif self.type is not None:
+            return self._check_elementwise(column)
+
+        def flag(mask, error):
+            for position in np.flatnonzero(mask).tolist():
+                bad.setdefault(position, []).append(error(py_value(column[position])))
+
+        if self.min is not None:
+            flag(column < self.min, self.below)
+        if self.max is not None:
+            flag(column > self.max, self.above)
+        if self.pattern is not None:
+            if kind == "U":
+                # Регулярка - по уникальным значениям: повторы не проверяются заново
+                unique, inverse = np.unique(column, return_inverse=True)
+                search = self.pattern.search
+                matched = np.fromiter(
+                    (search(value) is not None for value in unique.tolist()),
+                    dtype=bool,
+                    count=len(unique),
+                )
+                flag(~matched[inverse.reshape(-1)], self.mismatch)
+            else:
+                flag(np.ones(len(column), dtype=bool), self.mismatch)
+        if self.enum is not None:
+            try:
+                flag(~np.isin(column, self.enum_values), self.not_in_enum)
+            except TypeError:
+                return self._check_elementwise(column)
+        return column, bad
+
+    def _coerce_column(self, column):
+        if self.coerce is None:
+            return None
+        try:
+            return column.astype(np.int64 if self.coerce is int else np.float64)
+        except (ValueError, OverflowError):
+            return None  # Не все строки приводятся: разбор поэлементно
+
+    def _check_elementwise(self, column) -> Tuple[Any, Dict[int, List[FieldError]]]:
+        bad: Dict[int, List[FieldError]] = {}
+        values = []
+        for position, value in enumerate(column):
+            errors: List[FieldError] = []
+            values.append(self.check(py_value(value), errors))
+            if errors:
+                bad[position] = errors
+        if self.coerce is not None:
+            column = as_column(values)
+        return column, bad
+
+
+class SchemaValidatorSucker(ISucker):
+    """
+    Присоска-валидатор по декларативной схеме.
+
+    fields - поле -> правила: type (int, float/number, str, bool, list, dict),
+    required (по умолчанию true), min/max (для чисел, включительно), pattern
+    (регулярное выражение, поиск как в JSON Schema - якоря ^$ явно),
+    enum (список допустимых значений), coerce (строки -> int/float).
+    allow_extra=False запрещает поля, которых нет в схеме.
+
+    Схема разбирается один раз в конструкторе: на запись выполняются только
+    заданные проверки. Запись проверяется целиком - в ошибке все нарушения
+    (data["errors"]: поле, правило, сообщение), а не только первое.
+    Пакетный режим проверяет столбцы векторно (numpy), регулярки - по
+    уникальным значениям.
+    """
+
+    def __init__(self, fields: Dict[str, Dict[str, Any]], allow_extra: bool = True):
+        if not fields:
+            raise ValueError("Схема без полей")
+        self.fields = fields
+        self.allow_extra = allow_extra
+        self._rules = [_FieldRule(name, spec or {}) for name, spec in fields.items()]
+        self._coercing = any(rule.coerce is not None for rule in self._rules)
+
+    def get_config(self):
+        return {
+            "name": "SchemaValidator",
+            "type": "validator",
+            "fields": self.fields,
+            "allow_extra": self.allow_extra,
+            "version": "1.0",
+        }
+
+    def validate(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[FieldError]]:
+        """Проверяет запись: (данные - приведенные, если coerce; все ошибки)."""
+        errors: List[FieldError] = []
+        coerced = dict(data) if self._coercing else data
+        for rule in self._rules:
+            if rule.name in data:
+                value = rule.check(data[rule.name], errors)
+                if self._coercing:
+                    coerced[rule.name] = value
+            elif rule.required:
+                errors.append(rule.missing())
+        if not self.allow_extra:
+            for name in data:
+                if name not in self.fields:
+                    errors.append((name, "extra", f"Лишнее поле '{name}'"))
+        return coerced, errors
+
+    async def process(self, context: SuckerContext) -> SuckerContext:
+        data, errors = self.validate(context.data)
+        if errors:
+            context.status = "ERROR"
+            context.data = {
+                "error": "; ".join(message for _, _, message in errors),
+                "errors": [
+                    {"field": field, "rule": rule, "message": message}
+                    for field, rule, message in errors
+                ],
+            }
+            return context
+        context.data = data
+        context.metadata["validated"] = True
+        context.metadata["validated_fields"] = list(data.keys())
+        return context
+
+    async def process_batch(self, batch: SuckerBatch) -> SuckerBatch:
+        # Все нарушения записи собираются по всем полям, потом запись отбраковывается
+        bad: Dict[int, List[FieldError]] = {}
+        everyone = range(batch.size)
+        for rule in self._rules:
+            column = batch.columns.get(rule.name)
+            if column is None:
+                if rule.required:
+                    for position in everyone:
+                        bad.setdefault(position, []).append(rule.missing())
+                continue
+            column, errors = rule.check_column(column)
+            batch.columns[rule.name] = column
+            for position, field_errors in errors.items():
+                bad.setdefault(position, []).extend(field_errors)
+        if not self.allow_extra:
+            for name in batch.columns:
+                if name not in self.fields:
+                    for position in everyone:
+                        bad.setdefault(position, []).append(
+                            (name, "extra", f"Лишнее поле '{name}'")
+                        )
+        batch.reject(
+            {
+                position: "; ".join(message for _, _, message in errors)
+                for position, errors in sorted(bad.items())
+            }
+        )
+
+        batch.metadata["validated"] = True
+        batch.metadata["validated_fields"] = list(batch.columns.keys())
+        return batch
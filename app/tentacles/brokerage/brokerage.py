@@ -27,7 +27,10 @@ class BrokerageTentacle(CommandDispatchTentacle):
         order_id = event.payload.get("id", "UNKNOWN_ID")
         # поскольку payload любой, пидантик не подсвечивает поля
         # Может отправить ответное сообщение (артерия)
-        response_event = OctaEvent(event="ORDER_RECEIVED", payload={"order_id": order_id})
+        # Ключ партиции = id ордера: события одного ордера идут строго по порядку
+        response_event = OctaEvent(
+            event="ORDER_RECEIVED", payload={"order_id": order_id}, partition_key=str(order_id)
+        )
         await self.message_bus.publish("INTERNAL_FEEDBACK", response_event, target_bus=source_bus)
 
     async def get_health(self) -> float:
@@ -0,0 +1,154 @@
+# app/tentacles/pipeline_factory.py
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+import yaml
+
+from app.brain import CommandContext, OctaResponse, TentacleMetadata
+from app.suckers.base import ISucker
+from app.suckers.compiler import CompiledPipeline, compile_pipeline
+from app.suckers.registry import SUCKER_REGISTRY, build_suckers
+
+from .pipeline_tentacle import PipelineTentacle
+
+PathLike = Union[str, Path]
+
+# Описания конвейеров (относительно текущей директории, как и остальные конфиги)
+PIPELINES_PATH = os.environ.get("OCTAMILLIA_PIPELINES_PATH", "./config/pipelines.yaml")
+
+# Параметры, которые описание может задать командам по умолчанию
+_DEFAULT_PARAMS = {
+    "buffer_size",
+    "workers",
+    "ordered",
+    "chunk_size",
+    "checkpoint_every",
+    "source",
+}
+
+# Хэш описания -> (присоски, скомпилированный конвейер или None)
+_BUILT: Dict[str, Tuple[List[ISucker], Optional[CompiledPipeline]]] = {}
+
+
+def definition_hash(definition: Dict[str, Any]) -> str:
+    """Хэш описания конвейера: одинаковые описания собираются один раз."""
+    canonical = json.dumps(definition, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def build_pipeline(
+    definition: Dict[str, Any],
+) -> Tuple[List[ISucker], Optional[CompiledPipeline]]:
+    """
+    Присоски (и скомпилированный конвейер, если compiled: true) по описанию.
+    Результат кэшируется по хэшу описания: новый экземпляр щупальца на каждый
+    запрос (standin) получает уже собранный конвейер.
+    """
+    key = definition_hash(definition)
+    if key not in _BUILT:
+        suckers = build_suckers(definition["suckers"])
+        pipeline = compile_pipeline(suckers) if definition.get("compiled") else None
+        _BUILT[key] = (suckers, pipeline)
+        print(f"[PipelineFactory] Собран конвейер {key}: {len(suckers)} присосок")
+    return _BUILT[key]
+
+
+def validate_definition(pipeline_id: str, definition: Dict[str, Any]):
+    """Проверка описания без импорта присосок (только имена типов из реестра)."""
+    if not isinstance(definition, dict):
+        raise ValueError(f"{pipeline_id}: описание должно быть словарем")
+    if not definition.get("command"):
+        raise ValueError(f"{pipeline_id}: не задана команда (command)")
+    suckers = definition.get("suckers")
+    if not isinstance(suckers, list) or not suckers:
+        raise ValueError(f"{pipeline_id}: suckers должен быть непустым списком")
+    for spec in suckers:
+        if not isinstance(spec, dict) or spec.get("type") not in SUCKER_REGISTRY:
+            raise ValueError(
+                f"{pipeline_id}: неизвестная присоска {spec}, доступны: {sorted(SUCKER_REGISTRY)}"
+            )
+    unknown = set(definition.get("defaults", {})) - _DEFAULT_PARAMS
+    if unknown:
+        raise ValueError(f"{pipeline_id}: неизвестные параметры в defaults: {sorted(unknown)}")
+
+
+def load_pipeline_definitions(path: PathLike = PIPELINES_PATH) -> Dict[str, Dict[str, Any]]:
+    """Описания конвейеров из YAML (раздел pipelines: ID -> описание)."""
+    path = Path(path)
+    if not path.exists():
+        print(f"[PipelineFactory] Файл конвейеров не найден: {path}")
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        definitions = (yaml.safe_load(f) or {}).get("pipelines") or {}
+    for pipeline_id, definition in definitions.items():
+        validate_definition(pipeline_id, definition)
+    return definitions
+
+
+class DeclarativePipelineTentacle(PipelineTentacle):
+    """
+    Щупальце конвейера из YAML. Подклассы на каждое описание создает
+    pipeline_tentacle_class: команды <command>, <command>_BATCH, <command>_STREAM
+    и <command>_PROFILE.
+    """
+
+    pipeline_id: str = ""
+    definition: Dict[str, Any] = {}
+
+    def __init__(self, **kwargs):
+        suckers, pipeline = build_pipeline(self.definition)
+        super().__init__(suckers=suckers, compiled=pipeline is not None, **kwargs)
+        self._pipeline = pipeline
+
+    async def process_command(self, context: CommandContext) -> OctaResponse[Any]:
+        defaults = self.definition.get("defaults")
+        if defaults:
+            # Параметры команды важнее значений по умолчанию из описания
+            context = context.model_copy(update={"params": {**defaults, **context.params}})
+        return await super().process_command(context)
+
+
+def pipeline_tentacle_class(
+    pipeline_id: str, definition: Dict[str, Any]
+) -> Type[DeclarativePipelineTentacle]:
+    """Класс щупальца для описания конвейера (свои команды на каждое описание)."""
+    validate_definition(pipeline_id, definition)
+    command = definition["command"]
+    return type(
+        f"{pipeline_id.title().replace('_', '')}Tentacle",
+        (DeclarativePipelineTentacle,),
+        {
+            "pipeline_id": pipeline_id,
+            "definition": definition,
+            "_COMMAND_HANDLERS": {
+                command: "_process_pipeline",
+                f"{command}_BATCH": "_process_pipeline_batch",
+                f"{command}_STREAM": "_process_pipeline_stream",
+                f"{command}_PROFILE": "_pipeline_profile",
+            },
+        },
+    )
+
+
+def pipeline_metadata(path: PathLike = PIPELINES_PATH) -> List[TentacleMetadata]:
+    """Офферы WAI для всех конвейеров из YAML."""
+    offers = []
+    for pipeline_id, definition in load_pipeline_definitions(path).items():
+        tentacle_class = pipeline_tentacle_class(pipeline_id, definition)
+        offers.append(
+            TentacleMetadata(
+                tentacle_id=pipeline_id,
+                contract_interface=PipelineTentacle,
+                internal_implementation=tentacle_class,
+                external_image_tag=None,
+                handles_commands=tentacle_class.get_capabilities(),
+            )
+        )
+    return offers
+
+
+# --- МЕТАДАННЫЕ ДЛЯ WAI (список: по офферу на конвейер) ---
+TENTACLE_METADATA = pipeline_metadata()
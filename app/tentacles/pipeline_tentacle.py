@@ -1,33 +1,98 @@
 # app/tentacles/pipeline_tentacle.py
-import json
 from datetime import datetime
-from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from app.body.messaging.claim_check import (
+    CLAIM_CHECK_HEADER,
+    CLAIM_CHECK_SIZE_HEADER,
+    is_claim_checked,
+)
+from app.body.storage import (
+    CheckpointStore,
+    CommitBuffer,
+    ErrorJournal,
+    checkpoint_store,
+    commit_buffer,
+    error_journal,
+)
 from app.brain import CommandContext, CommandDispatchTentacle, OctaResponse
-from app.suckers.base import ISucker, SuckerContext
+from app.suckers.base import (
+    FastSuckerContext,
+    ISucker,
+    SuckerBatch,
+    SuckerContext,
+    plain_metadata,
+)
+from app.suckers.compiler import CompiledPipeline, compile_pipeline
+from app.suckers.execution import PROCESS, SuckerExecutor, default_executor
+from app.suckers.profiling import PipelineProfiler, pipeline_profiler
+from app.suckers.streaming import (
+    records_from_jsonl,
+    records_from_params,
+    records_from_topic,
+    skip_records,
+    stream_pipeline,
+)
 
 
 class PipelineTentacle(CommandDispatchTentacle):
     """Тентакля-конвейер, которая использует присоски"""
 
     # ДИСПЕТЧЕР КОМАНД (наследуется от CommandDispatchTentacle)
-    _COMMAND_HANDLERS = {"PROCESS_PIPELINE": "_process_pipeline"}
+    _COMMAND_HANDLERS = {
+        "PROCESS_PIPELINE": "_process_pipeline",
+        # Пакетный режим: params["records"] - список записей, обрабатываются столбцами
+        "PROCESS_PIPELINE_BATCH": "_process_pipeline_batch",
+        # Потоковый режим: записи из params/файла/топика, результаты - событиями в шину
+        "PROCESS_PIPELINE_STREAM": "_process_pipeline_stream",
+        # Профиль стадий: задержки, пропускная способность, доля ошибок
+        "PIPELINE_PROFILE": "_pipeline_profile",
+    }
 
     # ОБРАБОТЧИКИ СОБЫТИЙ (для подписки на шину)
     _EVENT_HANDLERS = {"PIPELINE_COMPLETE": "_handle_pipeline_complete"}
 
-    def __init__(self, suckers: List[ISucker] = None, **kwargs):
+    def __init__(
+        self,
+        suckers: List[ISucker] = None,
+        executor: Optional[SuckerExecutor] = None,
+        compiled: bool = False,
+        journal: Optional[ErrorJournal] = None,
+        pre_ass: Optional[CommitBuffer] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        profiler: Optional[PipelineProfiler] = None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         self.suckers = suckers or []  # Упорядоченный список присосок
+        # Исполнитель для присосок с execution=thread/process (пулы общие на процесс)
+        self.executor = executor or default_executor
+        # PROCESS_PIPELINE через скомпилированный конвейер (слияние стадий)
+        self.compiled = compiled
+        self._pipeline: Optional[CompiledPipeline] = None
+        # Журнал ошибок ("жопа"): по умолчанию общий на процесс
+        self.journal = journal or error_journal
+        # Пред-жопие: write-behind буфер успешных результатов (по умолчанию общий, SQLite)
+        self.pre_ass = pre_ass or commit_buffer
+        # Чекпоинты долгих прогонов (batch/stream с checkpoint_every)
+        self.checkpoints = checkpoints or checkpoint_store
+        # Профиль стадий: общий для всех экземпляров класса (standin создается на запрос)
+        self.profiler = profiler or pipeline_profiler(self.__class__.__name__)
+
+    def pipeline(self) -> CompiledPipeline:
+        """Скомпилированный конвейер (собирается один раз при первом вызове)."""
+        if self._pipeline is None:
+            self._pipeline = compile_pipeline(self.suckers, self.executor)
+            print(f"[PipelineTentacle] Конвейер скомпилирован: {self._pipeline.describe()}")
+        return self._pipeline
 
     async def _process_pipeline(self, context: CommandContext) -> OctaResponse[Dict[str, Any]]:
         """Запускает конвейер присосок"""
 
         print(f"\n[PipelineTentacle] Запуск конвейера с {len(self.suckers)} присосками")
 
-        # 1. Создаем начальный контекст
-        sucker_context = SuckerContext(
+        # 1. Создаем начальный контекст (легкий: pydantic - только в событии и ответе)
+        sucker_context = FastSuckerContext(
             data=context.params.get("data", {}),
             metadata={
                 "command": context.command_name,
@@ -38,14 +103,59 @@ class PipelineTentacle(CommandDispatchTentacle):
             },
         )
 
-        # 2. Прогоняем через все присоски
+        # 2. Прогоняем через скомпилированный конвейер или через все присоски
+        if self.compiled:
+            sucker_context, failure = await self._run_compiled(sucker_context)
+        else:
+            sucker_context, failure = await self._run_suckers(sucker_context)
+        if failure is not None:
+            return failure
+
+        # 3. Успешное завершение
+        sucker_context.status = "SUCCESS"
+        print("[PipelineTentacle] Конвейер завершен успешно!")
+
+        # 4. Записываем в "пред-жопие" (буфер для финальной коммитации)
+        await self._commit_to_pre_ass(sucker_context)
+        print(
+            f"[PipelineTentacle] Финализация в пред-жопии: {sucker_context.metadata['pipeline_id']}"
+        )
+
+        # 5. Отправляем событие о завершении
+        try:
+            if hasattr(self, "message_bus") and self.message_bus:
+                from app.body.blood import OctaEvent
+
+                complete_event = OctaEvent(
+                    event="PIPELINE_COMPLETE", payload=sucker_context.model_dump()
+                )
+                await self.message_bus.publish("PIPELINE_COMPLETE", complete_event)
+        except Exception as e:
+            print(f"[PipelineTentacle] Не удалось отправить событие: {e}")
+
+        return OctaResponse.ok(
+            data={
+                "result": sucker_context.data,
+                "metadata": plain_metadata(sucker_context.metadata),
+                "status": "COMPLETED",
+            },
+            command_name=context.command_name,
+            correlation_id=context.correlation_id,
+        )
+
+    async def _run_suckers(
+        self, sucker_context: FastSuckerContext
+    ) -> Tuple[FastSuckerContext, Optional[OctaResponse]]:
+        """Прогон по присоскам одна за другой. Второй элемент - ответ-ошибка или None."""
         for i, sucker in enumerate(self.suckers):
             try:
                 sucker_name = sucker.__class__.__name__
                 print(f"  [{i + 1}/{len(self.suckers)}] Присоска: {sucker_name}")
 
-                # Обработка
-                sucker_context = await sucker.process(sucker_context)
+                # Обработка (CPU-тяжелые присоски - вне event loop)
+                mark = self.profiler.begin()
+                sucker_context = await self.executor.run(sucker, sucker_context)
+                self.profiler.end_status(sucker_name, mark, sucker_context.status)
 
                 # Проверка статуса
                 if sucker_context.status == "ERROR":
@@ -54,82 +164,470 @@ class PipelineTentacle(CommandDispatchTentacle):
                     # Записываем ошибку в "жопу" (логируем пока что)
                     await self._log_to_ass(sucker_context, failed_at=sucker_name)
 
-                    return OctaResponse.fail(
+                    return sucker_context, OctaResponse.fail(
                         f"Ошибка в присоске {sucker_name}: {sucker_context.data.get('error', 'Неизвестная ошибка')}"
                     )
 
                 elif sucker_context.status == "ROLLBACK":
                     print(f"    ↺ Откат от присоски {sucker_name}")
                     # Логика отката (пока просто останавливаемся)
-                    return OctaResponse.fail("Конвейер откатил изменения")
+                    return sucker_context, OctaResponse.fail("Конвейер откатил изменения")
 
                 print("    ✓ Успех")
 
             except Exception as e:
                 print(f"    💥 Сбой в присоске {sucker.__class__.__name__}: {e}")
                 await self._log_to_ass(sucker_context, exception=str(e))
-                return OctaResponse.fail(f"Сбой в присоске {i + 1}: {str(e)}")
+                return sucker_context, OctaResponse.fail(f"Сбой в присоске {i + 1}: {str(e)}")
 
-        # 3. Успешное завершение
-        sucker_context.status = "SUCCESS"
-        print("[PipelineTentacle] Конвейер завершен успешно!")
+        return sucker_context, None
 
-        # 4. Записываем в "пред-жопие" (буфер для финальной коммитации)
-        await self._commit_to_pre_ass(sucker_context)
+    async def _run_compiled(
+        self, sucker_context: FastSuckerContext
+    ) -> Tuple[FastSuckerContext, Optional[OctaResponse]]:
+        """Прогон через скомпилированный конвейер: те же результаты и ошибки, меньше проходов."""
+        pipeline = self.pipeline()
+        print(f"  Скомпилированный конвейер: {len(pipeline.stages)} стадий")
+        try:
+            sucker_context, failed_at = await pipeline.run(sucker_context, self.profiler)
+        except Exception as e:
+            print(f"    💥 Сбой в скомпилированном конвейере: {e}")
+            await self._log_to_ass(sucker_context, exception=str(e))
+            return sucker_context, OctaResponse.fail(f"Сбой в скомпилированном конвейере: {e}")
 
-        # 5. Отправляем событие о завершении
+        if sucker_context.status == "ERROR":
+            print(f"    ✗ Ошибка в присоске {failed_at}")
+            await self._log_to_ass(sucker_context, failed_at=failed_at)
+            error = sucker_context.data.get("error", "Неизвестная ошибка")
+            return sucker_context, OctaResponse.fail(f"Ошибка в присоске {failed_at}: {error}")
+        if sucker_context.status == "ROLLBACK":
+            print(f"    ↺ Откат от присоски {failed_at}")
+            return sucker_context, OctaResponse.fail("Конвейер откатил изменения")
+
+        print("    ✓ Успех")
+        return sucker_context, None
+
+    async def _process_pipeline_batch(
+        self, context: CommandContext
+    ) -> OctaResponse[Dict[str, Any]]:
+        """
+        Пакетный конвейер: записи транспонируются в столбцы (SuckerBatch), присоски
+        с process_batch обрабатывают их целиком, остальные - по записи.
+        Записи с ошибками отбраковываются и не останавливают остальной батч.
+
+        checkpoint_every (в params) режет вход на куски по столько записей: после
+        каждого куска результаты сбрасываются в пред-жопие и пишется чекпоинт.
+        Повтор команды с тем же correlation_id продолжает с последнего чекпоинта
+        (в ответе - только результаты этого запуска и resumed_from).
+        """
+        records = context.params.get("records", [])
+        every = context.params.get("checkpoint_every")
+        checkpoint = await self._load_checkpoint(context, every)
+        offset = checkpoint.get("input_offset", 0)
+        stages: Dict[str, Dict[str, int]] = checkpoint.get("stages", {})
+        committed = checkpoint.get("committed_watermark", 0)
+        print(
+            f"\n[PipelineTentacle] Пакетный запуск: {len(records)} записей, "
+            f"{len(self.suckers)} присосок" + (f", продолжаем с записи {offset}" if offset else "")
+        )
+
+        metadata = {
+            "command": context.command_name,
+            "correlation_id": context.correlation_id,
+            "user_id": context.user_id,
+            "pipeline_id": f"pipe_{context.correlation_id}",
+            "suckers_count": len(self.suckers),
+            "batch_size": len(records),
+        }
+        step = every or max(len(records) - offset, 1)
+        results: List[Dict[str, Any]] = []
+        rejected: Dict[int, str] = {}
+        batch = None
+        for start in range(offset, len(records), step) if records else [0]:
+            chunk = records[start : start + step]
+            try:
+                batch = SuckerBatch.from_records(chunk, metadata=dict(metadata))
+            except ValueError as e:
+                return OctaResponse.fail(f"Некорректный батч: {e}")
+            # row_id - номер записи во всем входе, а не в куске
+            batch.row_ids = [start + row_id for row_id in batch.row_ids]
+
+            batch, failure = await self._run_batch_suckers(batch, stages)
+            if failure is not None:
+                return failure
+
+            if batch.errors:
+                # Одна запись в жопу на весь батч, а не по записи на каждую ошибку
+                await self._log_to_ass(self._batch_error_context(batch))
+            chunk_results = batch.to_records()
+            # В пред-жопие - каждая успешная запись (метаданные батча общие)
+            for row in chunk_results:
+                await self._commit_to_pre_ass(FastSuckerContext(row, batch.metadata, "SUCCESS"))
+            print(f"[PipelineTentacle] В пред-жопие передано записей: {len(chunk_results)}")
+            results.extend(chunk_results)
+            rejected.update(batch.errors)
+
+            if every:
+                committed += len(chunk_results)
+                await self._save_checkpoint(
+                    context,
+                    input_offset=start + len(chunk),
+                    committed_watermark=committed,
+                    stages=stages,
+                )
+
+        if batch is None:  # Все записи уже обработаны прошлым запуском
+            batch = SuckerBatch(columns={}, row_ids=[], metadata=metadata)
+        batch.status = "SUCCESS"
+        if every:
+            await self.checkpoints.clear(context.correlation_id)
+
+        summary = SuckerContext(
+            data={"processed": len(results), "rejected": len(rejected)},
+            metadata=batch.metadata,
+            status=batch.status,
+        )
         try:
             if hasattr(self, "message_bus") and self.message_bus:
                 from app.body.blood import OctaEvent
 
-                complete_event = OctaEvent(
-                    event="PIPELINE_COMPLETE", payload=sucker_context.model_dump()
-                )
+                # В событие уходит сводка: сами записи батча могут быть огромными
+                complete_event = OctaEvent(event="PIPELINE_COMPLETE", payload=summary.model_dump())
                 await self.message_bus.publish("PIPELINE_COMPLETE", complete_event)
         except Exception as e:
             print(f"[PipelineTentacle] Не удалось отправить событие: {e}")
 
+        data = {
+            "results": results,
+            # row_id (номер записи во входном списке) -> причина отбраковки
+            "rejected": rejected,
+            "metadata": batch.metadata,
+            "status": "COMPLETED",
+        }
+        if offset:
+            data["resumed_from"] = offset
         return OctaResponse.ok(
-            data={
-                "result": sucker_context.data,
-                "metadata": sucker_context.metadata,
-                "status": "COMPLETED",
-            },
+            data=data,
+            command_name=context.command_name,
+            correlation_id=context.correlation_id,
+        )
+
+    async def _run_batch_suckers(
+        self, batch: SuckerBatch, stages: Dict[str, Dict[str, int]]
+    ) -> Tuple[SuckerBatch, Optional[OctaResponse]]:
+        """Прогоняет батч через присоски; stages копит строки и отбраковку по стадиям."""
+        for i, sucker in enumerate(self.suckers):
+            sucker_name = sucker.__class__.__name__
+            mode = "батч" if hasattr(sucker, "process_batch") else "по записи"
+            print(f"  [{i + 1}/{len(self.suckers)}] Присоска: {sucker_name} ({mode})")
+            rows_in, rejected_before = batch.size, len(batch.errors)
+            # Вызовов на батч мало: замеряется каждый
+            mark = self.profiler.begin(force=True)
+            try:
+                if hasattr(sucker, "process_batch"):
+                    batch = await sucker.process_batch(batch)
+                else:
+                    batch = await self._process_batch_by_record(sucker, batch)
+            except Exception as e:
+                self.profiler.end(sucker_name, mark, rows_in, errors=rows_in)
+                print(f"    💥 Сбой в присоске {sucker_name}: {e}")
+                await self._log_to_ass(self._batch_error_context(batch), exception=str(e))
+                return batch, OctaResponse.fail(f"Сбой в присоске {i + 1}: {str(e)}")
+
+            self.profiler.end(
+                sucker_name,
+                mark,
+                rows_in,
+                errors=len(batch.errors) - rejected_before,
+                rollbacks=rows_in if batch.status == "ROLLBACK" else 0,
+            )
+            if batch.status == "ERROR":
+                print(f"    ✗ Ошибка в присоске {sucker_name}")
+                await self._log_to_ass(self._batch_error_context(batch), failed_at=sucker_name)
+                return batch, OctaResponse.fail(f"Ошибка в присоске {sucker_name}")
+            if batch.status == "ROLLBACK":
+                print(f"    ↺ Откат от присоски {sucker_name}")
+                return batch, OctaResponse.fail("Конвейер откатил изменения")
+            stage = stages.setdefault(f"{i}:{sucker_name}", {"rows_in": 0, "rejected": 0})
+            stage["rows_in"] += rows_in
+            stage["rejected"] += len(batch.errors) - rejected_before
+            print(f"    ✓ Успех (записей: {batch.size}, отбраковано: {len(batch.errors)})")
+        return batch, None
+
+    async def _process_batch_by_record(self, sucker: ISucker, batch: SuckerBatch) -> SuckerBatch:
+        """
+        Запасной путь для присосок без process_batch: process() по каждой записи.
+        Для execution=process записи уходят в пул процессов пачками (offload_batch).
+        """
+        processed, rejected = [], {}
+        # Метаданные записей - слои поверх общих метаданных батча, без копий
+        contexts = [
+            FastSuckerContext.over(batch.record(position), batch.metadata)
+            for position in range(batch.size)
+        ]
+        if self.executor.execution_of(sucker) == PROCESS:
+            results = await self.executor.run_many(sucker, contexts)
+        else:
+            results = [await self.executor.run(sucker, context) for context in contexts]
+        for position, record_context in enumerate(results):
+            if isinstance(record_context, Exception):
+                raise record_context
+            if record_context.status == "ERROR":
+                rejected[position] = str(record_context.data.get("error", "Неизвестная ошибка"))
+            elif record_context.status == "ROLLBACK":
+                batch.status = "ROLLBACK"
+                return batch
+            else:
+                processed.append(record_context)
+
+        rebuilt = SuckerBatch.from_records([ctx.data for ctx in processed], metadata=batch.metadata)
+        # Метаданные присоски одинаковы для записей - берем от последней успешной
+        if processed:
+            batch.metadata.update(processed[-1].metadata)
+        batch.reject(rejected)
+        batch.columns = rebuilt.columns
+        return batch
+
+    @staticmethod
+    def _batch_error_context(batch: SuckerBatch) -> SuckerContext:
+        """Контекст для журнала ошибок по батчу (отбракованные записи - в data)."""
+        return SuckerContext(
+            data={"error": f"Отбраковано записей: {len(batch.errors)}", "rejected": batch.errors},
+            metadata=batch.metadata,
+            status="ERROR",
+        )
+
+    async def _process_pipeline_stream(
+        self, context: CommandContext
+    ) -> OctaResponse[Dict[str, Any]]:
+        """
+        Потоковый конвейер: вход - async-итератор записей, присоски - стадии
+        с ограниченными буферами. Каждый результат сразу уходит событием
+        PIPELINE_RESULT в result_topic (по умолчанию PIPELINE_RESULT.<correlation_id>),
+        в конце - PIPELINE_STREAM_END со сводкой. Ответ команды - только сводка.
+
+        params: source = "params" (records) | "file" (path, JSONL) | "topic" (topic,
+        idle_timeout, limit); buffer_size - размер буфера между стадиями;
+        workers - число воркеров по стадиям; ordered - сохранять порядок входа.
+        В сводке - загрузка стадий (stages) и узкое место (bottleneck).
+
+        checkpoint_every - каждые столько записей пред-жопие сбрасывается и пишется
+        чекпоинт: input_offset - сколько записей входа сплошь обработано (с начала),
+        processed/rejected и отказы по стадиям. Упавший поток, запущенный снова
+        с тем же correlation_id, пропускает уже обработанные записи источника
+        (при ordered=False записи, обогнавшие водяной знак, могут повториться).
+        """
+        params = context.params
+        try:
+            records = self._stream_source(params)
+        except (KeyError, ValueError) as e:
+            return OctaResponse.fail(f"Некорректный источник потока: {e}")
+        every = params.get("checkpoint_every")
+        checkpoint = await self._load_checkpoint(context, every)
+        offset = checkpoint.get("input_offset", 0)
+        if offset:
+            records = skip_records(records, offset)
+
+        bus = getattr(self, "message_bus", None)
+        result_topic = params.get("result_topic", f"PIPELINE_RESULT.{context.correlation_id}")
+        metadata = {
+            "command": context.command_name,
+            "correlation_id": context.correlation_id,
+            "user_id": context.user_id,
+            "pipeline_id": f"pipe_{context.correlation_id}",
+            "suckers_count": len(self.suckers),
+        }
+        print(f"\n[PipelineTentacle] Потоковый запуск ({params.get('source', 'params')})")
+
+        from app.body.blood import OctaEvent
+
+        processed = checkpoint.get("processed", 0)
+        rejected = checkpoint.get("rejected", 0)
+        stages: Dict[str, int] = checkpoint.get("stages", {})
+        # Водяной знак: все записи с номером < watermark обработаны; done - обогнавшие его
+        watermark, done = offset, set()
+        since_checkpoint = 0
+        report: Dict[str, Any] = {}
+        try:
+            async for result in stream_pipeline(
+                self.suckers,
+                records,
+                metadata,
+                buffer_size=params.get("buffer_size", 100),
+                workers=params.get("workers"),
+                # С чекпоинтами порядок по умолчанию сохраняется: водяной знак точный
+                ordered=params.get("ordered", bool(every)),
+                report=report,
+                executor=self.executor,
+                start_index=offset,
+                profiler=self.profiler,
+            ):
+                if result.status == "SUCCESS":
+                    processed += 1
+                    await self._commit_to_pre_ass(result)
+                else:
+                    rejected += 1
+                    failed_at = result.metadata.get("failed_at")
+                    stages[failed_at] = stages.get(failed_at, 0) + 1
+                    await self._log_to_ass(result, failed_at=failed_at)
+                if every:
+                    done.add(result.metadata["record_index"])
+                    while watermark in done:
+                        done.remove(watermark)
+                        watermark += 1
+                    since_checkpoint += 1
+                    if since_checkpoint >= every:
+                        since_checkpoint = 0
+                        await self._save_stream_checkpoint(
+                            context, watermark, processed, rejected, stages
+                        )
+                if bus:
+                    # Ключ партиции = correlation_id: результаты потока приходят по порядку
+                    await bus.publish(
+                        result_topic,
+                        OctaEvent(
+                            event="PIPELINE_RESULT",
+                            payload=result.model_dump(),
+                            partition_key=context.correlation_id,
+                        ),
+                    )
+        except Exception as e:
+            print(f"    💥 Сбой потока: {e}")
+            if every:
+                # Все, что успело выйти из конвейера, не придется повторять
+                await self._save_stream_checkpoint(context, watermark, processed, rejected, stages)
+            return OctaResponse.fail(f"Сбой потока после {processed + rejected} записей: {e}")
+
+        if every:
+            await self.checkpoints.clear(context.correlation_id)
+        summary = {
+            "processed": processed,
+            "rejected": rejected,
+            "result_topic": result_topic,
+            **report,
+        }
+        if offset:
+            summary["resumed_from"] = offset
+        print(f"[PipelineTentacle] Поток завершен: {summary}")
+        if bus:
+            await bus.publish(
+                result_topic,
+                OctaEvent(
+                    event="PIPELINE_STREAM_END",
+                    payload=summary,
+                    partition_key=context.correlation_id,
+                ),
+            )
+        return OctaResponse.ok(
+            data={**summary, "metadata": metadata, "status": "COMPLETED"},
             command_name=context.command_name,
             correlation_id=context.correlation_id,
         )
 
+    async def _save_stream_checkpoint(
+        self,
+        context: CommandContext,
+        watermark: int,
+        processed: int,
+        rejected: int,
+        stages: Dict[str, int],
+    ):
+        # Успешные записи сбрасываются в пред-жопие перед чекпоинтом - их число и есть
+        # committed_watermark (счетчики накопительные с начала прогона)
+        await self._save_checkpoint(
+            context,
+            input_offset=watermark,
+            committed_watermark=processed,
+            processed=processed,
+            rejected=rejected,
+            stages=stages,
+        )
+
+    async def _pipeline_profile(self, context: CommandContext) -> OctaResponse[Dict[str, Any]]:
+        """
+        Отчет профиля стадий конвейера (hottest - самая дорогая стадия).
+        params: reset - обнулить профиль после отчета.
+        """
+        report = self.profiler.report()
+        if self.executor.memo is not None:
+            # Попадания в кэш детерминированных присосок этого конвейера
+            names = [sucker.__class__.__name__ for sucker in self.suckers]
+            report["memo"] = self.executor.memo.report(names)
+        if context.params.get("reset"):
+            self.profiler.reset()
+        print(f"[PipelineTentacle] Профиль {report['pipeline']}: узкое место - {report['hottest']}")
+        return OctaResponse.ok(
+            data=report,
+            command_name=context.command_name,
+            correlation_id=context.correlation_id,
+        )
+
+    def _stream_source(self, params: Dict[str, Any]):
+        """Async-итератор записей по описанию источника из params."""
+        source = params.get("source", "params")
+        if source == "params":
+            return records_from_params(params["records"], params.get("chunk_size", 500))
+        if source == "file":
+            return records_from_jsonl(params["path"])
+        if source == "topic":
+            bus = getattr(self, "message_bus", None)
+            if not bus:
+                raise ValueError("для источника 'topic' нужна шина сообщений")
+            return records_from_topic(
+                bus,
+                params["topic"],
+                idle_timeout=params.get("idle_timeout"),
+                limit=params.get("limit"),
+            )
+        raise ValueError(f"неизвестный источник '{source}'")
+
+    async def _load_checkpoint(self, context: CommandContext, every: Optional[int]) -> Dict:
+        """Чекпоинт прошлого запуска с тем же correlation_id ({} - начинаем с нуля)."""
+        if not every:
+            return {}
+        checkpoint = await self.checkpoints.load(context.correlation_id)
+        if checkpoint is None or checkpoint.get("command") != context.command_name:
+            return {}
+        print(f"[PipelineTentacle] ⏯ Найден чекпоинт: {checkpoint}")
+        return checkpoint
+
+    async def _save_checkpoint(self, context: CommandContext, **state: Any):
+        """
+        Чекпоинт пишется после сброса пред-жопия: committed_watermark
+        не может обогнать то, что реально лежит в хранилище.
+        """
+        if not await self.pre_ass.flush():
+            print("[PipelineTentacle] ⚠️ Пред-жопие не сброшено, чекпоинт пропущен")
+            return
+        await self.checkpoints.save(
+            context.correlation_id, {"command": context.command_name, **state}
+        )
+
     async def _handle_pipeline_complete(self, event):
         """Обработчик события завершения конвейера"""
         print(f"[PipelineTentacle] Получено событие завершения: {event.event}")
+        if is_claim_checked(event):
+            # Большой результат приехал ссылкой: payload - await fetch_payload(event)
+            ref, size = event.headers[CLAIM_CHECK_HEADER], event.headers[CLAIM_CHECK_SIZE_HEADER]
+            print(f"[PipelineTentacle] Результат в хранилище блобов: {ref} ({size} байт)")
         # Можно сделать что-то по завершению всех конвейеров
 
-    async def _commit_to_pre_ass(self, context: SuckerContext):
-        """Буферизация в пред-жопии (заглушка)"""
-        print(f"[PipelineTentacle] Финализация в пред-жопии: {context.metadata['pipeline_id']}")
-        # Здесь будет логика буферизации перед записью в основное хранилище
-        # Например: запись в Redis, файл или очередь сообщений
+    async def _commit_to_pre_ass(self, context: Union[SuckerContext, FastSuckerContext]):
+        """Буферизация в пред-жопии: на диск уходит батчами из фонового сброса"""
+        await self.pre_ass.add(context)
 
-    async def _log_to_ass(self, context: SuckerContext, **kwargs):
-        """Логирование в 'жопу' (реализация через файл)"""
+    async def _log_to_ass(self, context: Union[SuckerContext, FastSuckerContext], **kwargs):
+        """Логирование в 'жопу': запись в журнал ошибок (JSONL, фоновый писатель)"""
         error_data = {
             "timestamp": datetime.now().isoformat(),
             "pipeline_id": context.metadata.get("pipeline_id"),
             "error": context.data.get("error"),
-            "metadata": context.metadata,
+            "metadata": plain_metadata(context.metadata),
             **kwargs,
         }
 
-        # Простая реализация - запись в JSON файл
-        log_file = Path("./storage/ass_errors.json")
-        log_file.parent.mkdir(exist_ok=True)
-
-        existing = []
-        if log_file.exists():
-            existing = json.loads(log_file.read_text())
-
-        existing.append(error_data)
-        log_file.write_text(json.dumps(existing, indent=2, ensure_ascii=False))
+        # Не блокирует: запись уходит в буфер, на диск - пачкой из фонового писателя
+        self.journal.append(error_data)
 
         print(f"[PipelineTentacle] Ошибка записана в жопу: {error_data['error']}")
 
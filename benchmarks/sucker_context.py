@@ -0,0 +1,54 @@
+# benchmarks/sucker_context.py
+"""
+Накладные расходы контекста на запись: pydantic SuckerContext против FastSuckerContext.
+
+Запуск из корня проекта:
+    python -m benchmarks.sucker_context [записей]
+
+Сценарий как у потокового конвейера: контекст на запись поверх общих
+метаданных, три присоски дописывают по ключу, в конце - payload события.
+"""
+
+import sys
+import time
+
+from app.suckers.base import FastSuckerContext, SuckerContext
+
+SHARED = {
+    "command": "PROCESS_PIPELINE_STREAM",
+    "correlation_id": "BENCH-1",
+    "user_id": 1,
+    "pipeline_id": "pipe_BENCH-1",
+    "suckers_count": 3,
+}
+
+
+def run_pydantic(records):
+    for index, record in enumerate(records):
+        context = SuckerContext(data=record, metadata={**SHARED, "record_index": index})
+        for stage in ("validated", "multiplied", "logged"):
+            context.metadata[stage] = True
+        context.model_dump()
+
+
+def run_fast(records):
+    for index, record in enumerate(records):
+        context = FastSuckerContext.over(record, SHARED, record_index=index)
+        for stage in ("validated", "multiplied", "logged"):
+            context.metadata[stage] = True
+        context.model_dump()
+
+
+def main(count: int):
+    records = [{f"f{j}": i + j for j in range(10)} for i in range(count)]
+    timings = {}
+    for name, run in (("pydantic", run_pydantic), ("fast", run_fast)):
+        started = time.perf_counter()
+        run(records)
+        timings[name] = time.perf_counter() - started
+        print(f"  {name:9s} {timings[name]:.3f}s ({timings[name] / count * 1e6:.2f} мкс/запись)")
+    print(f"Записей: {count}, ускорение: x{timings['pydantic'] / timings['fast']:.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
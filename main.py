@@ -3,9 +3,11 @@ import os
 
 from app import Brain, CommandContext
 from app.body.blood import OctaEvent
-from app.body.messaging import InMemoryMessageBus, KafkaMessageBus
+from app.body.messaging import FileLogMessageBus, InMemoryMessageBus, KafkaMessageBus
+from app.body.storage import commit_buffer, error_journal
 from app.brain.dependency_provider import BodyServiceProvider
 from app.brain.logger import logger
+from app.suckers.execution import default_executor
 from app.tentacles import ConfigPayload, VideoPayload
 
 # --- Глобальная инициализация ---
@@ -19,9 +21,18 @@ async def ask_octamillia():
     # 1. КОМПОЗИЦИЯ: Создание конкретных реализаций ВНЕ Провайдера
     bus_config = {
         "kafka": KafkaMessageBus(bootstrap_servers="localhost:9092"),
-        "inmemory": InMemoryMessageBus(),
+        # Ордера: порядок нужен только в пределах одного id -> 4 параллельные партиции
+        "inmemory": InMemoryMessageBus(topic_partitions={"ORDER_TOPIC": 4}),
+        # Долговечный локальный лог (без брокера): переживает рестарт процесса
+        "filelog": FileLogMessageBus(root="./storage/bus_log"),
     }
-    provider = BodyServiceProvider(logger, bus_implementations=bus_config)
+    provider = BodyServiceProvider(
+        logger,
+        bus_implementations=bus_config,
+        # Большие результаты конвейеров едут по шинам ссылкой на блоб (claim check)
+        claim_check_threshold=256 * 1024,
+        claim_check_topics=["PIPELINE_COMPLETE"],
+    )
     brain = Brain(body_provider=provider)
 
     # Запускаем сердце (оно попробует поднять и Кафку, и Память)
@@ -202,7 +213,9 @@ async def ask_octamillia():
     print("\n--- 🩸 ТЕСТ 4: Асинхронная публикация в Сосуд (ORDER_TOPIC) ---")
     # --- ТЕСТ 4.1: InMemory ---
     print("\n--- 🩸 ТЕСТ 4.1: InMemory ---")
-    event_mem = OctaEvent(event="TEST_MEM", payload={"id": "test4.1", "message": "Puck"})
+    event_mem = OctaEvent(
+        event="TEST_MEM", payload={"id": "test4.1", "message": "Puck"}, partition_key="test4.1"
+    )
 
     # Явно просим Сердце отправить только в память (для чистоты теста)
     await provider.get_heart().publish("ORDER_TOPIC", event_mem, target_bus="inmemory")
@@ -214,6 +227,7 @@ async def ask_octamillia():
     event_kafka = OctaEvent(
         event="TEST_KAFKA",
         payload={"id": "ORDER-KAFKA-1", "message": "Fuck"},  # <--- Должен быть 'id'
+        partition_key="ORDER-KAFKA-1",
     )
 
     # Явно просим Сердце отправить только в Кафку
@@ -222,8 +236,14 @@ async def ask_octamillia():
 
     await asyncio.sleep(2)
 
-    # Остановка
-    await provider.get_heart().stop()
+    # Остановка: шины дорабатывают очереди и отчитываются о недоставленном
+    report = await provider.get_heart().stop(drain_timeout=5.0)
+    print(f"Отчет остановки шин: {report}")
+    # Пулы присосок (потоки/процессы) - после шин: дренаж мог еще гнать конвейеры
+    default_executor.shutdown()
+    # Пред-жопие и журнал ошибок дописывают буферы на диск
+    await commit_buffer.close()
+    await error_journal.close()
 
 
 if __name__ == "__main__":
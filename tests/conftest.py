@@ -3,6 +3,8 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # Определяем корень проекта, независимо от того, где запущен pytest.
 # Path(__file__).parent.parent ведет из 'tests/conftest.py' к 'Octamillia/'
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -17,3 +19,14 @@ if str(PROJECT_ROOT) not in sys.path:
 # Хотя insert(0) обычно достаточно, явное удаление 'tests/' из пути
 # помогает избежать путаницы, если Brain использует sys.path[0].
 # sys.path.pop(1) # Если 'tests' добавился вторым, что часто происходит.
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Общие журнал ошибок, пред-жопие, чекпоинты и блобы пишут во временный каталог теста."""
+    from app.body.storage import blob_store, checkpoint_store, commit_buffer, error_journal
+
+    monkeypatch.setattr(error_journal, "directory", tmp_path / "ass_errors")
+    monkeypatch.setattr(commit_buffer.backend, "path", tmp_path / "pre_ass.db")
+    monkeypatch.setattr(checkpoint_store, "directory", tmp_path / "checkpoints")
+    monkeypatch.setattr(blob_store, "directory", tmp_path / "blobs")
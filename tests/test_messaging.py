@@ -0,0 +1,513 @@
+import asyncio
+import multiprocessing
+import uuid
+
+import pytest
+from pydantic import BaseModel
+
+from app.body.blood import (
+    EVENT_PAYLOADS,
+    EventPriority,
+    OctaEvent,
+    pack_event,
+    register_payload,
+    unpack_event,
+)
+from app.body.interfaces import BusClosedError
+from app.body.messaging import FileLogMessageBus, InMemoryMessageBus
+from app.body.messaging.dedup import SeenWindow
+from app.body.messaging.hearth import HeartBus
+from app.body.messaging.lanes import PriorityLanes
+from app.body.messaging.retry import RetryPolicy, TimerWheel, dead_letter_topic
+from app.body.messaging.shm_bus import SharedMemoryMessageBus
+from app.body.messaging.topic_trie import TopicTrie
+from app.brain.bus_client import BusTentacleClient, serve_commands
+from app.brain.models import OctaResponse
+from app.brain.WAI import CommandContext, CommandDispatchTentacle
+
+
+async def _settle(rounds: int = 5):
+    """Даем фоновым слушателям шин разобрать очереди."""
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+def test_seen_window_is_bounded():
+    window = SeenWindow(ttl=60.0, max_size=2)
+
+    assert window.seen("a") is False
+    assert window.seen("a") is True
+    window.seen("b")
+    window.seen("c")  # выталкивает "a"
+
+    assert len(window) == 2
+    assert window.seen("a") is False
+
+
+@pytest.mark.asyncio
+async def test_heart_broadcast_is_delivered_once():
+    heart = HeartBus(buses={"first": InMemoryMessageBus(), "second": InMemoryMessageBus()})
+    received = []
+
+    async def handler(event, source_bus=None):
+        received.append((event.event_id, source_bus))
+
+    await heart.subscribe("DEDUP_TOPIC", handler)
+    await heart.publish("DEDUP_TOPIC", OctaEvent(event="ONE", payload={}))
+    await heart.publish("DEDUP_TOPIC", OctaEvent(event="TWO", payload={}))
+    await _settle()
+
+    assert len(received) == 2
+    assert len({event_id for event_id, _ in received}) == 2
+
+
+class _BrokenBus(InMemoryMessageBus):
+    """Шина, которая всегда отказывает в публикации (имитация упавшей Кафки)."""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+
+    async def publish(self, topic, message):
+        self.attempts += 1
+        raise ConnectionError("broker is down")
+
+
+@pytest.mark.asyncio
+async def test_heart_breaker_skips_failing_bus():
+    broken = _BrokenBus()
+    heart = HeartBus(
+        buses={"kafka": broken, "inmemory": InMemoryMessageBus()},
+        fail_max=2,
+        reset_timeout=60.0,
+    )
+
+    for _ in range(5):
+        await heart.publish("BREAKER_TOPIC", OctaEvent(event="PING", payload={}))
+
+    assert broken.attempts == 2
+    assert heart.get_health()["kafka"]["state"] == "OPEN"
+    assert heart.get_health()["inmemory"]["state"] == "CLOSED"
+    await heart.stop()
+
+
+@pytest.mark.asyncio
+async def test_heart_primary_falls_back():
+    fallback = InMemoryMessageBus()
+    heart = HeartBus(
+        buses={"kafka": _BrokenBus(), "inmemory": fallback},
+        routing=HeartBus.PRIMARY,
+    )
+    received = []
+
+    async def handler(event):
+        received.append(event.event)
+
+    await fallback.subscribe("PRIMARY_TOPIC", handler)
+    await heart.publish("PRIMARY_TOPIC", OctaEvent(event="FALLBACK", payload={}))
+    await _settle()
+
+    assert received == ["FALLBACK"]
+
+
+@pytest.mark.asyncio
+async def test_file_log_bus_resumes_from_committed_offset(tmp_path):
+    bus = FileLogMessageBus(root=str(tmp_path), poll_interval=0.01)
+    for i in range(3):
+        await bus.publish("LOG_TOPIC", OctaEvent(event=f"E{i}", payload={"i": i}))
+
+    received = []
+
+    async def handler(event):
+        received.append(event.event)
+
+    await bus.subscribe("LOG_TOPIC", handler)
+    await asyncio.sleep(0.05)
+    await bus.stop()
+    assert received == ["E0", "E1", "E2"]
+
+    # Новый процесс/инстанс продолжает с закоммиченного оффсета
+    restarted = FileLogMessageBus(root=str(tmp_path), poll_interval=0.01)
+    await restarted.publish("LOG_TOPIC", OctaEvent(event="E3", payload={}))
+    await restarted.subscribe("LOG_TOPIC", handler)
+    await asyncio.sleep(0.05)
+
+    replayed = [event.event async for _, event in restarted.replay("LOG_TOPIC", from_offset=2)]
+    await restarted.stop()
+
+    assert received == ["E0", "E1", "E2", "E3"]
+    assert replayed == ["E2", "E3"]
+
+
+@pytest.mark.asyncio
+async def test_file_log_bus_rotates_and_applies_retention(tmp_path):
+    bus = FileLogMessageBus(root=str(tmp_path), segment_max_bytes=256, retention_segments=2)
+    for i in range(50):
+        await bus.publish("ROTATE", OctaEvent(event="E", payload={"i": i}))
+
+    log = bus.logs["ROTATE"]
+    assert len(log.segments) == 2
+    assert log.next_offset == 50
+    assert log.earliest_offset > 0
+
+    replayed = [offset async for offset, _ in bus.replay("ROTATE")]
+    assert replayed == list(range(log.earliest_offset, 50))
+    await bus.stop()
+
+
+def _publish_from_child(namespace: str, notify_dir: str):
+    """Процесс-писатель для проверки межпроцессной доставки."""
+
+    async def main():
+        bus = SharedMemoryMessageBus(namespace=namespace, notify_dir=notify_dir)
+        await bus.publish("SHM_TOPIC", OctaEvent(event="FROM_CHILD", payload={"pid": "child"}))
+        await bus.stop()
+
+    asyncio.run(main())
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_bus_crosses_processes(tmp_path):
+    namespace = f"test{uuid.uuid4().hex[:8]}"
+    consumer = SharedMemoryMessageBus(namespace=namespace, notify_dir=str(tmp_path), owner=True)
+    received = []
+
+    async def handler(event):
+        received.append(event.event)
+
+    await consumer.subscribe("SHM_TOPIC", handler)
+    await _settle()
+
+    child = multiprocessing.get_context("spawn").Process(
+        target=_publish_from_child, args=(namespace, str(tmp_path))
+    )
+    child.start()
+    await asyncio.to_thread(child.join, 30)
+
+    for _ in range(100):
+        if received:
+            break
+        await asyncio.sleep(0.01)
+    await consumer.stop()
+
+    assert child.exitcode == 0
+    assert received == ["FROM_CHILD"]
+
+
+def test_topic_trie_wildcards():
+    trie = TopicTrie()
+    trie.add("orders.*.created", "one_segment")
+    trie.add("orders.#", "any_depth")
+    trie.add("orders.eu.created", "exact")
+
+    assert set(trie.match("orders.eu.created")) == {"one_segment", "any_depth", "exact"}
+    assert set(trie.match("orders.us.created")) == {"one_segment", "any_depth"}
+    assert trie.match("orders") == ["any_depth"]
+    assert trie.match("payments.eu.created") == []
+
+    with pytest.raises(ValueError):
+        trie.add("orders.ord*", "broken")
+
+
+@pytest.mark.asyncio
+async def test_heart_pattern_subscription():
+    heart = HeartBus(buses={"inmemory": InMemoryMessageBus()})
+    received = []
+
+    async def handler(event, source_bus=None):
+        received.append(event.event)
+
+    await heart.subscribe("orders.*.created", handler)
+    await heart.publish("orders.eu.created", OctaEvent(event="EU", payload={}))
+    await heart.publish("orders.eu.cancelled", OctaEvent(event="SKIP", payload={}))
+    await _settle()
+
+    assert received == ["EU"]
+
+
+@pytest.mark.asyncio
+async def test_priority_lanes_prefer_urgent_without_starving_bulk():
+    lanes = PriorityLanes(weights=(2, 1, 1))
+    for i in range(5):
+        lanes.put_nowait(f"bulk{i}", EventPriority.BULK)
+    for i in range(5):
+        lanes.put_nowait(f"urgent{i}", EventPriority.URGENT)
+
+    order = [await lanes.get() for _ in range(6)]
+
+    # Раунд: 2 срочных, затем 1 массовое - массовые не голодают
+    assert order == ["urgent0", "urgent1", "bulk0", "urgent2", "urgent3", "bulk1"]
+
+
+@pytest.mark.asyncio
+async def test_in_memory_bus_delivers_urgent_first():
+    bus = InMemoryMessageBus()
+    received = []
+
+    async def handler(event):
+        received.append(event.event)
+
+    for i in range(3):
+        await bus.publish("LANES", OctaEvent(event=f"BULK{i}", priority=EventPriority.BULK))
+    await bus.publish("LANES", OctaEvent(event="CANCEL", priority=EventPriority.URGENT))
+    await bus.subscribe("LANES", handler)
+    await _settle(10)
+
+    assert received[0] == "CANCEL"
+    assert len(received) == 4
+
+
+@pytest.mark.asyncio
+async def test_timer_wheel_fires_in_order():
+    wheel = TimerWheel(tick=0.005, slots=8)
+    fired = []
+    wheel.schedule(0.06, lambda: fired.append("late"))  # больше одного оборота колеса
+    wheel.schedule(0.01, lambda: fired.append("early"))
+    cancelled = wheel.schedule(0.02, lambda: fired.append("cancelled"))
+    wheel.cancel(cancelled)
+
+    await asyncio.sleep(0.15)
+
+    assert fired == ["early", "late"]
+    assert len(wheel) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_memory_retry_then_dead_letter_and_redrive():
+    bus = InMemoryMessageBus()
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, jitter=0.0)
+    bus.wheel = TimerWheel(tick=0.005)
+    attempts = []
+
+    async def flaky(event):
+        attempts.append(event.event)
+        if event.payload["fail"]:
+            raise RuntimeError("downstream is down")
+
+    await bus.subscribe("RETRY", flaky, retry_policy=policy)
+    await bus.publish("RETRY", OctaEvent(event="POISON", payload={"fail": True}))
+    await asyncio.sleep(0.2)
+
+    assert attempts == ["POISON"] * 3
+    assert bus.qsize(dead_letter_topic("RETRY")) == 1
+
+    # Чиним обработчик и переотправляем мертвые письма
+    flaky_fixed = []
+
+    async def fixed(event):
+        flaky_fixed.append(event.event_id)
+
+    bus.deliveries["RETRY"].handler = fixed
+    assert await bus.redrive("RETRY") == 1
+    await _settle()
+
+    assert len(flaky_fixed) == 1
+    assert bus.qsize(dead_letter_topic("RETRY")) == 0
+
+
+@pytest.mark.asyncio
+async def test_in_memory_wildcard_dead_letters_go_to_concrete_topic():
+    bus = InMemoryMessageBus()
+    bus.wheel = TimerWheel(tick=0.005)
+    seen = []
+
+    async def broken(event):
+        seen.append(event.event)
+        raise RuntimeError("always fails")
+
+    policy = RetryPolicy(max_attempts=2, base_delay=0.01, jitter=0.0)
+    await bus.subscribe("orders.#", broken, retry_policy=policy)
+    await bus.publish("orders.eu.created", OctaEvent(event="ORDER", payload={"id": 1}))
+    await asyncio.sleep(0.2)
+
+    # Мертвое письмо - в DLQ конкретного топика, и паттерн его не получает
+    assert seen == ["ORDER", "ORDER"]
+    assert bus.qsize(dead_letter_topic("orders.eu.created")) == 1
+    assert bus.qsize(dead_letter_topic("orders.#")) == 0
+
+    async def fixed(event):
+        seen.append(("fixed", event.event))
+
+    bus.deliveries["orders.#"].handler = fixed
+    assert await bus.redrive("orders.eu.created") == 1
+    await _settle()
+    assert seen[-1] == ("fixed", "ORDER")
+
+
+class _OrderPayload(BaseModel):
+    id: str
+    qty: int
+
+
+def test_lazy_event_decodes_payload_on_demand():
+    register_payload("ORDER_TYPED", _OrderPayload)
+    try:
+        event = OctaEvent(event="ORDER_TYPED", payload={"id": "A-1", "qty": 3}, headers={"k": "v"})
+        lazy = unpack_event(pack_event(event))
+
+        # Конверт доступен сразу, payload еще байты
+        assert (lazy.event, lazy.event_id, lazy.headers) == (
+            "ORDER_TYPED",
+            event.event_id,
+            {"k": "v"},
+        )
+        assert lazy.is_decoded is False
+        # Транзит без обращения к payload переиспользует байты как есть
+        assert pack_event(lazy) == pack_event(event)
+
+        typed = lazy.typed_payload()
+        assert typed == _OrderPayload(id="A-1", qty=3)
+        assert lazy.to_event().model_dump() == event.model_dump()
+    finally:
+        EVENT_PAYLOADS.pop("ORDER_TYPED", None)
+
+
+@pytest.mark.asyncio
+async def test_file_log_replay_yields_lazy_events(tmp_path):
+    bus = FileLogMessageBus(root=str(tmp_path))
+    await bus.publish("T", OctaEvent(event="E", payload={"n": 1}))
+
+    replayed = [event async for _, event in bus.replay("T")]
+    await bus.stop()
+
+    assert replayed[0].is_decoded is False
+    assert replayed[0].payload == {"n": 1}
+
+
+class _EchoTentacle(CommandDispatchTentacle):
+    _COMMAND_HANDLERS = {"ECHO": "echo"}
+
+    async def echo(self, context: CommandContext) -> OctaResponse:
+        return OctaResponse.ok(context.params)
+
+    async def get_health(self) -> float:
+        return 1.0
+
+
+@pytest.mark.asyncio
+async def test_bus_rpc_request_reply_and_timeout():
+    bus = InMemoryMessageBus()
+    client = BusTentacleClient(bus, timeout=0.2, fail_max=1)
+    await serve_commands(bus, _EchoTentacle())
+
+    context = CommandContext(
+        command_name="ECHO", correlation_id="R-1", params={"x": 1}, user_id=1, source_service="T"
+    )
+    response = await client.process_command(context)
+    assert response.is_success and response.data == {"x": 1}
+
+    # Никто не обслуживает команду: таймаут размыкает предохранитель клиента
+    silent = context.model_copy(update={"command_name": "SILENT"})
+    response = await client.process_command(silent)
+    assert response.is_success is False
+    assert await client.get_health() == 0.0
+    assert client.snapshot()["timeouts"] == 1
+    assert client.pending == {}
+
+    # После reset_timeout предохранитель пропускает пробный запрос и замыкается
+    client.breaker.reset_timeout = 0.0
+    assert await client.get_health() == 1.0
+    assert client.breaker.state == "HALF_OPEN"
+    response = await client.process_command(context)
+    assert response.is_success
+    assert client.breaker.state == "CLOSED"
+
+
+@pytest.mark.asyncio
+async def test_heart_stop_drains_and_reports_leftovers():
+    fast, slow = InMemoryMessageBus(), InMemoryMessageBus()
+    heart = HeartBus(buses={"fast": fast, "slow": slow})
+    handled = []
+
+    async def quick(event, source_bus=None):
+        handled.append(event.event)
+
+    async def stuck(event):
+        await asyncio.sleep(10)
+
+    await heart.subscribe("DRAIN", quick)
+    await slow.subscribe("STUCK", stuck)
+    for i in range(3):
+        await heart.publish("DRAIN", OctaEvent(event=f"D{i}"))
+    await slow.publish("STUCK", OctaEvent(event="S0"))
+    await slow.publish("STUCK", OctaEvent(event="S1"))
+
+    reports = await heart.stop(drain_timeout=0.2)
+
+    # Очередь DRAIN дообработана до конца, зависший обработчик отменен
+    assert handled == ["D0", "D1", "D2"]
+    assert reports["fast"]["undelivered"] == {}
+    assert reports["slow"]["undelivered"] == {"STUCK": 2}
+    with pytest.raises(BusClosedError):
+        await heart.publish("DRAIN", OctaEvent(event="LATE"))
+
+
+@pytest.mark.asyncio
+async def test_in_memory_partitions_keep_per_key_order():
+    bus = InMemoryMessageBus(topic_partitions={"ORDERS": 4})
+    log = []
+    gate = asyncio.Event()
+    # crc32 % 4: "slow" -> 1, "o2" -> 3, "o4" -> 2, "o5" -> 0
+    keys = ("slow", "o2", "o4", "o5")
+
+    async def handler(event):
+        if event.partition_key == "slow":
+            # Ордер "slow" висит, остальные ключи не должны его ждать
+            await gate.wait()
+        log.append((event.partition_key, event.payload["seq"]))
+
+    await bus.subscribe("ORDERS", handler)
+    assert len(bus.listeners["ORDERS"]) == 4
+    for seq in range(3):
+        for key in keys:
+            await bus.publish(
+                "ORDERS", OctaEvent(event="ORDER", payload={"seq": seq}, partition_key=key)
+            )
+    await _settle(20)
+
+    assert sorted(log) == [(key, seq) for key in keys[1:] for seq in range(3)]
+    gate.set()
+    await _settle(20)
+
+    for key in keys:
+        assert [seq for k, seq in log if k == key] == [0, 1, 2]
+    await bus.stop()
+
+
+async def test_heart_claim_check_offloads_large_payloads(tmp_path):
+    from app.body.messaging.claim_check import CLAIM_CHECK_HEADER, fetch_payload
+    from app.body.storage import BlobStore
+
+    store = BlobStore(tmp_path / "blobs")
+    memory, log = InMemoryMessageBus(), FileLogMessageBus(root=tmp_path / "log")
+    heart = HeartBus(
+        {"memory": memory, "log": log},
+        claim_check_threshold=1024,
+        claim_check_topics=["results.#"],
+        blob_store=store,
+    )
+    await heart.start()
+    received = []
+
+    async def handler(event, source_bus=None):
+        received.append(event)
+
+    await heart.subscribe("results.big", handler)
+    await heart.subscribe("other", handler)
+
+    big = {"rows": list(range(1000))}
+    await heart.publish("results.big", OctaEvent(event="PIPELINE_COMPLETE", payload=big))
+    await heart.publish("results.big", OctaEvent(event="PIPELINE_COMPLETE", payload={"n": 1}))
+    await heart.publish("other", OctaEvent(event="PIPELINE_COMPLETE", payload=big))
+    await _settle(20)
+
+    assert len(received) == 3  # Broadcast в две шины, дубли отсечены
+    by_ref = [e for e in received if CLAIM_CHECK_HEADER in e.headers]
+    assert len(by_ref) == 1 and by_ref[0].payload is None
+    # Одна ссылка на всех: блоб записан один раз, payload - по запросу
+    assert await fetch_payload(by_ref[0], store) == big
+    assert len(list((tmp_path / "blobs").glob("??/*"))) == 1
+    # Маленький payload и топик вне claim_check_topics едут как есть
+    inline = [await fetch_payload(e, store) for e in received if e not in by_ref]
+    assert sorted(map(len, inline)) == [1, 1] and big in inline
+    await heart.stop()
@@ -0,0 +1,239 @@
+import asyncio
+
+import pytest
+
+from app.body.messaging.retry import RetryPolicy
+from app.body.storage import CommitBuffer, ErrorJournal, SQLiteCommitBackend
+from app.brain import CommandContext
+from app.suckers.validators.int_validator import IntValidatorSucker
+from app.tentacles.pipeline_tentacle import PipelineTentacle
+
+
+@pytest.mark.asyncio
+async def test_error_journal_rotates_and_filters(tmp_path):
+    journal = ErrorJournal(tmp_path / "errors", flush_size=10, segment_bytes=300, max_segments=3)
+    for i in range(12):
+        journal.append({"timestamp": f"2026-01-01T00:00:{i:02d}", "pipeline_id": f"p{i % 2}"})
+        await journal.flush()  # По сбросу на запись: сегмент переполняется каждые ~4 записи
+
+    segments = journal.segments()
+    assert len(segments) == 3  # Старые удалены по max_segments
+    assert segments == sorted(segments)
+
+    entries = await journal.query()
+    assert entries[-1]["timestamp"] == "2026-01-01T00:00:11"
+    odd = await journal.query(pipeline_id="p1", since="2026-01-01T00:00:09")
+    assert [e["timestamp"][-2:] for e in odd] == ["09", "11"]
+
+    replayed = []
+
+    async def handler(entry):
+        replayed.append(entry)
+
+    assert await journal.replay(handler, limit=2) == 2
+    assert replayed == entries[:2]
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_error_journal_background_flush_and_bounded_buffer(tmp_path):
+    journal = ErrorJournal(tmp_path, buffer_size=3, flush_size=100, flush_interval=0.05)
+    results = [journal.append({"n": n}) for n in range(5)]
+    assert results == [True, True, True, False, False]
+    assert journal.stats["dropped"] == 2
+
+    await asyncio.sleep(0.2)  # Сброс по времени, без явного flush()
+    assert [e["n"] for e in journal.read()] == [0, 1, 2]
+
+    # Оборванная сбоем строка пропускается при чтении
+    with open(journal.segments()[-1], "a", encoding="utf-8") as f:
+        f.write('{"n": 3, "trunc')
+    assert len(list(journal.read())) == 3
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_errors_go_to_journal(tmp_path):
+    journal = ErrorJournal(tmp_path)
+    tentacle = PipelineTentacle(suckers=[IntValidatorSucker()], journal=journal)
+    context = CommandContext(
+        command_name="PROCESS_PIPELINE",
+        correlation_id="J-1",
+        user_id=1,
+        params={"data": {"a": "x"}},
+        source_service="TEST_RUNNER",
+    )
+
+    response = await tentacle.process_command(context)
+    await journal.close()
+
+    assert not response.is_success
+    (entry,) = journal.read()
+    assert entry["pipeline_id"] == "pipe_J-1"
+    assert entry["failed_at"] == "IntValidatorSucker"
+
+
+class _FlakyBackend(SQLiteCommitBackend):
+    """SQLite, который падает на первых failures сбросах."""
+
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = failures
+        self.batches = []
+
+    def write_batch(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk busy")
+        super().write_batch(records)
+        self.batches.append(len(records))
+
+
+@pytest.mark.asyncio
+async def test_commit_buffer_batches_retries_and_flushes_on_close(tmp_path):
+    backend = _FlakyBackend(tmp_path / "pre.db", failures=2)
+    buffer = CommitBuffer(
+        backend,
+        batch_size=4,
+        flush_interval=10,
+        retry_policy=RetryPolicy(max_attempts=5, base_delay=0.01),
+    )
+    for n in range(10):
+        await buffer.add(
+            {
+                "data": {"n": n},
+                "metadata": {"pipeline_id": "p", "correlation_id": "c"},
+                "status": "SUCCESS",
+            }
+        )
+    for _ in range(50):  # Два полных батча пишутся в фоне (после двух неудач)
+        if buffer.in_flight == 0 and len(backend.batches) == 2:
+            break
+        await asyncio.sleep(0.01)
+
+    assert backend.batches == [4, 4]
+    assert buffer.stats["retries"] == 2
+    assert buffer.pending() == 2  # Хвост ждет времени или закрытия
+
+    report = await buffer.close()
+    assert report == {"uncommitted": 0, "in_flight": 0}
+    assert backend.batches == [4, 4, 2]
+    assert backend.count(correlation_id="c") == 10
+
+
+@pytest.mark.asyncio
+async def test_commit_buffer_reports_what_could_not_be_written(tmp_path):
+    backend = _FlakyBackend(tmp_path / "pre.db", failures=100)
+    buffer = CommitBuffer(backend, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+    await buffer.add({"data": {}, "metadata": {}, "status": "SUCCESS"})
+
+    assert await buffer.close() == {"uncommitted": 1, "in_flight": 1}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_commits_results_to_pre_ass(tmp_path):
+    buffer = CommitBuffer(SQLiteCommitBackend(tmp_path / "pre.db"))
+    tentacle = PipelineTentacle(suckers=[IntValidatorSucker()], pre_ass=buffer)
+    context = CommandContext(
+        command_name="PROCESS_PIPELINE_BATCH",
+        correlation_id="C-1",
+        user_id=1,
+        params={"records": [{"a": 1}, {"a": "x"}, {"a": 3}]},
+        source_service="TEST_RUNNER",
+    )
+
+    await tentacle.process_command(context)
+    await buffer.close()
+
+    assert buffer.backend.count(correlation_id="C-1", status="SUCCESS") == 2
+
+
+class _CrashingSourceTentacle(PipelineTentacle):
+    """Источник потока обрывается после crash_after записей (пока crash_after задан)."""
+
+    crash_after = None
+
+    def _stream_source(self, params):
+        records, crash_after = params["records"], self.crash_after
+
+        async def source():
+            for i, record in enumerate(records):
+                if crash_after is not None and i == crash_after:
+                    raise IOError("источник оборвался")
+                yield record
+
+        return source()
+
+
+def _pipeline_context(command, correlation_id, **params):
+    return CommandContext(
+        command_name=command,
+        correlation_id=correlation_id,
+        user_id=1,
+        params=params,
+        source_service="TEST",
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_from_checkpoint(tmp_path):
+    backend = SQLiteCommitBackend(tmp_path / "pre_ass.db")
+    tentacle = _CrashingSourceTentacle(
+        suckers=[IntValidatorSucker()], pre_ass=CommitBuffer(backend)
+    )
+    records = [{"n": "x"} if i == 3 else {"n": i} for i in range(10)]
+    context = _pipeline_context(
+        "PROCESS_PIPELINE_STREAM", "RUN-S", records=records, checkpoint_every=2
+    )
+
+    tentacle.crash_after = 7
+    assert not (await tentacle._process_pipeline_stream(context)).is_success
+    checkpoint = await tentacle.checkpoints.load("RUN-S")
+    # Чекпоинт при сбое: 7 записей вышли из конвейера, все успешные - в хранилище
+    assert checkpoint["input_offset"] == 7
+    assert (checkpoint["processed"], checkpoint["rejected"]) == (6, 1)
+    assert checkpoint["stages"] == {"IntValidatorSucker": 1}
+    assert backend.count(correlation_id="RUN-S") == checkpoint["committed_watermark"] == 6
+
+    tentacle.crash_after = None
+    response = await tentacle._process_pipeline_stream(context)
+    assert response.is_success
+    assert response.data["resumed_from"] == 7
+    assert (response.data["processed"], response.data["rejected"]) == (9, 1)
+    await tentacle.pre_ass.flush()
+    assert backend.count(correlation_id="RUN-S") == 9  # Без повторов
+    # Завершенный прогон чекпоинт не оставляет
+    assert await tentacle.checkpoints.load("RUN-S") is None
+    await tentacle.pre_ass.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_resumes_from_checkpoint(tmp_path):
+    backend = SQLiteCommitBackend(tmp_path / "pre_ass.db")
+    tentacle = PipelineTentacle(suckers=[IntValidatorSucker()], pre_ass=CommitBuffer(backend))
+    records = [{"n": "x"} if i == 5 else {"n": i} for i in range(9)]
+    # Прошлый запуск успел обработать 4 записи и упал
+    await tentacle.checkpoints.save(
+        "RUN-B",
+        {
+            "command": "PROCESS_PIPELINE_BATCH",
+            "input_offset": 4,
+            "committed_watermark": 4,
+            "stages": {"0:IntValidatorSucker": {"rows_in": 4, "rejected": 0}},
+        },
+    )
+    context = _pipeline_context(
+        "PROCESS_PIPELINE_BATCH", "RUN-B", records=records, checkpoint_every=3
+    )
+
+    response = await tentacle._process_pipeline_batch(context)
+
+    assert response.is_success
+    assert response.data["resumed_from"] == 4
+    assert [row["n"] for row in response.data["results"]] == [4, 6, 7, 8]
+    # Номера отбракованных записей - по всему входу, а не по куску
+    assert list(response.data["rejected"]) == [5]
+    await tentacle.pre_ass.flush()
+    assert backend.count(correlation_id="RUN-B") == 4
+    assert await tentacle.checkpoints.load("RUN-B") is None
+    await tentacle.pre_ass.close()
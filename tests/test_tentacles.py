@@ -1,10 +1,26 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
 import pytest
 
+from app.body.messaging import InMemoryMessageBus
 from app.brain import CommandContext
+from app.suckers.base import FastSuckerContext, ISucker, SuckerContext
+from app.suckers.compiler import compile_pipeline
+from app.suckers.execution import SuckerExecutor
+from app.suckers.outputs.logger import LoggerSucker
+from app.suckers.streaming import stream_pipeline
+from app.suckers.transformers.multiplier import MultiplierSucker
+from app.suckers.validators.int_validator import IntValidatorSucker
 from app.tentacles import (
     ConfigLoaderStandinTentacle,
     ConfigPayload,  # Предполагаем, что payload экспортирован
 )
+from app.tentacles.data_pipeline import DataPipelineTentacle
+from app.tentacles.pipeline_tentacle import PipelineTentacle
 
 # Используем прямой путь к классу для Unit-теста
 
@@ -56,3 +72,555 @@ async def test_config_loader_unsupported_command():
 
     assert response.status == "ERROR"
     assert "is not supported" in response.message
+
+
+def _batch_context(records):
+    return CommandContext(
+        command_name="PROCESS_PIPELINE_BATCH",
+        correlation_id="BATCH-1",
+        user_id=1,
+        params={"records": records},
+        source_service="TEST_RUNNER",
+    )
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batch_matches_per_record_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Журнал ошибок пишется в ./storage
+    records = [{"age": "25", "score": 100}, {"age": "x", "score": 1}, {"age": 7, "score": "3"}]
+
+    response = await DataPipelineTentacle().process_command(_batch_context(records))
+
+    assert response.is_success
+    # IntValidator -> x3 -> x2: как в PROCESS_PIPELINE, но столбцами
+    assert response.data["results"] == [{"age": 150, "score": 600}, {"age": 42, "score": 18}]
+    assert list(response.data["rejected"]) == [1]
+    assert response.data["metadata"]["multiplied_by_3"] is True
+
+
+class _RecordOnlySucker(ISucker):
+    """Присоска без process_batch: конвейер должен прогнать ее по записи."""
+
+    def get_config(self):
+        return {"name": "RecordOnly"}
+
+    async def process(self, context: SuckerContext) -> SuckerContext:
+        if context.data["n"] < 0:
+            context.status = "ERROR"
+            context.data = {"error": "negative"}
+            return context
+        context.data = {**context.data, "seen": "yes"}
+        return context
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batch_falls_back_to_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tentacle = PipelineTentacle(suckers=[_RecordOnlySucker(), MultiplierSucker(factor=10)])
+
+    response = await tentacle.process_command(_batch_context([{"n": 1}, {"n": -1}, {"n": 2}]))
+
+    assert response.data["results"] == [{"n": 10, "seen": "yes"}, {"n": 20, "seen": "yes"}]
+    assert response.data["rejected"] == {1: "negative"}
+
+
+@pytest.mark.asyncio
+async def test_stream_pipeline_yields_before_input_ends():
+    more = asyncio.Event()
+
+    async def source():
+        yield {"a": "1"}
+        await more.wait()  # Вход "висит", пока не получен первый результат
+        yield {"a": "oops"}
+        yield {"a": "2"}
+
+    stream = stream_pipeline(
+        [IntValidatorSucker(), MultiplierSucker(factor=5)], source(), {}, buffer_size=1
+    )
+    first = await asyncio.wait_for(stream.__anext__(), timeout=1)
+    assert (first.data, first.status) == ({"a": 5}, "SUCCESS")
+
+    more.set()
+    rest = [ctx async for ctx in stream]
+    assert [ctx.status for ctx in rest] == ["ERROR", "SUCCESS"]
+    assert rest[0].metadata["failed_at"] == "IntValidatorSucker"
+    assert rest[1].data == {"a": 10}
+
+
+class _NoUnsubscribeBus:
+    """Шина без unsubscribe: обработчик остается подписанным навсегда."""
+
+    def __init__(self):
+        self.handler = None
+
+    async def subscribe(self, topic, handler):
+        self.handler = handler
+
+
+@pytest.mark.asyncio
+async def test_records_from_topic_releases_subscription_after_limit():
+    from app.body.blood import OctaEvent
+    from app.suckers.streaming import records_from_topic
+
+    bus = InMemoryMessageBus()
+    for i in range(5):
+        await bus.publish("JOB.1", OctaEvent(event="ROW", payload={"n": i}))
+    rows = [row async for row in records_from_topic(bus, "JOB.1", buffer_size=1, limit=2)]
+    assert rows == [{"n": 0}, {"n": 1}]
+    assert "JOB.1" not in bus.handlers and "JOB.1" not in bus.listeners
+
+    # Без unsubscribe обработчик после конца потока не блокируется на полном буфере
+    stale = _NoUnsubscribeBus()
+    records = records_from_topic(stale, "JOB.2", buffer_size=1, limit=1)
+    reader = asyncio.create_task(records.__anext__())
+    await asyncio.sleep(0)
+    await stale.handler(OctaEvent(event="ROW", payload={"n": 0}))
+    assert await reader == {"n": 0}
+    await stale.handler(OctaEvent(event="ROW", payload={"n": 1}))  # Буфер полон
+    blocked = asyncio.create_task(stale.handler(OctaEvent(event="ROW", payload={"n": 2})))
+    await asyncio.sleep(0)
+    assert not blocked.done()
+    await records.aclose()
+    await asyncio.wait_for(blocked, timeout=1)
+    await asyncio.wait_for(stale.handler(OctaEvent(event="ROW", payload={"n": 3})), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stream_publishes_results_to_bus(tmp_path):
+    source = tmp_path / "input.jsonl"
+    source.write_text("\n".join(json.dumps({"n": i}) for i in range(5)))
+    bus = InMemoryMessageBus()
+    events = []
+
+    async def collect(event):
+        events.append(event)
+
+    await bus.subscribe("PIPELINE_RESULT.S-1", collect)
+    tentacle = PipelineTentacle(suckers=[MultiplierSucker(factor=2)], message_bus=bus)
+    context = CommandContext(
+        command_name="PROCESS_PIPELINE_STREAM",
+        correlation_id="S-1",
+        user_id=1,
+        params={"source": "file", "path": str(source)},
+        source_service="TEST_RUNNER",
+    )
+
+    response = await tentacle.process_command(context)
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+    assert response.data["processed"] == 5
+    assert [e.payload["data"]["n"] for e in events[:-1]] == [0, 2, 4, 6, 8]
+    assert events[-1].event == "PIPELINE_STREAM_END"
+    await bus.stop()
+
+
+class _SlowIOSucker(ISucker):
+    """I/O-стадия: ждет "сервис" разное время, чтобы воркеры перемешали записи."""
+
+    def get_config(self):
+        return {"name": "SlowIO", "workers": 4}
+
+    async def process(self, context: SuckerContext) -> SuckerContext:
+        await asyncio.sleep(0.02 if context.data["n"] % 2 == 0 else 0.001)
+        return context
+
+
+@pytest.mark.asyncio
+async def test_stream_pipeline_parallel_stage_ordered_sink_and_report():
+    async def source():
+        for n in range(12):
+            yield {"n": n}
+
+    report = {}
+    results = [
+        ctx.data["n"]
+        async for ctx in stream_pipeline(
+            [_SlowIOSucker(), MultiplierSucker(factor=1)],
+            source(),
+            {},
+            buffer_size=2,
+            ordered=True,
+            report=report,
+        )
+    ]
+
+    assert results == list(range(12))
+    slow, fast = report["stages"]
+    assert (slow["workers"], slow["processed"], fast["workers"]) == (4, 12, 1)
+    assert report["bottleneck"] == "_SlowIOSucker"
+
+
+class _CpuHeavySucker(ISucker):
+    """CPU-тяжелая присоска: считает в пуле процессов пачками по 4 записи."""
+
+    def get_config(self):
+        return {"name": "CpuHeavy", "execution": "process", "offload_batch": 4}
+
+    async def process(self, context: SuckerContext) -> SuckerContext:
+        n = context.data["n"]
+        if n < 0:
+            raise ValueError("negative")
+        total = sum(i * i for i in range(300_000))  # ~десятки мс чистого CPU
+        context.data = {"n": n, "square": n * n, "checksum": total % 97}
+        context.metadata["pid"] = os.getpid()
+        return context
+
+
+@pytest.mark.asyncio
+async def test_stream_pipeline_offloads_cpu_stage_without_blocking_loop():
+    executor = SuckerExecutor(max_processes=1)
+    lags = []
+
+    async def ticker():
+        # Задержки event loop, пока конвейер считает в другом процессе
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - started - 0.01)
+
+    async def source():
+        for n in [1, 2, -1, 3, 4, 5]:
+            yield {"n": n}
+
+    probe = asyncio.create_task(ticker())
+    try:
+        results = [
+            ctx
+            async for ctx in stream_pipeline(
+                [_CpuHeavySucker(), MultiplierSucker(factor=1)],
+                source(),
+                {},
+                ordered=True,
+                executor=executor,
+            )
+        ]
+    finally:
+        probe.cancel()
+        executor.shutdown()
+
+    assert [ctx.status for ctx in results] == ["SUCCESS"] * 2 + ["ERROR"] + ["SUCCESS"] * 3
+    assert results[1].data["square"] == 4
+    assert "negative" in results[2].data["error"]
+    assert results[0].metadata["pid"] != os.getpid()
+    # Записи уходили в пул пачками, а не по одной
+    assert executor.stats["process_tasks"] < 6
+    assert max(lags) < 0.2
+
+
+def _pipeline_context(data):
+    return CommandContext(
+        command_name="PROCESS_PIPELINE",
+        correlation_id="COMPILE-1",
+        user_id=1,
+        params={"data": data},
+        source_service="TEST_RUNNER",
+    )
+
+
+@pytest.mark.asyncio
+async def test_compiled_pipeline_fuses_stages_with_identical_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def suckers():
+        # Логгеры ниже уровня: от них остаются только метки метаданных
+        return [
+            IntValidatorSucker(),
+            MultiplierSucker(factor=3),
+            LoggerSucker(level=logging.DEBUG),
+            MultiplierSucker(factor=2),
+            LoggerSucker(level=logging.DEBUG),
+        ]
+
+    plain = PipelineTentacle(suckers=suckers())
+    fused = PipelineTentacle(suckers=suckers(), compiled=True)
+
+    (segment,) = fused.pipeline().stages
+    # Проверка и оба множителя - одно int() * 6 на значение
+    assert [(op.op, op.params) for op in segment.ops] == [
+        ("check_int_multiply", {"factors": [3, 2]})
+    ]
+
+    for data in [{"a": "5", "b": 2.7, "c": True}, {"a": 1, "b": "x", "c": None}, {}]:
+        expected = await plain.process_command(_pipeline_context(data))
+        actual = await fused.process_command(_pipeline_context(data))
+        assert (actual.status, actual.message) == (expected.status, expected.message)
+        if expected.is_success:
+            assert actual.data["result"] == expected.data["result"]
+            assert list(actual.data["metadata"].items()) == list(expected.data["metadata"].items())
+
+
+@pytest.mark.asyncio
+async def test_compiled_pipeline_keeps_uncompilable_stages():
+    pipeline = compile_pipeline(
+        [MultiplierSucker(factor=2), _RecordOnlySucker(), MultiplierSucker(factor=5)]
+    )
+    assert len(pipeline.stages) == 3
+
+    context, failed_at = await pipeline.run(SuckerContext(data={"n": 2}, metadata={}))
+    assert (context.data, failed_at) == ({"n": 20, "seen": "yes"}, None)
+
+    context, failed_at = await pipeline.run(SuckerContext(data={"n": -1}, metadata={}))
+    assert (context.status, failed_at) == ("ERROR", "_RecordOnlySucker")
+
+
+@pytest.mark.asyncio
+async def test_stream_records_share_pipeline_metadata_without_copies():
+    async def source():
+        for n in range(3):
+            yield {"n": n}
+
+    shared = {"pipeline_id": "pipe_1"}
+    results = [
+        ctx
+        async for ctx in stream_pipeline(
+            [IntValidatorSucker(), MultiplierSucker(factor=2)], source(), shared
+        )
+    ]
+
+    assert all(isinstance(ctx, FastSuckerContext) for ctx in results)
+    # Присоски пишут в слой записи, общие метаданные не меняются
+    assert shared == {"pipeline_id": "pipe_1"}
+    assert results[1].metadata["pipeline_id"] == "pipe_1"
+    assert results[1].metadata.shared is shared
+    # На краю - обычные словари, как у pydantic-модели
+    dumped = results[1].model_dump()
+    assert type(dumped["metadata"]) is dict
+    assert dumped == results[1].to_model().model_dump()
+    assert dumped["data"] == {"n": 2}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_factory_builds_tentacles_from_yaml(tmp_path):
+    from app.tentacles import pipeline_factory
+
+    path = tmp_path / "pipelines.yaml"
+    path.write_text(
+        """
+pipelines:
+  TRIPLE:
+    command: PROCESS_TRIPLE
+    compiled: true
+    suckers:
+      - type: int_validator
+      - type: multiplier
+        factor: 3
+      - type: logger
+        level: DEBUG
+    defaults:
+      checkpoint_every: 2
+""",
+        encoding="utf-8",
+    )
+    (offer,) = pipeline_factory.pipeline_metadata(path)
+    assert offer.tentacle_id == "TRIPLE"
+    assert offer.handles_commands == [
+        "PROCESS_TRIPLE",
+        "PROCESS_TRIPLE_BATCH",
+        "PROCESS_TRIPLE_STREAM",
+        "PROCESS_TRIPLE_PROFILE",
+    ]
+
+    # Экземпляр на запрос не пересобирает конвейер: кэш по хэшу описания
+    first, second = offer.internal_implementation(), offer.internal_implementation()
+    assert first.suckers is second.suckers
+    assert first.pipeline() is second.pipeline()
+
+    response = await first.process_command(
+        CommandContext(
+            command_name="PROCESS_TRIPLE",
+            correlation_id="YAML-1",
+            user_id=1,
+            params={"data": {"a": "2"}},
+            source_service="TEST",
+        )
+    )
+    assert response.is_success
+    assert response.data["result"] == {"a": 6}
+
+    # defaults из описания подставляются, если их нет в запросе
+    response = await second.process_command(
+        CommandContext(
+            command_name="PROCESS_TRIPLE_BATCH",
+            correlation_id="YAML-2",
+            user_id=1,
+            params={"records": [{"a": 1}, {"a": "x"}, {"a": 3}]},
+            source_service="TEST",
+        )
+    )
+    assert [row["a"] for row in response.data["results"]] == [3, 9]
+    assert list(response.data["rejected"]) == [1]
+
+
+def test_pipeline_factory_rejects_unknown_sucker():
+    from app.tentacles.pipeline_factory import validate_definition
+
+    with pytest.raises(ValueError, match="неизвестная присоска"):
+        validate_definition("BROKEN", {"command": "X", "suckers": [{"type": "nope"}]})
+
+
+@pytest.mark.asyncio
+async def test_pipeline_profile_reports_stages():
+    from app.suckers.profiling import PipelineProfiler
+
+    profiler = PipelineProfiler("test", sample_every=2)
+    tentacle = PipelineTentacle(
+        suckers=[IntValidatorSucker(), MultiplierSucker(factor=2)], profiler=profiler
+    )
+    for n, value in enumerate(["1", "x", "3", "4"]):
+        await tentacle.process_command(
+            CommandContext(
+                command_name="PROCESS_PIPELINE",
+                correlation_id=f"PROF-{n}",
+                user_id=1,
+                params={"data": {"a": value}},
+                source_service="TEST",
+            )
+        )
+    await tentacle.process_command(
+        CommandContext(
+            command_name="PROCESS_PIPELINE_BATCH",
+            correlation_id="PROF-B",
+            user_id=1,
+            params={"records": [{"a": 1}, {"a": "y"}]},
+            source_service="TEST",
+        )
+    )
+
+    response = await tentacle.process_command(
+        CommandContext(
+            command_name="PIPELINE_PROFILE",
+            correlation_id="PROF-R",
+            user_id=1,
+            params={"reset": True},
+            source_service="TEST",
+        )
+    )
+    stages = {stage["stage"]: stage for stage in response.data["stages"]}
+    validator = stages["IntValidatorSucker"]
+    # Счетчики точные: 4 одиночные записи + батч из 2 (один вызов)
+    assert (validator["calls"], validator["records"], validator["errors"]) == (5, 6, 2)
+    # Время - только у выборки: каждый второй одиночный вызов и каждый батч
+    assert 0 < validator["sampled_calls"] < validator["calls"]
+    assert validator["p50_ms"] is not None and validator["rps"] > 0
+    assert stages["MultiplierSucker"]["records"] == 4
+    assert response.data["hottest"] in stages
+    assert profiler.stages == {}  # reset
+
+
+class _PureSucker(ISucker):
+    """Детерминированная присоска: результат зависит только от data и factor."""
+
+    def __init__(self, factor: int = 2):
+        self.factor = factor
+        self.calls = 0
+
+    def get_config(self):
+        return {"name": "Pure", "factor": self.factor, "deterministic": True}
+
+    async def process(self, context: SuckerContext) -> SuckerContext:
+        self.calls += 1
+        if context.data["n"] < 0:
+            context.status = "ERROR"
+            context.data = {"error": "negative"}
+            return context
+        context.data = {"n": context.data["n"] * self.factor, "pad": "x" * 100}
+        context.metadata[f"pure_{self.factor}"] = True
+        return context
+
+
+@pytest.mark.asyncio
+async def test_executor_memoizes_deterministic_suckers(tmp_path):
+    from app.suckers.memo import SuckerMemo
+
+    memo = SuckerMemo(memory_budget=400, directory=tmp_path / "memo")
+    executor = SuckerExecutor(memo=memo)
+    double, triple = _PureSucker(2), _PureSucker(3)
+
+    async def run(sucker, n):
+        return await executor.run(sucker, FastSuckerContext({"n": n}, {"shared": 1}))
+
+    first = await run(double, 5)
+    again = await run(double, 5)
+    assert double.calls == 1
+    assert (
+        (again.data, again.status)
+        == (first.data, first.status)
+        == ({"n": 10, "pad": "x" * 100}, "PROCESSING")
+    )
+    assert again.metadata == {"shared": 1, "pure_2": True}
+    # Копия на каждое попадание: правка результата не портит кэш
+    again.data["n"] = -1
+    assert (await run(double, 5)).data["n"] == 10
+    # Другая конфигурация - другой ключ; ошибка тоже результат
+    assert (await run(triple, 5)).data["n"] == 15
+    assert (await run(double, -1)).status == (await run(double, -1)).status == "ERROR"
+    assert double.calls == 2
+
+    # Бюджет памяти ~2 записи: старые уходят на диск и возвращаются оттуда
+    for n in range(6):
+        await run(double, n)
+    assert memo.memory_bytes <= 400 and memo.stats["evicted"] > 0
+    calls = double.calls
+    assert (await run(double, 5)).data["n"] == 10
+    assert double.calls == calls
+    report = memo.report(["_PureSucker"])["stages"]["_PureSucker"]
+    assert report["disk_hits"] >= 1 and 0 < report["hit_rate"] < 1
+
+
+_ORDER_SCHEMA = {
+    "id": {"type": "int", "min": 1},
+    "qty": {"type": "int", "min": 1, "max": 100, "coerce": True},
+    "email": {"type": "str", "pattern": r"^[^@\s]+@[^@\s]+$"},
+    "status": {"enum": ["new", "paid"]},
+    "note": {"type": "str", "required": False},
+}
+
+
+@pytest.mark.asyncio
+async def test_schema_validator_reports_all_errors_per_record():
+    from app.suckers.validators.schema_validator import SchemaValidatorSucker
+
+    sucker = SchemaValidatorSucker(_ORDER_SCHEMA)
+    ok = await sucker.process(
+        SuckerContext(data={"id": 1, "qty": "5", "email": "a@b", "status": "new"}, metadata={})
+    )
+    assert ok.status != "ERROR"
+    assert ok.data["qty"] == 5  # coerce
+    assert ok.metadata["validated"] is True
+
+    bad = await sucker.process(
+        SuckerContext(data={"id": 0, "qty": 500, "email": "nope"}, metadata={})
+    )
+    assert bad.status == "ERROR"
+    rules = [(e["field"], e["rule"]) for e in bad.data["errors"]]
+    assert rules == [("id", "min"), ("qty", "max"), ("email", "pattern"), ("status", "required")]
+    assert bad.data["error"].count(";") == 3
+
+    with pytest.raises(ValueError, match="неизвестный тип"):
+        SchemaValidatorSucker({"x": {"type": "decimal"}})
+
+
+@pytest.mark.asyncio
+async def test_schema_validator_batch_matches_per_record(tmp_path, monkeypatch):
+    from app.suckers.validators.schema_validator import SchemaValidatorSucker
+
+    monkeypatch.chdir(tmp_path)
+    records = [
+        {"id": 1, "qty": "3", "email": "a@b", "status": "new"},
+        {"id": 2, "qty": "x", "email": "a@b", "status": "lost"},
+        {"id": -1, "qty": "7", "email": "bad", "status": "paid"},
+        {"id": 4, "qty": "100", "email": "c@d", "status": "paid"},
+    ]
+    sucker = SchemaValidatorSucker(_ORDER_SCHEMA)
+    expected = {}
+    for i, record in enumerate(records):
+        context = await sucker.process(SuckerContext(data=dict(record), metadata={}))
+        if context.status == "ERROR":
+            expected[i] = context.data["error"]
+
+    response = await PipelineTentacle(suckers=[sucker]).process_command(_batch_context(records))
+
+    assert response.data["rejected"] == expected
+    assert list(expected) == [1, 2]
+    assert [row["qty"] for row in response.data["results"]] == [3, 100]